@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class TrainStationConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "train_station"
+
+    def ready(self):
+        from train_station import signals  # noqa: F401
+        # Installs the query meter on connections as they are opened.
+        from train_station import middleware  # noqa: F401
@@ -0,0 +1,137 @@
+from asgiref.sync import sync_to_async
+from django.http import Http404
+from django.views import View
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+
+from train_station.conditional import (
+    ConditionalGetMixin,
+    aconditional_response,
+)
+from train_station.response_cache import CachedResponseMixin
+from train_station.views import JourneyViewSet, RouteViewSet, StationViewSet
+
+
+class AsyncReadOnlyView(View):
+    """Async list/retrieve endpoint mirroring a DRF viewset.
+
+    Authentication, permissions, throttling, pagination, conditional
+    GETs and the response cache come from ``viewset_class`` so both
+    paths answer alike. Rows are loaded with
+    the async ORM and serialized on the event loop, so under ASGI a slow
+    client holds a coroutine rather than the worker's only sync thread.
+    Serializers must not touch unloaded relations: list the ones they
+    need in ``retrieve_prefetch``.
+    """
+
+    viewset_class = None
+    retrieve_prefetch = ()
+
+    def _get_viewset(self, request, action, kwargs):
+        viewset = self.viewset_class(
+            action_map={"get": action},
+            args=(),
+            kwargs=kwargs,
+            format_kwarg=None,
+            renderer_classes=[JSONRenderer],
+        )
+        viewset.request = viewset.initialize_request(request)
+        viewset.headers = viewset.default_response_headers
+        return viewset
+
+    async def get(self, request, **kwargs):
+        action = "retrieve" if kwargs else "list"
+        viewset = self._get_viewset(request, action, kwargs)
+        try:
+            await sync_to_async(viewset.initial)(viewset.request)
+            response = await self._cached_response(viewset)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        response = viewset.finalize_response(viewset.request, response)
+        # Cache hits and 304s are plain HttpResponses.
+        if hasattr(response, "render"):
+            response.render()
+        return response
+
+    async def _cached_response(self, viewset):
+        """CachedResponseMixin's lookup and store around the handler"""
+        request = viewset.request
+        if not (
+            isinstance(viewset, CachedResponseMixin)
+            and viewset._cacheable(request)
+        ):
+            return await self._conditional_response(viewset)
+
+        key, response = await sync_to_async(viewset._cache_lookup)(request)
+        if response is None:
+            response = await sync_to_async(viewset._cache_store)(
+                key, request, await self._conditional_response(viewset)
+            )
+        return response
+
+    async def _conditional_response(self, viewset):
+        """ConditionalGetMixin's validators around the handler"""
+        handler = self.retrieve if viewset.action == "retrieve" else self.list
+        if not (
+            isinstance(viewset, ConditionalGetMixin)
+            and viewset.action in viewset.conditional_actions
+        ):
+            return await handler(viewset)
+
+        etag, last_modified = await sync_to_async(viewset._validators)(
+            viewset.request, **viewset.kwargs
+        )
+        if etag is None:
+            return await handler(viewset)
+
+        return await aconditional_response(
+            viewset.request,
+            etag,
+            int(last_modified.timestamp()),
+            lambda: handler(viewset),
+        )
+
+    async def list(self, viewset):
+        queryset = await sync_to_async(
+            lambda: viewset.filter_queryset(viewset.get_queryset())
+        )()
+        # CursorPagination issues a single query, in Django 4.2 that is
+        # exactly what the async ORM would do through sync_to_async.
+        page = await sync_to_async(viewset.paginate_queryset)(queryset)
+        if page is not None:
+            serializer = viewset.get_serializer(page, many=True)
+            return viewset.get_paginated_response(serializer.data)
+
+        instances = [instance async for instance in queryset.all()]
+        return Response(viewset.get_serializer(instances, many=True).data)
+
+    async def retrieve(self, viewset):
+        queryset = await sync_to_async(
+            lambda: viewset.filter_queryset(viewset.get_queryset())
+        )()
+        lookup_url_kwarg = viewset.lookup_url_kwarg or viewset.lookup_field
+        try:
+            instance = await queryset.prefetch_related(
+                *self.retrieve_prefetch
+            ).aget(
+                **{viewset.lookup_field: viewset.kwargs[lookup_url_kwarg]}
+            )
+        except (queryset.model.DoesNotExist, ValueError):
+            raise Http404
+
+        viewset.check_object_permissions(viewset.request, instance)
+        return Response(viewset.get_serializer(instance).data)
+
+
+class AsyncStationView(AsyncReadOnlyView):
+    viewset_class = StationViewSet
+
+
+class AsyncRouteView(AsyncReadOnlyView):
+    viewset_class = RouteViewSet
+
+
+class AsyncJourneyView(AsyncReadOnlyView):
+    viewset_class = JourneyViewSet
+    retrieve_prefetch = ("train__facility",)
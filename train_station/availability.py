@@ -0,0 +1,67 @@
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.models import Max
+
+from train_station.models import Journey, JourneyAvailability
+
+
+def is_materialized(using=DEFAULT_DB_ALIAS):
+    """Only PostgreSQL gets a materialized view, other vendors a plain one"""
+    return connections[using].vendor == "postgresql"
+
+
+def refresh_journey_availability(concurrently=True, using=DEFAULT_DB_ALIAS):
+    """Recompute the availability view, return False if it is a plain view
+
+    A concurrent refresh builds the new contents next to the old ones and
+    swaps them in without blocking readers of the view.
+    """
+    if not is_materialized(using):
+        return False
+
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            "REFRESH MATERIALIZED VIEW "
+            + ("CONCURRENTLY " if concurrently else "")
+            + connections[using].ops.quote_name(
+                JourneyAvailability._meta.db_table
+            )
+        )
+
+    return True
+
+
+def availability_changes(using=DEFAULT_DB_ALIAS):
+    """Return ``(refreshed_at, last_change)`` for the availability view
+
+    ``last_change`` is the newest ``updated_at`` of the journeys and the
+    rows joined into the view (ticket writes touch their journey), or
+    None when nothing changed since the last refresh. A differing row
+    count (deleted journeys) counts as a change made at ``refreshed_at``.
+    """
+    view = JourneyAvailability.objects.using(using).aggregate(
+        refreshed_at=Max("refreshed_at")
+    )
+    refreshed_at = view["refreshed_at"]
+    journeys = Journey.objects.using(using).order_by().aggregate(
+        journey_changed=Max("updated_at"),
+        route_changed=Max("route__updated_at"),
+        source_changed=Max("route__source__updated_at"),
+        destination_changed=Max("route__destination__updated_at"),
+        train_changed=Max("train__updated_at"),
+    )
+    changes = [value for value in journeys.values() if value]
+    last_change = max(changes) if changes else None
+
+    if refreshed_at is None:
+        return None, last_change
+
+    if last_change is not None and last_change > refreshed_at:
+        return refreshed_at, last_change
+
+    if (
+        JourneyAvailability.objects.using(using).count()
+        != Journey.objects.using(using).count()
+    ):
+        return refreshed_at, refreshed_at
+
+    return refreshed_at, None
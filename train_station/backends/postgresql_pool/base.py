@@ -0,0 +1,96 @@
+"""PostgreSQL backend keeping connections in a per-process pool.
+
+Configured with a ``POOL`` dict next to the usual settings::
+
+    "ENGINE": "train_station.backends.postgresql_pool",
+    "POOL": {"MIN_SIZE": 2, "MAX_SIZE": 20, "TIMEOUT": 5,
+             "MAX_LIFETIME": 1800, "CHECK_IDLE": 5},
+
+Django still "closes" the connection at the end of each request
+(``CONN_MAX_AGE = 0``), which hands it back to the pool instead. Session
+state (``SET`` values, temporary tables, advisory locks, ``LISTEN``) is
+discarded on the way back, so the next checkout starts clean.
+"""
+import json
+from functools import partial
+
+from django.db.backends.postgresql.base import (
+    DatabaseWrapper as PostgreSQLDatabaseWrapper,
+    IsolationLevel,
+)
+from psycopg2 import extensions
+
+from train_station.db_pool import get_pool
+
+
+def _ping(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def _reset(connection):
+    if connection.closed:
+        return False
+
+    status = connection.info.transaction_status
+    if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+        return False
+    if status != extensions.TRANSACTION_STATUS_IDLE:
+        connection.rollback()
+
+    # DISCARD ALL refuses to run inside a transaction block.
+    autocommit = connection.autocommit
+    connection.autocommit = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("DISCARD ALL")
+    finally:
+        connection.autocommit = autocommit
+    return True
+
+
+def _connect(settings_dict, alias, conn_params):
+    # A wrapper of its own: the pool outlives the wrapper that created
+    # it and must not keep it, or its settings, around.
+    wrapper = PostgreSQLDatabaseWrapper(settings_dict, alias)
+    return wrapper.get_new_connection(conn_params)
+
+
+def _pool_key(settings_dict, conn_params):
+    """Wrappers connecting alike share a pool, others get their own"""
+    return json.dumps(
+        [conn_params, settings_dict["OPTIONS"]], sort_keys=True, default=str
+    )
+
+
+class DatabaseWrapper(PostgreSQLDatabaseWrapper):
+    def get_new_connection(self, conn_params):
+        options = self.settings_dict.get("POOL", {})
+        self.pool = get_pool(
+            self.alias,
+            _pool_key(self.settings_dict, conn_params),
+            connect=partial(
+                _connect, self.settings_dict.copy(), self.alias, conn_params
+            ),
+            check=_ping,
+            reset=_reset,
+            min_size=options.get("MIN_SIZE", 0),
+            max_size=options.get("MAX_SIZE", 10),
+            timeout=options.get("TIMEOUT", 5),
+            max_lifetime=options.get("MAX_LIFETIME", 30 * 60),
+            check_idle=options.get("CHECK_IDLE", 5),
+        )
+        connection = self.pool.getconn()
+        # The parent sets this when it connects, pooled connections were
+        # opened with the same OPTIONS.
+        self.isolation_level = IsolationLevel(
+            self.settings_dict["OPTIONS"].get(
+                "isolation_level", IsolationLevel.READ_COMMITTED
+            )
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.putconn(self.connection)
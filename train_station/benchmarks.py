@@ -0,0 +1,286 @@
+"""Microbenchmarks for serializers, validators and viewset querysets.
+
+Objects are built in memory with their relations cached the way
+``select_related``/``prefetch_related`` would leave them, so the timings
+cover Python-side work only and no database rows are needed.
+
+Every run also times a fixed calibration workload, and runs are compared
+in multiples of it, so a baseline recorded on other hardware still
+applies.
+"""
+import json
+import time
+from datetime import datetime, timedelta
+
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from train_station.models import (
+    Crew,
+    Facility,
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+    TrainType,
+)
+from train_station.seat_map import SeatMap
+from train_station.serializers import (
+    JourneyDetailSerializer,
+    JourneyListSerializer,
+    OrderListSerializer,
+)
+from train_station.views import (
+    CrewViewSet,
+    FacilityViewSet,
+    JourneyAvailabilityViewSet,
+    JourneyViewSet,
+    OrderViewSet,
+    RouteViewSet,
+    StationViewSet,
+    TrainTypeViewSet,
+    TrainViewSet,
+)
+
+
+def _prefetched(model, instances):
+    queryset = model.objects.all()
+    queryset._result_cache = list(instances)
+    queryset._prefetch_done = True
+    return queryset
+
+
+def build_journeys(count):
+    stations = [
+        Station(id=index, name=f"Station {index}", latitude=50, longitude=30)
+        for index in range(1, 21)
+    ]
+    routes = [
+        Route(
+            id=index + 1,
+            source=stations[index],
+            destination=stations[(index + 1) % len(stations)],
+            distance=100 + index,
+        )
+        for index in range(len(stations))
+    ]
+    train_type = TrainType(id=1, name="Intercity")
+    facilities = [Facility(id=1, name="wifi"), Facility(id=2, name="bar")]
+    trains = []
+    for index in range(1, 6):
+        train = Train(
+            id=index,
+            name=f"Train {index}",
+            cargo_num=10,
+            places_in_cargo=50,
+            train_type=train_type,
+        )
+        train._prefetched_objects_cache = {
+            "facility": _prefetched(Facility, facilities)
+        }
+        trains.append(train)
+    crew = [
+        Crew(id=1, first_name="John", last_name="Doe", position="driver"),
+        Crew(id=2, first_name="Jane", last_name="Roe"),
+    ]
+
+    departure = datetime(2023, 9, 5, 8)
+    journeys = []
+    for index in range(count):
+        train = trains[index % len(trains)]
+        seat_map = SeatMap(train.cargo_num, train.places_in_cargo)
+        for seat in range(1, index % 40 + 1):
+            seat_map.add(seat % train.cargo_num + 1, seat)
+        journey = Journey(
+            id=index + 1,
+            route=routes[index % len(routes)],
+            train=train,
+            departure_time=departure + timedelta(minutes=index),
+            arrival_time=departure + timedelta(minutes=index + 240),
+            seat_map=seat_map.to_bytes(),
+            seats_sold=len(seat_map),
+        )
+        journey._prefetched_objects_cache = {
+            "crew": _prefetched(Crew, crew)
+        }
+        journeys.append(journey)
+
+    return journeys
+
+
+def build_orders(count, tickets_per_order=2):
+    journeys = build_journeys(min(count, 100))
+    orders = []
+    for index in range(count):
+        order = Order(
+            id=index + 1, created_at=datetime(2023, 9, 1), user_id=1
+        )
+        journey = journeys[index % len(journeys)]
+        order._prefetched_objects_cache = {
+            "tickets": _prefetched(
+                Ticket,
+                [
+                    Ticket(
+                        id=index * tickets_per_order + seat,
+                        cargo=1,
+                        seat=seat,
+                        journey=journey,
+                        order=order,
+                    )
+                    for seat in range(1, tickets_per_order + 1)
+                ],
+            )
+        }
+        orders.append(order)
+
+    return orders
+
+
+def _serialize(serializer_class, build):
+    def setup(size):
+        instances = build(size)
+        return lambda: serializer_class(instances, many=True).data
+
+    return setup
+
+
+def _validate_tickets(size):
+    journey = build_journeys(1)[0]
+    train = journey.train
+    seats = [
+        (index % train.cargo_num + 1, index % train.places_in_cargo + 1)
+        for index in range(size)
+    ]
+
+    def run():
+        for cargo, seat in seats:
+            try:
+                Ticket.validate_ticket(
+                    cargo, seat, train, serializers.ValidationError, journey
+                )
+            except serializers.ValidationError:
+                pass
+
+    return run
+
+
+QUERYSET_PARAMS = {
+    TrainViewSet: {"train_type": "1,2", "facility": "1"},
+    JourneyAvailabilityViewSet: {
+        "source": "1",
+        "departure_after": "2023-09-05T00:00:00",
+    },
+}
+
+
+def _build_queryset(viewset_class):
+    def setup(size):
+        request = Request(
+            APIRequestFactory().get(
+                "/", QUERYSET_PARAMS.get(viewset_class, {})
+            )
+        )
+        viewset = viewset_class(
+            request=request, action="list", format_kwarg=None, kwargs={}
+        )
+
+        def run():
+            for _ in range(size):
+                str(viewset.get_queryset().all().query)
+
+        return run
+
+    return setup
+
+
+SIZED_BENCHMARKS = {
+    "serialize.JourneyListSerializer": _serialize(
+        JourneyListSerializer, build_journeys
+    ),
+    "serialize.JourneyDetailSerializer": _serialize(
+        JourneyDetailSerializer, build_journeys
+    ),
+    "serialize.OrderListSerializer": _serialize(
+        OrderListSerializer, build_orders
+    ),
+    "validate.Ticket.validate_ticket": _validate_tickets,
+}
+
+QUERYSET_BENCHMARKS = {
+    f"queryset.{viewset_class.__name__}.get_queryset": _build_queryset(
+        viewset_class
+    )
+    for viewset_class in (
+        StationViewSet,
+        RouteViewSet,
+        TrainTypeViewSet,
+        FacilityViewSet,
+        TrainViewSet,
+        JourneyViewSet,
+        JourneyAvailabilityViewSet,
+        CrewViewSet,
+        OrderViewSet,
+    )
+}
+
+
+def _best_of(run, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+
+    return min(timings)
+
+
+def _calibration_workload():
+    rows = [
+        {"id": index, "name": f"Station {index}", "distance": index * 1.5}
+        for index in range(20000)
+    ]
+    rows.sort(key=lambda row: row["name"])
+    json.dumps(rows)
+
+
+def calibrate(repeat=5):
+    """Best seconds of a fixed workload, a measure of this machine's speed"""
+    return _best_of(_calibration_workload, repeat)
+
+
+def run_benchmarks(sizes=(1000, 10000, 100000), queryset_loops=1000,
+                   repeat=3, only=None):
+    """Return ``{"<benchmark>[<size>]": best seconds}``"""
+    cases = [
+        (name, setup, size)
+        for name, setup in SIZED_BENCHMARKS.items()
+        for size in sizes
+    ] + [
+        (name, setup, queryset_loops)
+        for name, setup in QUERYSET_BENCHMARKS.items()
+    ]
+
+    results = {}
+    for name, setup, size in cases:
+        if only and not any(part in name for part in only):
+            continue
+        results[f"{name}[{size}]"] = _best_of(setup(size), repeat)
+
+    return results
+
+
+def find_regressions(results, baseline, threshold, scale=1.0):
+    """Return ``(name, baseline, current)`` for runs slower by > threshold
+
+    Baseline timings are multiplied by ``scale``, the ratio of this
+    machine's calibration to the baseline's.
+    """
+    return [
+        (name, baseline[name] * scale, seconds)
+        for name, seconds in results.items()
+        if name in baseline
+        and seconds > baseline[name] * scale * (1 + threshold)
+    ]
@@ -0,0 +1,158 @@
+from itertools import islice
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework import serializers
+
+from train_station.exceptions import SeatConflict
+from train_station.models import Journey, Order, Ticket
+from train_station.seat_holds import get_seat_hold_store
+
+
+def _lock_journeys(journey_ids):
+    """Lock journey rows in id order, which serializes bookings per journey
+
+    Every booking touching a journey waits for the row lock here, so seat
+    checks run against a seat map nobody else is changing. Taking the
+    locks in id order keeps multi-journey orders from deadlocking.
+    """
+    journeys = (
+        Journey.objects.select_for_update(of=("self",))
+        .select_related("train")
+        .filter(pk__in=journey_ids)
+        .order_by("pk")
+    )
+    return {journey.pk: journey for journey in journeys}
+
+
+def _held_seats(tickets, seat_hold):
+    seats_by_journey = {}
+    for journey_id, cargo, seat in tickets:
+        seats_by_journey.setdefault(journey_id, []).append((cargo, seat))
+
+    store = get_seat_hold_store()
+    return {
+        (journey_id, seat)
+        for journey_id, seats in seats_by_journey.items()
+        for seat in store.held_seats(journey_id, seats, seat_hold)
+    }
+
+
+def suggest_alternatives(journey_id, seat_map, seats, exclude=(), limit=3):
+    """Free, unheld seats closest to each of ``seats``"""
+    store = get_seat_hold_store()
+    suggested = set(exclude)
+    alternatives = []
+    for cargo, seat in seats:
+        candidates = [
+            candidate
+            for candidate in islice(
+                seat_map.free_seats_near(cargo, seat), limit * 4
+            )
+            if candidate not in suggested
+        ]
+        held = set(store.held_seats(journey_id, candidates))
+        for candidate in [c for c in candidates if c not in held][:limit]:
+            suggested.add(candidate)
+            alternatives.append(
+                {
+                    "journey": journey_id,
+                    "cargo": candidate[0],
+                    "seat": candidate[1],
+                }
+            )
+
+    return alternatives
+
+
+def book_tickets(tickets, seat_hold=None, **order_fields):
+    """Create an order for ``(journey_id, cargo, seat)`` tickets
+
+    Out-of-range or repeated seats and journeys that no longer exist
+    raise a ValidationError with one entry per ticket. Seats that are
+    sold or held by someone else raise SeatConflict listing them together
+    with nearby free seats.
+    """
+    with transaction.atomic():
+        journeys = _lock_journeys({journey_id for journey_id, _, _ in tickets})
+        seat_maps = {
+            journey_id: journey.seats
+            for journey_id, journey in journeys.items()
+        }
+        held_seats = _held_seats(tickets, seat_hold)
+
+        errors, conflicts, requested = [], [], set()
+        for journey_id, cargo, seat in tickets:
+            try:
+                if journey_id not in journeys:
+                    raise serializers.ValidationError(
+                        {"journey": f"Journey {journey_id} does not exist"}
+                    )
+                Ticket.validate_ticket(
+                    cargo=cargo,
+                    seat=seat,
+                    train=journeys[journey_id].train,
+                    error_to_raise=serializers.ValidationError,
+                )
+                if (journey_id, cargo, seat) in requested:
+                    raise serializers.ValidationError(
+                        {"seat": f"Seat {seat} in cargo {cargo} is repeated"}
+                    )
+            except serializers.ValidationError as error:
+                errors.append(error.detail)
+                continue
+
+            errors.append({})
+            requested.add((journey_id, cargo, seat))
+            if (cargo, seat) in seat_maps[journey_id] or (
+                (journey_id, (cargo, seat)) in held_seats
+            ):
+                conflicts.append((journey_id, cargo, seat))
+
+        if any(errors):
+            raise serializers.ValidationError({"tickets": errors})
+
+        if conflicts:
+            alternatives = []
+            for journey_id, seat_map in seat_maps.items():
+                alternatives += suggest_alternatives(
+                    journey_id,
+                    seat_map,
+                    [(c, s) for j, c, s in conflicts if j == journey_id],
+                    exclude={
+                        (c, s) for j, c, s in requested if j == journey_id
+                    },
+                )
+            raise SeatConflict(
+                [
+                    {"journey": journey_id, "cargo": cargo, "seat": seat}
+                    for journey_id, cargo, seat in conflicts
+                ],
+                alternatives,
+            )
+
+        order = Order.objects.create(**order_fields)
+        Ticket.objects.bulk_create(
+            [
+                Ticket(
+                    order=order, journey_id=journey_id, cargo=cargo, seat=seat
+                )
+                for journey_id, cargo, seat in tickets
+            ]
+        )
+
+        now = timezone.now()
+        for journey_id, cargo, seat in tickets:
+            seat_maps[journey_id].add(cargo, seat)
+        for journey_id, journey in journeys.items():
+            journey.seat_map = seat_maps[journey_id].to_bytes()
+            journey.seats_sold = F("seats_sold") + sum(
+                1 for ticket in tickets if ticket[0] == journey_id
+            )
+            journey.updated_at = now
+        Journey.objects.bulk_update(
+            journeys.values(), ["seat_map", "seats_sold", "updated_at"]
+        )
+
+        return order
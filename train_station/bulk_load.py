@@ -0,0 +1,97 @@
+import io
+import time
+from datetime import datetime
+
+from django.core.management.color import no_style
+from django.db.models import Max
+
+
+def _copy_value(value):
+    if value is None:
+        return "\\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(value).hex()
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\t", "\\t")
+        .replace("\n", "\\n")
+        .replace("\r", "\\r")
+    )
+
+
+class RowWriter:
+    """Buffer raw rows for one model and flush them in batches.
+
+    PostgreSQL batches are streamed with ``COPY ... FROM STDIN``, other
+    vendors get one ``executemany`` INSERT per batch. Rows are tuples in
+    ``fields`` order, values must already be in database form (ids for
+    foreign keys, bytes for binary fields). No signals, ``save()`` or
+    validation run.
+    """
+
+    def __init__(self, connection, model, fields, batch_size=10000):
+        self.connection = connection
+        self.model = model
+        self.batch_size = batch_size
+        self.columns = [
+            model._meta.get_field(field).column for field in fields
+        ]
+        self.rows = []
+        self.written = 0
+        self.seconds = 0.0
+
+    def write(self, row):
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if not self.rows:
+            return
+
+        started = time.perf_counter()
+        quote_name = self.connection.ops.quote_name
+        table = quote_name(self.model._meta.db_table)
+        columns = ", ".join(quote_name(column) for column in self.columns)
+        with self.connection.cursor() as cursor:
+            if self.connection.vendor == "postgresql":
+                buffer = io.StringIO()
+                for row in self.rows:
+                    buffer.write("\t".join(_copy_value(v) for v in row))
+                    buffer.write("\n")
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {table} ({columns}) FROM STDIN", buffer
+                )
+            else:
+                placeholders = ", ".join(["%s"] * len(self.columns))
+                cursor.executemany(
+                    f"INSERT INTO {table} ({columns}) "
+                    f"VALUES ({placeholders})",
+                    self.rows,
+                )
+
+        self.written += len(self.rows)
+        self.seconds += time.perf_counter() - started
+        self.rows = []
+
+
+def next_id(model, using="default"):
+    """First primary key after the current maximum"""
+    return (
+        model.objects.using(using).aggregate(last=Max("pk"))["last"] or 0
+    ) + 1
+
+
+def reset_sequences(connection, models):
+    """Move id sequences past rows inserted with explicit ids"""
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
@@ -0,0 +1,113 @@
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def conditional_response(request, etag, last_modified, get_response):
+    """A 304 if the request's validators match, else ``get_response()``
+
+    ``last_modified`` is a POSIX timestamp; successful responses get the
+    ``ETag`` and ``Last-Modified`` headers.
+    """
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = get_response()
+        if response.status_code != 200:
+            return response
+
+    response["ETag"] = quote_etag(etag)
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+async def aconditional_response(request, etag, last_modified, get_response):
+    """conditional_response awaiting ``get_response()``"""
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = await get_response()
+        if response.status_code != 200:
+            return response
+
+    response["ETag"] = quote_etag(etag)
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """ETag / Last-Modified support for read actions.
+
+    Validators come from one aggregate query over ``updated_at`` columns
+    listed in ``last_modified_fields`` (related ones included, so a
+    renamed station changes the ETag of the routes using it). Matching
+    ``If-None-Match`` / ``If-Modified-Since`` headers get a 304 before
+    any serializer runs.
+
+    List it after ``CachedResponseMixin``, which keeps the validators
+    with cached responses and answers from them without the aggregate.
+    """
+
+    last_modified_fields = ("updated_at",)
+    conditional_actions = ("list", "retrieve")
+
+    def _validators(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == "retrieve":
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            queryset = queryset.filter(
+                **{self.lookup_field: kwargs[lookup_url_kwarg]}
+            )
+
+        aggregates = queryset.order_by().aggregate(
+            rows=Count("pk", distinct=True),
+            **{
+                f"modified_{index}": Max(field)
+                for index, field in enumerate(self.last_modified_fields)
+            },
+        )
+        rows = aggregates.pop("rows")
+        timestamps = [value for value in aggregates.values() if value]
+        if not timestamps:
+            return None, None
+
+        digest = hashlib.md5(
+            "|".join(
+                [
+                    request.get_full_path(),
+                    request.accepted_renderer.format,
+                    str(rows),
+                    *(value.isoformat() for value in timestamps),
+                ]
+            ).encode()
+        ).hexdigest()
+        return f'W/"{digest}"', max(timestamps)
+
+    def _conditional_response(self, handler, request, *args, **kwargs):
+        if self.action not in self.conditional_actions:
+            return handler(request, *args, **kwargs)
+
+        etag, last_modified = self._validators(request, *args, **kwargs)
+        if etag is None:
+            return handler(request, *args, **kwargs)
+
+        return conditional_response(
+            request,
+            etag,
+            int(last_modified.timestamp()),
+            lambda: handler(request, *args, **kwargs),
+        )
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional_response(
+            super().retrieve, request, *args, **kwargs
+        )
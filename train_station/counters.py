@@ -0,0 +1,113 @@
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from train_station.sqlite_store import SQLiteStore
+
+
+class BaseCounterStore:
+    """Integer counters, e.g. cache versions, shared between processes"""
+
+    def incr(self, key, delta=1):
+        """Add ``delta`` to ``key`` and return the new value"""
+        raise NotImplementedError
+
+    def get_many(self, keys):
+        """``{key: value}`` of the given keys, missing ones are 0"""
+        raise NotImplementedError
+
+    def get(self, key):
+        return self.get_many([key])[key]
+
+    def delete(self, keys):
+        raise NotImplementedError
+
+
+class LocalCounterStore(BaseCounterStore):
+    """In-process counters for tests and single-process servers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def incr(self, key, delta=1):
+        with self._lock:
+            value = self._values[key] = self._values.get(key, 0) + delta
+
+        return value
+
+    def get_many(self, keys):
+        with self._lock:
+            return {key: self._values.get(key, 0) for key in keys}
+
+    def delete(self, keys):
+        with self._lock:
+            for key in keys:
+                self._values.pop(key, None)
+
+
+class SQLiteCounterStore(SQLiteStore, BaseCounterStore):
+    """Counters in a SQLite file"""
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS counter ("
+        "key TEXT PRIMARY KEY, value INTEGER NOT NULL) WITHOUT ROWID",
+    )
+
+    def incr(self, key, delta=1):
+        # The upsert is one statement, so its own transaction.
+        return self._connection().execute(
+            "INSERT INTO counter (key, value) VALUES (?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = value + excluded.value "
+            "RETURNING value",
+            (key, delta),
+        ).fetchone()[0]
+
+    def get_many(self, keys):
+        keys = list(keys)
+        values = dict.fromkeys(keys, 0)
+        if keys:
+            values.update(
+                self._connection().execute(
+                    "SELECT key, value FROM counter WHERE key IN (%s)"
+                    % ",".join("?" * len(keys)),
+                    keys,
+                )
+            )
+
+        return values
+
+    def delete(self, keys):
+        self._connection().executemany(
+            "DELETE FROM counter WHERE key = ?", [(key,) for key in keys]
+        )
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_counter_store():
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.COUNTER_STORE
+                _store = import_string(config["BACKEND"])(
+                    **config.get("OPTIONS", {})
+                )
+
+    return _store
+
+
+@receiver(setting_changed)
+def reset_counter_store(setting, **kwargs):
+    global _store
+
+    if setting == "COUNTER_STORE":
+        with _store_lock:
+            _store = None
@@ -0,0 +1,267 @@
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class _Entry:
+    __slots__ = ("connection", "created_at", "last_used")
+
+    def __init__(self, connection, now):
+        self.connection = connection
+        self.created_at = now
+        self.last_used = now
+
+
+class ConnectionPool:
+    """Thread-safe pool of DB-API connections for one process
+
+    ``connect`` opens a connection, ``check`` raises if an idle one is
+    no longer usable and ``reset`` returns False for connections that
+    must not go back to the pool. Connections idle for ``check_idle``
+    seconds or more are checked on checkout, those older than
+    ``max_lifetime`` are replaced. Checkouts wait up to ``timeout``
+    seconds for one of ``max_size`` connections to come back.
+    """
+
+    def __init__(
+        self,
+        connect,
+        check=None,
+        reset=None,
+        min_size=0,
+        max_size=10,
+        timeout=5.0,
+        max_lifetime=30 * 60,
+        check_idle=5.0,
+        clock=time.monotonic,
+    ):
+        self.connect = connect
+        self.check = check
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_idle = check_idle
+        self.clock = clock
+        self._cond = threading.Condition()
+        self._idle = deque()
+        self._in_use = {}
+        self._size = 0
+        self._waiting = 0
+        self._filling = False
+        self._closed = False
+        self.checkouts = 0
+        self.created = 0
+        self.closed = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self._fill_async()
+
+    def _expired(self, entry, now):
+        return (
+            self.max_lifetime is not None
+            and now - entry.created_at >= self.max_lifetime
+        )
+
+    def _usable(self, entry):
+        now = self.clock()
+        if self._expired(entry, now):
+            return False
+        if self.check is None or now - entry.last_used < self.check_idle:
+            return True
+
+        try:
+            self.check(entry.connection)
+        except Exception:
+            return False
+        return True
+
+    def _open(self):
+        try:
+            connection = self.connect()
+        except BaseException:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self.created += 1
+        return _Entry(connection, self.clock())
+
+    def _discard(self, entry):
+        try:
+            entry.connection.close()
+        except Exception:
+            pass
+
+        with self._cond:
+            self._size -= 1
+            self.closed += 1
+            self._cond.notify()
+        self._fill_async()
+
+    def _fill(self):
+        try:
+            while True:
+                with self._cond:
+                    if self._size >= self.min_size:
+                        return
+                    self._size += 1
+                entry = self._open()
+                with self._cond:
+                    self._idle.appendleft(entry)
+                    self._cond.notify()
+        except Exception:
+            # The next checkout reports the error.
+            pass
+        finally:
+            with self._cond:
+                self._filling = False
+
+    def _fill_async(self):
+        with self._cond:
+            if self._closed or self._filling or self._size >= self.min_size:
+                return
+            self._filling = True
+
+        threading.Thread(
+            target=self._fill, name="db-pool-fill", daemon=True
+        ).start()
+
+    def getconn(self):
+        started = self.clock()
+        deadline = started + self.timeout
+        while True:
+            entry = None
+            with self._cond:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - self.clock()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolTimeout(
+                            f"No database connection free after "
+                            f"{self.timeout} s ({self.max_size} in use)"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+                if self._idle:
+                    entry = self._idle.pop()
+                else:
+                    self._size += 1
+
+            if entry is None:
+                entry = self._open()
+            elif not self._usable(entry):
+                self._discard(entry)
+                continue
+
+            waited = self.clock() - started
+            with self._cond:
+                self._in_use[id(entry.connection)] = entry
+                self.checkouts += 1
+                self.wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            return entry.connection
+
+    def putconn(self, connection):
+        with self._cond:
+            entry = self._in_use.pop(id(connection), None)
+        if entry is None:
+            connection.close()
+            return
+
+        try:
+            reusable = self.reset is None or self.reset(connection)
+        except Exception:
+            reusable = False
+        now = self.clock()
+        if not reusable or self._closed or self._expired(entry, now):
+            self._discard(entry)
+            return
+
+        entry.last_used = now
+        with self._cond:
+            self._idle.append(entry)
+            self._cond.notify()
+
+    def close(self):
+        """Close idle connections, checked out ones close on return"""
+        with self._cond:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+        for entry in idle:
+            self._discard(entry)
+
+    def stats(self):
+        with self._cond:
+            return {
+                "min_size": self.min_size,
+                "max_size": self.max_size,
+                "size": self._size,
+                "in_use": len(self._in_use),
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "closed": self.closed,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": self.wait_seconds,
+                "wait_seconds_max": self.max_wait_seconds,
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+_pools_pid = os.getpid()
+
+
+def get_pool(alias, key, **options):
+    """The process-wide pool of ``alias`` for connections alike in ``key``
+
+    ``key`` stands for the connection parameters, so the test database,
+    which Django swaps in under the same alias, stays out of pools opened
+    before the switch.
+    """
+    global _pools_pid
+
+    with _pools_lock:
+        if _pools_pid != os.getpid():
+            # Connections inherited through fork belong to the parent.
+            _pools.clear()
+            _pools_pid = os.getpid()
+        if (alias, key) not in _pools:
+            _pools[alias, key] = ConnectionPool(**options)
+
+        return _pools[alias, key]
+
+
+def close_pools():
+    """Close idle pooled connections and forget every pool"""
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+
+    for pool in pools:
+        pool.close()
+
+
+def pool_stats():
+    """``{alias: stats}`` of the pools opened in this process"""
+    with _pools_lock:
+        pools = dict(_pools) if _pools_pid == os.getpid() else {}
+
+    return {alias: pool.stats() for (alias, _), pool in pools.items()}
@@ -0,0 +1,138 @@
+import random
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DatabaseError, connections
+
+# None outside replica-enabled requests, else a dict with the oldest
+# acceptable replica lag and whether the request has written yet.
+_replica_reads = ContextVar("replica_reads", default=None)
+
+LAG_SQL = {
+    "postgresql": (
+        "SELECT CASE WHEN pg_last_wal_receive_lsn() "
+        "= pg_last_wal_replay_lsn() THEN 0 ELSE COALESCE(EXTRACT(EPOCH "
+        "FROM now() - pg_last_xact_replay_timestamp()), 0) END"
+    ),
+}
+
+
+class ReplicaLagMonitor:
+    """Replication lag per replica alias, re-measured every ``interval``
+
+    A replica that cannot be queried counts as infinitely behind until
+    the next measurement.
+    """
+
+    def __init__(self, interval=5, clock=time.monotonic):
+        self.interval = interval
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._lags = {}
+
+    def measure(self, alias):
+        sql = LAG_SQL.get(connections[alias].vendor)
+        if sql is None:
+            return 0.0
+
+        try:
+            with connections[alias].cursor() as cursor:
+                cursor.execute(sql)
+                return float(cursor.fetchone()[0] or 0)
+        except DatabaseError:
+            return float("inf")
+
+    def lag(self, alias):
+        now = self.clock()
+        with self._lock:
+            measured_at, lag = self._lags.get(alias, (None, None))
+        if measured_at is not None and now - measured_at < self.interval:
+            return lag
+
+        lag = self.measure(alias)
+        with self._lock:
+            self._lags[alias] = (now, lag)
+        return lag
+
+    def clear(self):
+        with self._lock:
+            self._lags.clear()
+
+
+lag_monitor = ReplicaLagMonitor()
+
+
+def choose_replica(max_lag):
+    """A random replica less than ``max_lag`` seconds behind, or None"""
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    for alias in replicas:
+        if lag_monitor.lag(alias) < max_lag:
+            return alias
+
+    return None
+
+
+@contextmanager
+def replica_reads(max_lag=None):
+    """Let reads in this block go to replicas until the first write
+
+    ``max_lag`` (``REPLICA_MAX_LAG`` by default) is the staleness the
+    caller accepts, e.g. the time since its own last write. The block
+    gets the routing state, whose ``max_lag`` may still be changed; 0
+    keeps reads on the primary.
+    """
+    if max_lag is None:
+        max_lag = settings.REPLICA_MAX_LAG
+    state = {
+        "max_lag": min(max_lag, settings.REPLICA_MAX_LAG),
+        "wrote": False,
+    }
+    token = _replica_reads.set(state)
+    try:
+        yield state
+    finally:
+        _replica_reads.reset(token)
+
+
+class ReplicaRouter:
+    """Send reads inside :func:`replica_reads` to a fresh enough replica
+
+    Everything else, and every read after a write in the same block,
+    uses the primary. Migrations only run on the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _replica_reads.get()
+        if (
+            state is None
+            or state["wrote"]
+            or not state["max_lag"]
+            or not settings.DATABASE_REPLICAS
+        ):
+            return None
+
+        return choose_replica(state["max_lag"])
+
+    def db_for_write(self, model, **hints):
+        state = _replica_reads.get()
+        if state is not None:
+            state["wrote"] = True
+
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {"default", *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+
+        return None
@@ -0,0 +1,16 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class SeatConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Some of the requested seats are not available."
+    default_code = "seat_conflict"
+
+    def __init__(self, seats, alternatives=(), detail=None, code=None):
+        super().__init__(detail=detail, code=code)
+        self.detail = {
+            "detail": self.detail,
+            "seats": list(seats),
+            "alternatives": list(alternatives),
+        }
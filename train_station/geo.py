@@ -0,0 +1,217 @@
+import heapq
+import math
+import threading
+from collections import defaultdict
+from itertools import chain
+
+from django.db import transaction
+from django.utils import timezone
+
+from train_station.counters import get_counter_store
+from train_station.models import Station
+from train_station.utils import (
+    SYNC_OVERLAP,
+    bump_cache_version,
+    cache_versions,
+)
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+INDEX_VERSION_KEY = "train_station:station-index-version"
+INDEX_CHANGES_KEY = "train_station:station-index-changes"
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(min(a, 1.0)))
+
+
+class StationGrid:
+    """Stations bucketed into ``cell_size`` x ``cell_size`` degree cells.
+
+    Radius and bounding-box lookups only visit the cells overlapping the
+    query area, so the cost depends on local density, not on the total
+    number of stations.
+    """
+
+    def __init__(self, stations=(), cell_size=0.5):
+        self.cell_size = cell_size
+        self.cells = defaultdict(dict)
+        self.positions = {}
+        for station_id, latitude, longitude in stations:
+            self.add(station_id, latitude, longitude)
+
+    @classmethod
+    def from_db(cls):
+        return cls(
+            Station.objects.order_by()
+            .values_list("id", "latitude", "longitude")
+            .iterator()
+        )
+
+    def _cell(self, latitude, longitude):
+        return (
+            math.floor(latitude / self.cell_size),
+            math.floor(longitude / self.cell_size),
+        )
+
+    def add(self, station_id, latitude, longitude):
+        """Insert a station or move it to its new position"""
+        self.remove(station_id)
+        self.positions[station_id] = (latitude, longitude)
+        self.cells[self._cell(latitude, longitude)][station_id] = (
+            latitude, longitude
+        )
+
+    def sync(self, since):
+        """Apply the stations updated from ``since`` on
+
+        Deletions are not seen, they need a rebuild.
+        """
+        for station in Station.objects.filter(
+            updated_at__gte=since
+        ).values_list("id", "latitude", "longitude"):
+            self.add(*station)
+
+    def remove(self, station_id):
+        position = self.positions.pop(station_id, None)
+        if position is None:
+            return
+
+        cell = self._cell(*position)
+        self.cells[cell].pop(station_id, None)
+        if not self.cells[cell]:
+            del self.cells[cell]
+
+    def _candidates(self, min_lat, min_lon, max_lat, max_lon):
+        min_row, min_col = self._cell(min_lat, min_lon)
+        max_row, max_col = self._cell(max_lat, max_lon)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(
+            self.cells
+        ):
+            for stations in self.cells.values():
+                yield from stations.items()
+            return
+
+        for row in range(min_row, max_row + 1):
+            for col in range(min_col, max_col + 1):
+                yield from self.cells.get((row, col), {}).items()
+
+    def within_bbox(self, min_lat, min_lon, max_lat, max_lon):
+        return [
+            station_id
+            for station_id, (latitude, longitude) in self._candidates(
+                min_lat, min_lon, max_lat, max_lon
+            )
+            if min_lat <= latitude <= max_lat
+            and min_lon <= longitude <= max_lon
+        ]
+
+    def nearest(self, latitude, longitude, radius_km, limit):
+        """Return up to ``limit`` ``(distance_km, station_id)`` pairs"""
+        lat_span = radius_km / KM_PER_DEGREE
+        cos_lat = math.cos(math.radians(latitude))
+        if cos_lat * 180 <= lat_span:
+            lon_ranges = [(-180, 180)]
+        else:
+            west = longitude - lat_span / cos_lat
+            east = longitude + lat_span / cos_lat
+            lon_ranges = [(max(west, -180), min(east, 180))]
+            if west < -180:
+                lon_ranges.append((west + 360, 180))
+            if east > 180:
+                lon_ranges.append((-180, east - 360))
+
+        candidates = dict(
+            chain.from_iterable(
+                self._candidates(
+                    latitude - lat_span, min_lon, latitude + lat_span, max_lon
+                )
+                for min_lon, max_lon in lon_ranges
+            )
+        )
+        distances = (
+            (haversine_km(latitude, longitude, lat, lon), station_id)
+            for station_id, (lat, lon) in candidates.items()
+        )
+        return heapq.nsmallest(
+            limit,
+            (pair for pair in distances if pair[0] <= radius_km),
+        )
+
+
+_index = None
+_index_versions = None
+_index_synced_at = None
+_index_lock = threading.RLock()
+
+
+def _current_index():
+    global _index, _index_versions, _index_synced_at
+
+    versions = cache_versions([INDEX_VERSION_KEY, INDEX_CHANGES_KEY])
+    if (
+        _index is None
+        or _index_versions[INDEX_VERSION_KEY] != versions[INDEX_VERSION_KEY]
+    ):
+        now = timezone.now()
+        _index = StationGrid.from_db()
+        _index_synced_at = now
+    elif _index_versions != versions:
+        now = timezone.now()
+        _index.sync(_index_synced_at - SYNC_OVERLAP)
+        _index_synced_at = now
+    _index_versions = versions
+
+    return _index
+
+
+def nearest_stations(latitude, longitude, radius_km, limit):
+    with _index_lock:
+        return _current_index().nearest(latitude, longitude, radius_km, limit)
+
+
+def stations_in_bbox(min_lat, min_lon, max_lat, max_lon):
+    with _index_lock:
+        return _current_index().within_bbox(
+            min_lat, min_lon, max_lat, max_lon
+        )
+
+
+def invalidate_station_index():
+    """Make every worker rebuild its grid, e.g. after bulk loads"""
+    bump_cache_version(INDEX_VERSION_KEY)
+
+
+def station_saved(station):
+    """Make every worker re-read recently updated stations once committed
+
+    A rolled back change bumps nothing.
+    """
+    transaction.on_commit(
+        lambda: get_counter_store().incr(INDEX_CHANGES_KEY)
+    )
+
+
+def station_deleted(station_id):
+    """Make other workers rebuild, syncs do not see deletions
+
+    This worker patches its grid instead, unless another write retired
+    it since it was built.
+    """
+
+    def apply():
+        version = get_counter_store().incr(INDEX_VERSION_KEY)
+        with _index_lock:
+            if (
+                _index is not None
+                and _index_versions[INDEX_VERSION_KEY] == version - 1
+            ):
+                _index.remove(station_id)
+                _index_versions[INDEX_VERSION_KEY] = version
+
+    transaction.on_commit(apply)
@@ -0,0 +1,153 @@
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from train_station.storage import release_media
+
+logger = logging.getLogger(__name__)
+
+VARIANTS = {
+    "thumbnail": (160, 120),
+    "card": (480, 360),
+    "full": (1280, 960),
+}
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpeg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+
+def render_variants(image_file):
+    """Yield ``(variant, extension, bytes)`` for every size and format"""
+    with Image.open(image_file) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "L"):
+            background = Image.new("RGB", original.size, "white")
+            rgba = original.convert("RGBA")
+            background.paste(rgba, mask=rgba.getchannel("A"))
+            original = background
+        elif original.mode == "L":
+            original = original.convert("RGB")
+
+        for variant, size in VARIANTS.items():
+            resized = original.copy()
+            resized.thumbnail(size, Image.LANCZOS)
+            for extension, (image_format, options) in FORMATS.items():
+                buffer = io.BytesIO()
+                resized.save(buffer, image_format, **options)
+                yield variant, extension, buffer.getvalue()
+
+
+def _variant_name(image_name, variant, extension):
+    stem, _ = os.path.splitext(os.path.basename(image_name))
+    return os.path.join(
+        "uploads/trains/variants", f"{stem}-{variant}.{extension}"
+    )
+
+
+def _variant_names(variants):
+    return [name for formats in variants.values() for name in formats.values()]
+
+
+def generate_image_variants(train_id):
+    """Render the variants of a train image and store their names
+
+    The train row is only updated if its image is still the one the
+    variants were made from, a newer upload schedules its own run.
+    """
+    from train_station.models import Train
+
+    train = Train.objects.filter(pk=train_id).first()
+    if train is None:
+        return
+
+    image_name = train.image.name or ""
+    variants = {}
+    if image_name:
+        with train.image.open("rb") as image_file:
+            for variant, extension, content in render_variants(image_file):
+                variants.setdefault(variant, {})[extension] = (
+                    default_storage.save(
+                        _variant_name(image_name, variant, extension),
+                        ContentFile(content),
+                    )
+                )
+
+    with transaction.atomic():
+        current = (
+            Train.objects.select_for_update()
+            .filter(pk=train_id)
+            .values("image", "image_variants")
+            .first()
+        )
+        if current is None or (current["image"] or "") != image_name:
+            release_media(_variant_names(variants))
+            return
+
+        Train.objects.filter(pk=train_id).update(
+            image_variants=variants, updated_at=timezone.now()
+        )
+
+    transaction.on_commit(
+        lambda: release_media(_variant_names(current["image_variants"] or {}))
+    )
+
+
+def trains_missing_variants():
+    """Trains with an image but no stored variants
+
+    Renders queued on a worker's pool are lost when it restarts, the
+    ``render_image_variants`` command picks these trains up again.
+    """
+    from train_station.models import Train
+
+    return (
+        Train.objects.exclude(image="")
+        .exclude(image__isnull=True)
+        .filter(image_variants={})
+    )
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _run(train_id):
+    close_old_connections()
+    try:
+        generate_image_variants(train_id)
+    except Exception:
+        logger.exception("Image variants failed for train %s", train_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_variants(train_id):
+    """Generate variants on the worker pool once the upload is committed
+
+    ``IMAGE_VARIANT_WORKERS = 0`` renders them inline instead, which is
+    what tests use.
+    """
+    global _executor
+
+    workers = settings.IMAGE_VARIANT_WORKERS
+    if not workers:
+        transaction.on_commit(lambda: generate_image_variants(train_id))
+        return
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=workers, thread_name_prefix="image-variants"
+            )
+
+    transaction.on_commit(lambda: _executor.submit(_run, train_id))
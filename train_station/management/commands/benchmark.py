@@ -0,0 +1,147 @@
+import json
+import platform
+from datetime import datetime
+from pathlib import Path
+
+import django
+from django.core.management import BaseCommand, CommandError
+
+from train_station.benchmarks import (
+    calibrate,
+    find_regressions,
+    run_benchmarks,
+)
+
+
+class Command(BaseCommand):
+    """Django command to run the serializer and queryset microbenchmarks"""
+
+    help = (
+        "Time serializers, ticket validation and viewset querysets, save "
+        "the results as JSON and fail on regressions against a baseline"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--sizes",
+            type=int,
+            nargs="+",
+            default=[1000, 10000, 100000],
+            help="Page sizes for the serializer and validator benchmarks",
+        )
+        parser.add_argument(
+            "--queryset-loops",
+            type=int,
+            default=1000,
+            help="get_queryset() calls per queryset benchmark",
+        )
+        parser.add_argument("--repeat", type=int, default=3)
+        parser.add_argument(
+            "--only",
+            nargs="+",
+            help="Run benchmarks whose name contains any of these",
+        )
+        parser.add_argument("--output", help="Write the results to this file")
+        parser.add_argument(
+            "--baseline",
+            default="benchmarks/baseline.json",
+            help="Results file to compare against",
+        )
+        parser.add_argument(
+            "--threshold",
+            type=float,
+            default=0.25,
+            help="Allowed slowdown against the baseline, after scaling it "
+            "by the calibration run (0.25 = 25%%)",
+        )
+        parser.add_argument(
+            "--save-baseline",
+            action="store_true",
+            help="Store this run as the new baseline instead of comparing",
+        )
+        parser.add_argument(
+            "--allow-missing-baseline",
+            action="store_true",
+            help="Only report timings when there is no baseline to compare",
+        )
+
+    def handle(self, *args, **options):
+        baseline_path = Path(options["baseline"])
+        baseline, scale = {}, 1.0
+        calibration = calibrate()
+        if not options["save_baseline"]:
+            if baseline_path.exists():
+                report = json.loads(baseline_path.read_text())
+                if "calibration" not in report:
+                    raise CommandError(
+                        f"Baseline {baseline_path} has no calibration, "
+                        "re-record it with --save-baseline."
+                    )
+                baseline = report["results"]
+                scale = calibration / report["calibration"]
+            elif not options["allow_missing_baseline"]:
+                raise CommandError(
+                    f"No baseline at {baseline_path}, run with "
+                    "--save-baseline to create one or pass "
+                    "--allow-missing-baseline."
+                )
+
+        self.stdout.write(
+            f"{'calibration':<60} {calibration * 1000:10.2f} ms"
+            + (f" x{scale:.2f} baseline" if baseline else "")
+        )
+        results = run_benchmarks(
+            sizes=options["sizes"],
+            queryset_loops=options["queryset_loops"],
+            repeat=options["repeat"],
+            only=options["only"],
+        )
+        report = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "django": django.get_version(),
+            "calibration": calibration,
+            "results": results,
+        }
+
+        for name, seconds in results.items():
+            line = f"{name:<60} {seconds * 1000:10.2f} ms"
+            if name in baseline:
+                change = seconds / (baseline[name] * scale) - 1
+                line += f" {change:+7.1%}"
+            self.stdout.write(line)
+
+        if options["output"]:
+            Path(options["output"]).write_text(json.dumps(report, indent=2))
+
+        if options["save_baseline"]:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            baseline_path.write_text(json.dumps(report, indent=2))
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline saved to {baseline_path}")
+            )
+            return
+
+        if not baseline:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"No baseline at {baseline_path}, run with "
+                    "--save-baseline to create one."
+                )
+            )
+            return
+
+        regressions = find_regressions(
+            results, baseline, options["threshold"], scale
+        )
+        if regressions:
+            raise CommandError(
+                "Benchmarks regressed beyond "
+                f"{options['threshold']:.0%}: "
+                + ", ".join(
+                    f"{name} {old * 1000:.2f} -> {new * 1000:.2f} ms"
+                    for name, old, new in regressions
+                )
+            )
+
+        self.stdout.write(self.style.SUCCESS("No regressions."))
@@ -0,0 +1,235 @@
+import random
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import BaseCommand
+from django.db import IntegrityError, connection, connections, transaction
+from rest_framework import serializers
+from rest_framework.exceptions import APIException
+
+from train_station.booking import book_tickets
+from train_station.models import (
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+    TrainType,
+)
+from train_station.seat_holds import get_seat_hold_store
+
+
+def _legacy_book(user, journey, seats):
+    """The pre-engine OrderSerializer path
+
+    Each ticket loads and range-checks its journey, then the journey row
+    is locked and every seat is checked and taken one by one before the
+    order, its tickets and the seat map are written.
+    """
+    for cargo, seat in seats:
+        Ticket.validate_ticket(
+            cargo=cargo,
+            seat=seat,
+            train=Journey.objects.select_related("train")
+            .get(pk=journey.pk)
+            .train,
+            error_to_raise=serializers.ValidationError,
+        )
+
+    with transaction.atomic():
+        journey = (
+            Journey.objects.select_for_update(of=("self",))
+            .select_related("train")
+            .in_bulk([journey.pk])[journey.pk]
+        )
+        held_seats = set(get_seat_hold_store().held_seats(journey.pk, seats))
+        errors = []
+        for cargo, seat in seats:
+            try:
+                Ticket.validate_ticket(
+                    cargo=cargo,
+                    seat=seat,
+                    train=journey.train,
+                    error_to_raise=serializers.ValidationError,
+                    journey=journey,
+                )
+                if (cargo, seat) in held_seats:
+                    raise serializers.ValidationError(
+                        {"seat": f"Seat {seat} in cargo {cargo} is on hold"}
+                    )
+            except serializers.ValidationError as error:
+                errors.append(error.detail)
+            else:
+                journey.take_seats([(cargo, seat)])
+                errors.append({})
+
+        if any(errors):
+            raise serializers.ValidationError({"tickets": errors})
+
+        order = Order.objects.create(user=user)
+        Ticket.objects.bulk_create(
+            [
+                Ticket(order=order, journey=journey, cargo=cargo, seat=seat)
+                for cargo, seat in seats
+            ]
+        )
+        Journey.objects.bulk_update([journey], ["seat_map", "updated_at"])
+
+
+def _engine_book(user, journey, seats):
+    book_tickets(
+        [(journey.pk, cargo, seat) for cargo, seat in seats], user=user
+    )
+
+
+class Command(BaseCommand):
+    """Django command to benchmark concurrent bookings on one journey"""
+
+    help = (
+        "Book random seats on one journey from parallel clients and report "
+        "throughput and conflict rate of the legacy and engine paths"
+    )
+    paths = {"legacy": _legacy_book, "engine": _engine_book}
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=20)
+        parser.add_argument(
+            "--orders", type=int, default=20, help="Orders per client"
+        )
+        parser.add_argument(
+            "--seats", type=int, default=2, help="Tickets per order"
+        )
+        parser.add_argument("--cargo-num", type=int, default=10)
+        parser.add_argument("--places-in-cargo", type=int, default=50)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--path",
+            choices=["legacy", "engine", "both"],
+            default="both",
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor == "sqlite":
+            self.stdout.write(
+                self.style.WARNING(
+                    "SQLite serializes all writers, numbers will not "
+                    "reflect Postgres row locking."
+                )
+            )
+
+        paths = (
+            ["legacy", "engine"]
+            if options["path"] == "both"
+            else [options["path"]]
+        )
+        fixtures = self._create_fixtures(options)
+        try:
+            for path in paths:
+                journey = Journey.objects.create(
+                    route=fixtures["route"],
+                    train=fixtures["train"],
+                    departure_time="2030-01-01T08:00:00",
+                    arrival_time="2030-01-01T12:00:00",
+                )
+                self._report(path, self._run(path, journey, fixtures, options))
+        finally:
+            self._delete_fixtures(fixtures)
+
+    def _create_fixtures(self, options):
+        suffix = uuid.uuid4().hex[:8]
+        source = Station.objects.create(
+            name=f"bench-{suffix}-a", latitude=0, longitude=0
+        )
+        destination = Station.objects.create(
+            name=f"bench-{suffix}-b", latitude=0, longitude=1
+        )
+        train_type = TrainType.objects.create(name=f"bench-{suffix}")
+        return {
+            "user": get_user_model().objects.create_user(
+                f"bench-{suffix}@example.com", uuid.uuid4().hex
+            ),
+            "stations": [source, destination],
+            "train_type": train_type,
+            "route": Route.objects.create(
+                source=source, destination=destination, distance=100
+            ),
+            "train": Train.objects.create(
+                name=f"bench-{suffix}",
+                cargo_num=options["cargo_num"],
+                places_in_cargo=options["places_in_cargo"],
+                train_type=train_type,
+            ),
+        }
+
+    @staticmethod
+    def _delete_fixtures(fixtures):
+        fixtures["user"].delete()
+        fixtures["route"].delete()
+        fixtures["train"].delete()
+        fixtures["train_type"].delete()
+        for station in fixtures["stations"]:
+            station.delete()
+
+    def _run(self, path, journey, fixtures, options):
+        book = self.paths[path]
+        seats = [
+            (cargo, seat)
+            for cargo in range(1, options["cargo_num"] + 1)
+            for seat in range(1, options["places_in_cargo"] + 1)
+        ]
+        latencies, outcomes = [], []
+        lock = threading.Lock()
+
+        def client(client_id):
+            rng = random.Random(options["seed"] * 100003 + client_id)
+            try:
+                for _ in range(options["orders"]):
+                    chosen = rng.sample(seats, options["seats"])
+                    started = time.perf_counter()
+                    try:
+                        book(fixtures["user"], journey, chosen)
+                        outcome = "booked"
+                    except (APIException, IntegrityError, ValidationError):
+                        outcome = "conflict"
+                    except Exception:
+                        outcome = "error"
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+                        outcomes.append(outcome)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options["clients"]) as pool:
+            list(pool.map(client, range(options["clients"])))
+        elapsed = time.perf_counter() - started
+
+        return {
+            "elapsed": elapsed,
+            "attempts": len(outcomes),
+            "booked": outcomes.count("booked"),
+            "conflicts": outcomes.count("conflict"),
+            "errors": outcomes.count("error"),
+            "latencies": sorted(latencies),
+        }
+
+    def _report(self, path, result):
+        latencies = result["latencies"]
+        p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+        self.stdout.write(
+            f"{path:>6}: "
+            f"{result['attempts'] / result['elapsed']:.1f} orders/s, "
+            f"{result['booked']} booked, "
+            f"{result['conflicts']} conflicts "
+            f"({result['conflicts'] / max(result['attempts'], 1):.1%}), "
+            f"{result['errors']} errors, "
+            f"p50 {statistics.median(latencies or [0]) * 1000:.1f} ms, "
+            f"p95 {p95 * 1000:.1f} ms"
+        )
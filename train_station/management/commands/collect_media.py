@@ -0,0 +1,40 @@
+from itertools import islice
+
+from django.core.management import BaseCommand
+
+from train_station.storage import release_media, walk_media
+
+
+class Command(BaseCommand):
+    """Django command to delete media files no train refers to"""
+
+    help = "Delete uploaded images and image variants nothing refers to"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=None,
+            help="Keep files younger than this many seconds "
+            "(defaults to MEDIA_GC_GRACE_SECONDS)",
+        )
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        names = walk_media()
+        scanned = deleted = 0
+        while chunk := list(islice(names, options["batch_size"])):
+            scanned += len(chunk)
+            for name in release_media(
+                chunk, grace=options["grace"], dry_run=options["dry_run"]
+            ):
+                deleted += 1
+                self.stdout.write(name)
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {deleted} of {scanned} media files."
+            )
+        )
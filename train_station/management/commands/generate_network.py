@@ -0,0 +1,273 @@
+import random
+import time
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from train_station.bulk_load import RowWriter, next_id, reset_sequences
+from train_station.geo import haversine_km, invalidate_station_index
+from train_station.models import (
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+    TrainType,
+)
+from train_station.response_cache import invalidate_response_cache
+from train_station.route_planner import invalidate_route_graph
+from train_station.seat_map import SeatMap
+
+TRAIN_TYPES = ("Regional", "Intercity", "Intercity+", "Night", "Freight")
+
+
+class Command(BaseCommand):
+    """Django command to generate a seeded synthetic railway network"""
+
+    help = (
+        "Generate stations, routes, trains, journeys, orders and tickets "
+        "for load testing, streamed with COPY on PostgreSQL"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stations", type=int, default=1000)
+        parser.add_argument("--routes", type=int, default=10000)
+        parser.add_argument("--trains", type=int, default=200)
+        parser.add_argument("--journeys", type=int, default=50000)
+        parser.add_argument(
+            "--fill",
+            type=float,
+            default=0.3,
+            help="Average share of seats sold per journey (0-1)",
+        )
+        parser.add_argument(
+            "--max-tickets-per-order", type=int, default=4
+        )
+        parser.add_argument(
+            "--start",
+            default="2024-01-01",
+            help="First departure date (YYYY-MM-DD)",
+        )
+        parser.add_argument(
+            "--days", type=int, default=365, help="Departure window"
+        )
+        parser.add_argument(
+            "--user",
+            default="loadtest@example.com",
+            help="Email of the user owning the orders, created if missing",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=10000)
+
+    def handle(self, *args, **options):
+        if not 0 <= options["fill"] <= 1:
+            raise CommandError("--fill must be between 0 and 1")
+        if options["stations"] < 2 or min(
+            options["routes"], options["trains"]
+        ) < 1:
+            raise CommandError(
+                "Need at least 2 stations, 1 route and 1 train"
+            )
+
+        self.rng = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        user = get_user_model().objects.filter(
+            email=options["user"]
+        ).first() or get_user_model().objects.create_user(options["user"])
+
+        started = time.perf_counter()
+        with transaction.atomic():
+            writers = [
+                *self._generate_stations(options),
+                *self._generate_routes(options),
+                *self._generate_trains(options),
+                *self._generate_journeys(options, user.pk),
+            ]
+            reset_sequences(
+                connection,
+                [Station, Route, TrainType, Train, Journey, Order, Ticket],
+            )
+        elapsed = time.perf_counter() - started
+
+        invalidate_station_index()
+        invalidate_route_graph()
+        invalidate_response_cache(Station, Route, TrainType, Train, Journey)
+
+        for writer in writers:
+            self.stdout.write(
+                f"{str(writer.model._meta.verbose_name_plural):>12}: "
+                f"{writer.written:>10} rows, "
+                f"{writer.written / max(writer.seconds, 1e-9):>10.0f} rows/s"
+            )
+        total = sum(writer.written for writer in writers)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Generated {total} rows in {elapsed:.1f} s "
+                f"({total / elapsed:.0f} rows/s)."
+            )
+        )
+
+    def _writer(self, model, fields):
+        return RowWriter(connection, model, fields, self.batch_size)
+
+    def _generate_stations(self, options):
+        writer = self._writer(
+            Station, ["id", "name", "latitude", "longitude", "updated_at"]
+        )
+        first_id = next_id(Station)
+        now = datetime.now()
+        self.stations = []
+        for index in range(options["stations"]):
+            station = (
+                first_id + index,
+                round(self.rng.uniform(44.5, 52.3), 5),
+                round(self.rng.uniform(22.2, 40.2), 5),
+            )
+            self.stations.append(station)
+            writer.write(
+                (station[0], f"Station {station[0]:05d}", *station[1:], now)
+            )
+
+        writer.flush()
+        return [writer]
+
+    def _generate_routes(self, options):
+        writer = self._writer(
+            Route, ["id", "source", "destination", "distance", "updated_at"]
+        )
+        first_id = next_id(Route)
+        now = datetime.now()
+        self.routes = []
+        for index in range(options["routes"]):
+            source, destination = self.rng.sample(self.stations, 2)
+            distance = max(
+                round(haversine_km(*source[1:], *destination[1:])), 1
+            )
+            self.routes.append((first_id + index, distance))
+            writer.write(
+                (first_id + index, source[0], destination[0], distance, now)
+            )
+
+        writer.flush()
+        return [writer]
+
+    def _generate_trains(self, options):
+        type_writer = self._writer(TrainType, ["id", "name", "updated_at"])
+        train_writer = self._writer(
+            Train,
+            [
+                "id", "name", "cargo_num", "places_in_cargo",
+                "train_type", "image_variants", "updated_at",
+            ],
+        )
+        first_type_id = next_id(TrainType)
+        first_train_id = next_id(Train)
+        now = datetime.now()
+        suffix = f"{first_type_id:x}"
+        for index, name in enumerate(TRAIN_TYPES):
+            type_writer.write((first_type_id + index, f"{name} {suffix}", now))
+
+        self.trains = []
+        for index in range(options["trains"]):
+            train = (
+                first_train_id + index,
+                self.rng.randint(4, 16),
+                self.rng.choice((36, 54, 64, 80)),
+            )
+            self.trains.append(train)
+            train_writer.write(
+                (
+                    train[0],
+                    f"Train {train[0]:05d}",
+                    *train[1:],
+                    first_type_id + index % len(TRAIN_TYPES),
+                    "{}",
+                    now,
+                )
+            )
+
+        type_writer.flush()
+        train_writer.flush()
+        return [type_writer, train_writer]
+
+    def _generate_journeys(self, options, user_id):
+        journey_writer = self._writer(
+            Journey,
+            [
+                "id", "route", "train", "departure_time", "arrival_time",
+                "seat_map", "seats_sold", "updated_at",
+            ],
+        )
+        order_writer = self._writer(
+            Order, ["id", "user", "created_at", "updated_at"]
+        )
+        ticket_writer = self._writer(
+            Ticket,
+            ["id", "cargo", "seat", "journey", "order", "updated_at"],
+        )
+        journey_id = next_id(Journey)
+        order_id = next_id(Order)
+        ticket_id = next_id(Ticket)
+        start = datetime.strptime(options["start"], "%Y-%m-%d")
+        window = options["days"] * 24 * 60
+        now = datetime.now()
+
+        for _ in range(options["journeys"]):
+            route_id, distance = self.rng.choice(self.routes)
+            train_id, cargo_num, places_in_cargo = self.rng.choice(
+                self.trains
+            )
+            departure = start + timedelta(
+                minutes=self.rng.randrange(0, window, 5)
+            )
+            arrival = departure + timedelta(
+                minutes=max(round(distance / 80 * 60), 15)
+            )
+
+            # Distinct positions keep tickets unique and within capacity.
+            seat_map = SeatMap(cargo_num, places_in_cargo)
+            capacity = seat_map.capacity
+            sold = min(
+                round(capacity * self.rng.uniform(0, 2 * options["fill"])),
+                capacity,
+            )
+            positions = self.rng.sample(range(capacity), sold)
+            for position in positions:
+                cargo, seat = divmod(position, places_in_cargo)
+                seat_map.add(cargo + 1, seat + 1)
+
+            journey_writer.write(
+                (
+                    journey_id, route_id, train_id, departure, arrival,
+                    seat_map.to_bytes(), sold, now,
+                )
+            )
+
+            index = 0
+            while index < sold:
+                size = self.rng.randint(
+                    1, options["max_tickets_per_order"]
+                )
+                created_at = departure - timedelta(
+                    minutes=self.rng.randint(60, 60 * 24 * 60)
+                )
+                order_writer.write((order_id, user_id, created_at, now))
+                for position in positions[index:index + size]:
+                    cargo, seat = divmod(position, places_in_cargo)
+                    ticket_writer.write(
+                        (ticket_id, cargo + 1, seat + 1, journey_id,
+                         order_id, now)
+                    )
+                    ticket_id += 1
+                index += size
+                order_id += 1
+
+            journey_id += 1
+
+        for writer in (journey_writer, order_writer, ticket_writer):
+            writer.flush()
+
+        return [journey_writer, order_writer, ticket_writer]
@@ -0,0 +1,64 @@
+from pathlib import Path
+
+from django.core.management import BaseCommand, CommandError
+
+from train_station.timetable_import import import_timetable
+
+FEED_FILES = ("stops", "routes", "trips")
+
+
+class Command(BaseCommand):
+    """Django command to import a GTFS-style timetable feed"""
+
+    help = (
+        "Upsert stations, routes and journeys from stops.txt, routes.txt "
+        "and trips.txt, either in a feed directory or given one by one"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "feed",
+            nargs="?",
+            help="Directory containing stops.txt, routes.txt and trips.txt",
+        )
+        for name in FEED_FILES:
+            parser.add_argument(f"--{name}", help=f"Path to {name}.txt")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        paths = {}
+        for name in FEED_FILES:
+            if options[name]:
+                paths[name] = Path(options[name])
+            elif options["feed"]:
+                path = Path(options["feed"]) / f"{name}.txt"
+                if path.exists():
+                    paths[name] = path
+
+        if not paths:
+            raise CommandError("No timetable files to import")
+        for path in paths.values():
+            if not path.is_file():
+                raise CommandError(f"{path} does not exist")
+
+        files = {
+            name: path.open(newline="", encoding="utf-8-sig")
+            for name, path in paths.items()
+        }
+        try:
+            stats, errors = import_timetable(
+                chunk_size=options["chunk_size"], **files
+            )
+        finally:
+            for file in files.values():
+                file.close()
+
+        for filename, counts in stats.items():
+            self.stdout.write(
+                f"{filename}: {counts['created']} created, "
+                f"{counts['updated']} updated, "
+                f"{counts['unchanged']} unchanged, "
+                f"{counts['errors']} errors"
+            )
+        for error in errors:
+            self.stdout.write(self.style.WARNING(error))
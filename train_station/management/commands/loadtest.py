@@ -0,0 +1,156 @@
+import asyncio
+import time
+from collections import Counter
+from urllib.parse import urlsplit
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import AccessToken
+
+
+async def _read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed by the server")
+
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip().lower()
+
+    if headers.get("transfer-encoding") == "chunked":
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+
+    return int(status_line.split()[1]), headers.get("connection") == "close"
+
+
+class Command(BaseCommand):
+    """Django command to load test running servers over keep-alive HTTP"""
+
+    help = (
+        "Hammer one or more URLs (e.g. the WSGI and the async ASGI journey "
+        "list) with concurrent keep-alive connections and report requests "
+        "per second and latency percentiles"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("urls", nargs="+")
+        parser.add_argument("--connections", type=int, default=500)
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds per URL"
+        )
+        parser.add_argument("--token", help="JWT access token")
+        parser.add_argument(
+            "--user", help="Email of a user to issue a JWT access token for"
+        )
+
+    def handle(self, *args, **options):
+        token = options["token"]
+        if options["user"]:
+            try:
+                user = get_user_model().objects.get(email=options["user"])
+            except get_user_model().DoesNotExist:
+                raise CommandError(f"No user with email {options['user']}")
+            token = str(AccessToken.for_user(user))
+
+        for url in options["urls"]:
+            result = asyncio.run(
+                self._run(
+                    url,
+                    token,
+                    options["connections"],
+                    options["duration"],
+                )
+            )
+            self._report(url, result)
+
+    async def _run(self, url, token, connections, duration):
+        parts = urlsplit(url)
+        if parts.scheme != "http":
+            raise CommandError("Only plain http:// URLs are supported")
+
+        host, port = parts.hostname, parts.port or 80
+        request = (
+            f"GET {parts.path or '/'}"
+            f"{'?' + parts.query if parts.query else ''} HTTP/1.1\r\n"
+            f"Host: {parts.netloc}\r\n"
+            "Accept: application/json\r\n"
+            + (f"Authorization: Bearer {token}\r\n" if token else "")
+            + "\r\n"
+        ).encode()
+        latencies, statuses = [], Counter()
+        deadline = time.perf_counter() + duration
+
+        async def client():
+            reader = writer = None
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(
+                            host, port
+                        )
+                    writer.write(request)
+                    await writer.drain()
+                    status, close = await _read_response(reader)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    statuses["error"] += 1
+                    close = True
+                else:
+                    statuses[status] += 1
+                    latencies.append(time.perf_counter() - started)
+
+                if close and writer is not None:
+                    writer.close()
+                    reader = writer = None
+
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(connections)))
+        return {
+            "elapsed": time.perf_counter() - started,
+            "latencies": sorted(latencies),
+            "statuses": statuses,
+        }
+
+    def _report(self, url, result):
+        latencies = result["latencies"]
+
+        def percentile(fraction):
+            if not latencies:
+                return 0
+            index = min(int(len(latencies) * fraction), len(latencies) - 1)
+            return latencies[index] * 1000
+
+        statuses = ", ".join(
+            f"{status}: {count}"
+            for status, count in sorted(
+                result["statuses"].items(), key=lambda item: str(item[0])
+            )
+        )
+        self.stdout.write(
+            f"{url}\n"
+            f"  {len(latencies) / result['elapsed']:.1f} req/s, "
+            f"p50 {percentile(0.5):.1f} ms, "
+            f"p95 {percentile(0.95):.1f} ms, "
+            f"p99 {percentile(0.99):.1f} ms\n"
+            f"  responses: {statuses}"
+        )
+        if set(result["statuses"]) - {200}:
+            self.stdout.write(
+                self.style.WARNING(
+                    "  Non-200 responses were counted, raise the throttle "
+                    "rates before comparing servers."
+                )
+            )
@@ -0,0 +1,88 @@
+import time
+from datetime import timedelta
+
+from django.core.management import BaseCommand
+from django.utils import timezone
+
+from train_station.availability import (
+    availability_changes,
+    is_materialized,
+    refresh_journey_availability,
+)
+
+
+class Command(BaseCommand):
+    """Django command to refresh the journey availability view"""
+
+    help = (
+        "Refresh the journey availability materialized view once changes "
+        "have settled for --quiet seconds or are --max-lag seconds old. "
+        "With --interval it keeps polling, otherwise it runs once (cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=0,
+            help="Seconds between checks, 0 runs a single check",
+        )
+        parser.add_argument(
+            "--quiet",
+            type=float,
+            default=5,
+            help="Refresh after this many seconds without writes",
+        )
+        parser.add_argument(
+            "--max-lag",
+            type=float,
+            default=60,
+            help="Refresh during write bursts once the view is this old",
+        )
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Refresh even if nothing changed",
+        )
+        parser.add_argument(
+            "--blocking",
+            action="store_true",
+            help="Refresh without CONCURRENTLY, locking out readers",
+        )
+
+    def handle(self, *args, **options):
+        if not is_materialized():
+            self.stdout.write(
+                "Journey availability is a plain view on this database "
+                "and is always current."
+            )
+            return
+
+        while True:
+            self._check(options)
+            if not options["interval"]:
+                break
+            time.sleep(options["interval"])
+
+    def _check(self, options):
+        refreshed_at, last_change = availability_changes()
+        if not options["force"]:
+            if last_change is None:
+                return
+
+            now = timezone.now()
+            settled = now - last_change >= timedelta(seconds=options["quiet"])
+            lagging = refreshed_at is None or (
+                now - refreshed_at >= timedelta(seconds=options["max_lag"])
+            )
+            if not (settled or lagging):
+                return
+
+        started = time.perf_counter()
+        refresh_journey_availability(concurrently=not options["blocking"])
+        self.stdout.write(
+            self.style.SUCCESS(
+                "Journey availability refreshed in "
+                f"{time.perf_counter() - started:.2f} s."
+            )
+        )
@@ -0,0 +1,43 @@
+from django.core.management import BaseCommand, CommandError
+
+from train_station.image_variants import (
+    generate_image_variants,
+    trains_missing_variants,
+)
+
+
+class Command(BaseCommand):
+    """Django command to render train image variants that were lost"""
+
+    help = (
+        "Render the image variants of trains that have an image but no "
+        "variants, e.g. because a worker restarted before rendering them"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--dry-run", action="store_true")
+
+    def handle(self, *args, **options):
+        train_ids = list(
+            trains_missing_variants().values_list("id", flat=True)
+        )
+        failed = 0
+        for train_id in train_ids:
+            self.stdout.write(f"Train {train_id}")
+            if options["dry_run"]:
+                continue
+
+            try:
+                generate_image_variants(train_id)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f"Train {train_id} failed: {error}")
+
+        verb = "Would render" if options["dry_run"] else "Rendered"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} variants of {len(train_ids) - failed} trains."
+            )
+        )
+        if failed:
+            raise CommandError(f"Rendering failed for {failed} trains.")
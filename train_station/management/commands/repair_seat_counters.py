@@ -0,0 +1,73 @@
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from train_station.models import Journey, Ticket
+
+
+class Command(BaseCommand):
+    """Django command to check Journey.seats_sold against real tickets"""
+
+    help = (
+        "Compare every journey's seats_sold counter with its ticket count "
+        "and fix the drifted ones"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report drifted journeys",
+        )
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        drifted = list(
+            Journey.objects.order_by("pk")
+            .annotate(tickets_count=Count("tickets"))
+            .exclude(seats_sold=F("tickets_count"))
+            .values_list("pk", "seats_sold", "tickets_count")
+        )
+        for journey_id, seats_sold, tickets_count in drifted:
+            self.stdout.write(
+                f"Journey {journey_id}: seats_sold={seats_sold}, "
+                f"tickets={tickets_count}"
+            )
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS("All counters match."))
+            return
+
+        if options["dry_run"]:
+            self.stdout.write(
+                self.style.WARNING(f"{len(drifted)} journeys drifted.")
+            )
+            return
+
+        tickets = (
+            Ticket.objects.filter(journey=OuterRef("pk"))
+            .order_by()
+            .values("journey")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        journey_ids = [journey_id for journey_id, _, _ in drifted]
+        batch_size = options["batch_size"]
+        for start in range(0, len(journey_ids), batch_size):
+            batch = journey_ids[start:start + batch_size]
+            with transaction.atomic():
+                # Same lock order as bookings, then recount under the lock.
+                list(
+                    Journey.objects.select_for_update()
+                    .filter(pk__in=batch)
+                    .order_by("pk")
+                    .values_list("pk", flat=True)
+                )
+                Journey.objects.filter(pk__in=batch).update(
+                    seats_sold=Coalesce(Subquery(tickets), 0)
+                )
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Repaired {len(drifted)} journeys.")
+        )
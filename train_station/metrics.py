@@ -0,0 +1,432 @@
+"""Request metrics aggregated across worker processes.
+
+Each process adds observations to in-memory counters and a daemon
+thread flushes the deltas to a shared store every
+``METRICS_FLUSH_INTERVAL`` seconds, so a request only pays for a few
+dict updates. Per-process gauges (connection pools) are written with a
+``pid`` label and dropped once their process stops refreshing them.
+"""
+import atexit
+import bisect
+import hmac
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import HttpResponse
+from django.utils.module_loading import import_string
+
+from train_station.db_pool import pool_stats
+from train_station.response_cache import response_cache_stats
+from train_station.sqlite_store import SQLiteStore
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+HISTOGRAM_BUCKETS = {
+    "http_request_duration_seconds": DURATION_BUCKETS,
+    "http_request_db_queries": QUERY_BUCKETS,
+}
+_LE = {
+    name: [*map(str, buckets), "+Inf"]
+    for name, buckets in HISTOGRAM_BUCKETS.items()
+}
+
+METRICS = {
+    "http_requests_total": (
+        "counter", "Requests by view, method and status",
+    ),
+    "http_request_duration_seconds": (
+        "histogram", "Request latency by view",
+    ),
+    "http_request_db_queries": (
+        "histogram", "SQL queries per request by view",
+    ),
+    "http_request_db_seconds_total": (
+        "counter", "Time spent in SQL queries by view",
+    ),
+    "http_response_size_bytes_total": (
+        "counter", "Response body bytes by view, streamed bodies excluded",
+    ),
+    "db_pool_connections": (
+        "gauge", "Pooled database connections by state",
+    ),
+    "db_pool_waiting": (
+        "gauge", "Requests waiting for a pooled connection",
+    ),
+    "db_pool_checkouts_total": (
+        "counter", "Connections handed out by the pool",
+    ),
+    "db_pool_timeouts_total": (
+        "counter", "Checkouts that gave up waiting",
+    ),
+    "db_pool_wait_seconds_total": (
+        "counter", "Time spent waiting for pooled connections",
+    ),
+    "response_cache_hits_total": (
+        "counter", "Reference-data response cache hits",
+    ),
+    "response_cache_misses_total": (
+        "counter", "Reference-data response cache misses",
+    ),
+}
+
+
+def _key(name, labels):
+    return name, json.dumps(labels, sort_keys=True, separators=(",", ":"))
+
+
+class BaseMetricsStore:
+    """Shared totals: ``add`` sums counter deltas, ``set`` replaces one
+    process's gauges, ``collect`` returns ``{(name, labels): value}``
+    with labels as the JSON of a dict."""
+
+    def add(self, deltas):
+        raise NotImplementedError
+
+    def set(self, pid, values, stale_after):
+        raise NotImplementedError
+
+    def collect(self):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalMetricsStore(BaseMetricsStore):
+    """In-process store for tests and single-process servers"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = defaultdict(float)
+        self._gauges = {}
+
+    def add(self, deltas):
+        with self._lock:
+            for key, value in deltas.items():
+                self._totals[key] += value
+
+    def set(self, pid, values, stale_after):
+        with self._lock:
+            self._gauges[pid] = dict(values)
+
+    def collect(self):
+        with self._lock:
+            samples = dict(self._totals)
+            for values in self._gauges.values():
+                samples.update(values)
+
+        return samples
+
+    def clear(self):
+        with self._lock:
+            self._totals.clear()
+            self._gauges.clear()
+
+
+class SQLiteMetricsStore(SQLiteStore, BaseMetricsStore):
+    """Totals and gauges in a SQLite file"""
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS metric_total ("
+        "name TEXT NOT NULL, labels TEXT NOT NULL, "
+        "value REAL NOT NULL, PRIMARY KEY (name, labels)) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS metric_gauge ("
+        "pid INTEGER NOT NULL, name TEXT NOT NULL, "
+        "labels TEXT NOT NULL, value REAL NOT NULL, "
+        "updated REAL NOT NULL, PRIMARY KEY (pid, name, labels)) "
+        "WITHOUT ROWID",
+    )
+
+    def _write(self, statements):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in statements:
+                connection.executemany(sql, params)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def add(self, deltas):
+        self._write(
+            [
+                (
+                    "INSERT INTO metric_total (name, labels, value) "
+                    "VALUES (?, ?, ?) ON CONFLICT (name, labels) "
+                    "DO UPDATE SET value = value + excluded.value",
+                    [(*key, value) for key, value in deltas.items()],
+                )
+            ]
+        )
+
+    def set(self, pid, values, stale_after):
+        now = time.time()
+        self._write(
+            [
+                ("DELETE FROM metric_gauge WHERE pid = ?", [(pid,)]),
+                (
+                    "DELETE FROM metric_gauge WHERE updated < ?",
+                    [(now - stale_after,)],
+                ),
+                (
+                    "INSERT INTO metric_gauge "
+                    "(pid, name, labels, value, updated) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [(pid, *key, value, now) for key, value in values.items()],
+                ),
+            ]
+        )
+
+    def collect(self):
+        connection = self._connection()
+        samples = {
+            (name, labels): value
+            for name, labels, value in connection.execute(
+                "SELECT name, labels, value FROM metric_total"
+            )
+        }
+        samples.update(
+            ((name, labels), value)
+            for name, labels, value in connection.execute(
+                "SELECT name, labels, value FROM metric_gauge"
+            )
+        )
+        return samples
+
+    def clear(self):
+        self._write(
+            [
+                ("DELETE FROM metric_total", [()]),
+                ("DELETE FROM metric_gauge", [()]),
+            ]
+        )
+
+
+class MetricsRegistry:
+    """Per-process counters flushed to the shared store"""
+
+    def __init__(self, store, flush_interval=1.0):
+        self.store = store
+        self.flush_interval = flush_interval
+        self.pid = os.getpid()
+        self._lock = threading.Lock()
+        self._pending = defaultdict(float)
+        self._flusher = None
+
+    def _observe(self, name, labels, value):
+        # Labels stay tuples here, they become JSON once per flush.
+        buckets = HISTOGRAM_BUCKETS[name]
+        index = bisect.bisect_left(buckets, value)
+        pending = self._pending
+        pending[f"{name}_sum", labels] += value
+        pending[f"{name}_count", labels] += 1
+        pending[f"{name}_bucket", (*labels, ("le", _LE[name][index]))] += 1
+
+    def observe_request(
+        self, view, method, status, seconds, queries, query_seconds, size
+    ):
+        labels = (("view", view), ("method", method))
+        with self._lock:
+            pending = self._pending
+            pending["http_requests_total", (*labels, ("status", status))] += 1
+            self._observe("http_request_duration_seconds", labels, seconds)
+            self._observe("http_request_db_queries", labels, queries)
+            pending["http_request_db_seconds_total", labels] += query_seconds
+            if size is not None:
+                pending["http_response_size_bytes_total", labels] += size
+
+        self._start_flusher()
+
+    def _gauges(self):
+        values = {}
+        for alias, stats in pool_stats().items():
+            labels = {"alias": alias, "pid": str(self.pid)}
+            for state in ("in_use", "idle"):
+                values[
+                    _key("db_pool_connections", {**labels, "state": state})
+                ] = stats[state]
+            values[_key("db_pool_waiting", labels)] = stats["waiting"]
+            values[_key("db_pool_checkouts_total", labels)] = stats[
+                "checkouts"
+            ]
+            values[_key("db_pool_timeouts_total", labels)] = stats[
+                "timeouts"
+            ]
+            values[_key("db_pool_wait_seconds_total", labels)] = stats[
+                "wait_seconds_total"
+            ]
+
+        # Already summed over workers, every process reports the same.
+        cache_stats = response_cache_stats()
+        values[_key("response_cache_hits_total", {})] = cache_stats["hits"]
+        values[_key("response_cache_misses_total", {})] = cache_stats[
+            "misses"
+        ]
+        return values
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(float)
+
+        if pending:
+            self.store.add(
+                {
+                    _key(name, dict(labels)): value
+                    for (name, labels), value in pending.items()
+                }
+            )
+        self.store.set(
+            self.pid, self._gauges(), stale_after=60 * self.flush_interval
+        )
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+        self.store.clear()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception:
+                # A failed flush drops its deltas, the thread carries on.
+                pass
+
+    def _start_flusher(self):
+        if self._flusher is None and self.flush_interval:
+            with self._lock:
+                if self._flusher is not None:
+                    return
+                self._flusher = threading.Thread(
+                    target=self._flush_forever,
+                    name="metrics-flusher",
+                    daemon=True,
+                )
+            self._flusher.start()
+            atexit.register(self.flush)
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_metrics():
+    global _registry
+
+    if _registry is None or _registry.pid != os.getpid():
+        with _registry_lock:
+            if _registry is None or _registry.pid != os.getpid():
+                config = settings.METRICS_STORE
+                _registry = MetricsRegistry(
+                    import_string(config["BACKEND"])(
+                        **config.get("OPTIONS", {})
+                    ),
+                    flush_interval=settings.METRICS_FLUSH_INTERVAL,
+                )
+
+    return _registry
+
+
+@receiver(setting_changed)
+def reset_metrics(setting, **kwargs):
+    global _registry
+
+    if setting in ("METRICS_STORE", "METRICS_FLUSH_INTERVAL"):
+        with _registry_lock:
+            _registry = None
+
+
+def _escape(value):
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace("\n", "\\n")
+        .replace('"', '\\"')
+    )
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+
+    return "{%s}" % ",".join(
+        f'{name}="{_escape(value)}"' for name, value in labels.items()
+    )
+
+
+def render_metrics(samples):
+    """Prometheus text exposition of ``collect()`` output
+
+    Histogram buckets are stored per bucket and made cumulative here.
+    """
+    series = defaultdict(list)
+    for (name, labels), value in samples.items():
+        series[name].append((json.loads(labels), value))
+
+    lines = []
+    for metric, (kind, description) in METRICS.items():
+        names = (
+            [f"{metric}_bucket", f"{metric}_sum", f"{metric}_count"]
+            if kind == "histogram"
+            else [metric]
+        )
+        if not any(series.get(name) for name in names):
+            continue
+
+        lines.append(f"# HELP {metric} {description}")
+        lines.append(f"# TYPE {metric} {kind}")
+        if kind == "histogram":
+            groups = defaultdict(dict)
+            for labels, value in series[f"{metric}_bucket"]:
+                le = labels.pop("le")
+                groups[json.dumps(labels, sort_keys=True)][le] = value
+            for group, counts in sorted(groups.items()):
+                labels = json.loads(group)
+                total = 0
+                for le in _LE[metric]:
+                    total += counts.get(le, 0)
+                    lines.append(
+                        f"{metric}_bucket"
+                        f"{_format_labels({**labels, 'le': le})} {total:g}"
+                    )
+            names = names[1:]
+
+        for name in names:
+            for labels, value in sorted(
+                series.get(name, ()), key=lambda sample: sorted(
+                    sample[0].items()
+                )
+            ):
+                lines.append(f"{name}{_format_labels(labels)} {value:g}")
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint, behind ``METRICS_TOKEN`` if it is set
+
+    Other workers' latest observations show up within one flush
+    interval, this process's right away.
+    """
+    token = settings.METRICS_TOKEN
+    if token and not hmac.compare_digest(
+        request.headers.get("Authorization", ""), f"Bearer {token}"
+    ):
+        return HttpResponse("Unauthorized\n", status=401)
+
+    registry = get_metrics()
+    registry.flush()
+    return HttpResponse(
+        render_metrics(registry.store.collect()),
+        content_type="text/plain; version=0.0.4; charset=utf-8",
+    )
@@ -0,0 +1,243 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from train_station.db_router import replica_reads
+from train_station.metrics import get_metrics
+from train_station.throttling import action_cost_meter, action_key
+
+
+class QueryMeter:
+    """Queries run for one request and the seconds they took"""
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_query_meter = ContextVar("query_meter", default=None)
+
+
+def _measure_query(execute, sql, params, many, context):
+    meter = _query_meter.get()
+    if meter is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        meter.queries += 1
+        meter.seconds += time.perf_counter() - started
+
+
+@receiver(connection_created)
+def install_query_meter(sender, connection, **kwargs):
+    """Count every connection's queries into the request's QueryMeter
+
+    Connections belong to threads while the meter is a context variable,
+    so queries sync_to_async runs for an async request count too.
+    """
+    if _measure_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_measure_query)
+
+
+class Measurement:
+    queries = 0
+    query_seconds = 0.0
+    seconds = 0.0
+
+
+@contextmanager
+def measure():
+    """Measure the queries and time of the block
+
+    Nested blocks share the outermost block's QueryMeter, so queries are
+    counted once however many middlewares measure them.
+    """
+    meter = _query_meter.get()
+    token = None
+    if meter is None:
+        meter = QueryMeter()
+        token = _query_meter.set(meter)
+    queries, query_seconds = meter.queries, meter.seconds
+    measurement = Measurement()
+    started = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        measurement.seconds = time.perf_counter() - started
+        measurement.queries = meter.queries - queries
+        measurement.query_seconds = meter.seconds - query_seconds
+        if token is not None:
+            _query_meter.reset(token)
+
+
+def view_action(request):
+    """``(viewset, action)`` of the DRF view that handled ``request``
+
+    Both are None for other views, the action is None when the viewset
+    has none for the method.
+    """
+    match = request.resolver_match
+    view_class = getattr(match.func, "cls", None) if match else None
+    if view_class is None:
+        return None, None
+
+    method = request.method.lower()
+    actions = getattr(match.func, "actions", None)
+    return view_class, actions.get(method) if actions else method
+
+
+def view_label(request):
+    """``ViewSet.action`` for DRF views, ``View.method`` for other class
+    views and the URL name, or its dotted path, for the rest"""
+    match = request.resolver_match
+    if match is None:
+        return "unmatched"
+
+    method = request.method.lower()
+    view_class, action = view_action(request)
+    if view_class is not None:
+        return f"{view_class.__name__}.{action or method}"
+
+    view_class = getattr(match.func, "view_class", None)
+    if view_class is not None:
+        return f"{view_class.__name__}.{method}"
+    return match.view_name
+
+
+class MeasuringMiddleware:
+    """Sync and async middleware passing each request's measurement
+    to ``record(request, response, measurement)``"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        with measure() as measurement:
+            response = self.get_response(request)
+        self.record(request, response, measurement)
+        return response
+
+    async def __acall__(self, request):
+        with measure() as measurement:
+            response = await self.get_response(request)
+        self.record(request, response, measurement)
+        return response
+
+    def record(self, request, response, measurement):
+        raise NotImplementedError
+
+
+class MetricsMiddleware(MeasuringMiddleware):
+    """Record latency, SQL queries, response size and status per view
+
+    Keep it first in ``MIDDLEWARE`` so the latency covers the rest.
+    """
+
+    def record(self, request, response, measurement):
+        get_metrics().observe_request(
+            view=view_label(request),
+            method=request.method,
+            status=str(response.status_code),
+            seconds=measurement.seconds,
+            queries=measurement.queries,
+            query_seconds=measurement.query_seconds,
+            size=None if response.streaming else len(response.content),
+        )
+
+
+class ThrottleCostMiddleware(MeasuringMiddleware):
+    """Record the queries and time of each view action for throttling"""
+
+    def record(self, request, response, measurement):
+        view_class, action = view_action(request)
+        if action:
+            action_cost_meter.record(
+                action_key(view_class, action),
+                measurement.queries,
+                measurement.seconds,
+            )
+
+
+class ReplicaRoutingMiddleware:
+    """Route safe reads of ``replica_reads`` views to database replicas
+
+    A write request sets a cookie with its time; later reads from that
+    client only use replicas that have caught up with it, so clients
+    keeping cookies read their own writes.
+    """
+
+    cookie_name = "last_write"
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        # Reads stay on the primary unless process_view raises max_lag.
+        with replica_reads(max_lag=0) as request._replica_reads:
+            response = self.get_response(request)
+        return self._remember_write(request, response)
+
+    async def __acall__(self, request):
+        with replica_reads(max_lag=0) as request._replica_reads:
+            response = await self.get_response(request)
+        return self._remember_write(request, response)
+
+    def _remember_write(self, request, response):
+        if request.method not in ("GET", "HEAD", "OPTIONS"):
+            response.set_cookie(
+                self.cookie_name,
+                f"{time.time():.3f}",
+                max_age=settings.REPLICA_MAX_LAG,
+                httponly=True,
+                samesite="Lax",
+            )
+
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # DRF views carry cls, the async views mirror a viewset_class.
+        view_class = getattr(view_func, "cls", None) or getattr(
+            getattr(view_func, "view_class", None), "viewset_class", None
+        )
+        if (
+            request.method not in ("GET", "HEAD")
+            or not getattr(view_class, "replica_reads", False)
+            or not settings.DATABASE_REPLICAS
+        ):
+            return None
+
+        try:
+            since_write = time.time() - float(
+                request.COOKIES[self.cookie_name]
+            )
+        except (KeyError, ValueError):
+            since_write = settings.REPLICA_MAX_LAG
+        # The routing state is shared with the contexts sync_to_async
+        # copies, so the view sees this even if we run in another one.
+        request._replica_reads["max_lag"] = min(
+            max(since_write, 0), settings.REPLICA_MAX_LAG
+        )
+        return None
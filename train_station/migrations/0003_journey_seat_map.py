@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-18 04:44
+
+from django.db import migrations, models
+
+from train_station.seat_map import SeatMap
+
+
+def fill_seat_maps(apps, schema_editor):
+    Journey = apps.get_model("train_station", "Journey")
+    Ticket = apps.get_model("train_station", "Ticket")
+
+    journeys = Journey.objects.select_related("train")
+    for journey in journeys.iterator():
+        seat_map = SeatMap(
+            journey.train.cargo_num, journey.train.places_in_cargo
+        )
+        tickets = Ticket.objects.filter(journey=journey)
+        for cargo, seat in tickets.values_list("cargo", "seat"):
+            try:
+                seat_map.add(cargo, seat)
+            except IndexError:
+                continue
+        journey.seat_map = seat_map.to_bytes()
+        journey.save(update_fields=["seat_map"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("train_station", "0002_train_image"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="journey",
+            name="seat_map",
+            field=models.BinaryField(default=bytes),
+        ),
+        migrations.RunPython(fill_seat_maps, migrations.RunPython.noop),
+    ]
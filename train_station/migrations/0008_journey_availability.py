@@ -0,0 +1,130 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:04
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+AVAILABILITY_SELECT = """
+    SELECT
+        journey.id AS journey_id,
+        journey.route_id AS route_id,
+        route.source_id AS source_id,
+        source.name AS source_name,
+        route.destination_id AS destination_id,
+        destination.name AS destination_name,
+        journey.train_id AS train_id,
+        train.name AS train_name,
+        journey.departure_time AS departure_time,
+        journey.arrival_time AS arrival_time,
+        train.cargo_num * train.places_in_cargo AS capacity,
+        COALESCE(sold.seats_sold, 0) AS seats_sold,
+        CASE
+            WHEN train.cargo_num * train.places_in_cargo
+                > COALESCE(sold.seats_sold, 0)
+            THEN train.cargo_num * train.places_in_cargo
+                - COALESCE(sold.seats_sold, 0)
+            ELSE 0
+        END AS seats_available,
+        {now} AS refreshed_at
+    FROM train_station_journey journey
+    JOIN train_station_route route ON route.id = journey.route_id
+    JOIN train_station_station source ON source.id = route.source_id
+    JOIN train_station_station destination
+        ON destination.id = route.destination_id
+    JOIN train_station_train train ON train.id = journey.train_id
+    LEFT JOIN (
+        SELECT journey_id, COUNT(*) AS seats_sold
+        FROM train_station_ticket
+        GROUP BY journey_id
+    ) sold ON sold.journey_id = journey.id
+"""
+
+
+def create_availability_view(apps, schema_editor):
+    create_view(schema_editor, AVAILABILITY_SELECT)
+
+
+def create_view(schema_editor, select):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "CREATE MATERIALIZED VIEW train_station_journeyavailability AS "
+            + select.format(now="LOCALTIMESTAMP")
+            + " WITH DATA"
+        )
+        # REFRESH ... CONCURRENTLY needs a unique index on the view.
+        schema_editor.execute(
+            "CREATE UNIQUE INDEX journey_availability_journey_idx "
+            "ON train_station_journeyavailability (journey_id)"
+        )
+        schema_editor.execute(
+            "CREATE INDEX journey_availability_departure_idx "
+            "ON train_station_journeyavailability "
+            "(departure_time, journey_id)"
+        )
+    else:
+        schema_editor.execute(
+            "CREATE VIEW train_station_journeyavailability AS "
+            + select.format(now="CURRENT_TIMESTAMP")
+        )
+
+
+def drop_availability_view(apps, schema_editor):
+    if schema_editor.connection.vendor == "postgresql":
+        schema_editor.execute(
+            "DROP MATERIALIZED VIEW train_station_journeyavailability"
+        )
+    else:
+        schema_editor.execute("DROP VIEW train_station_journeyavailability")
+
+
+def drop_view_for_table_rebuild(apps, schema_editor):
+    # SQLite alters a table by copying it, which fails while the view
+    # references it. Other vendors alter in place and keep the view.
+    if schema_editor.connection.vendor == "sqlite":
+        drop_availability_view(apps, schema_editor)
+
+
+def create_view_after_table_rebuild(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        create_availability_view(apps, schema_editor)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("train_station", "0007_journey_seats_sold"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="JourneyAvailability",
+            fields=[
+                (
+                    "journey",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="availability",
+                        serialize=False,
+                        to="train_station.journey",
+                    ),
+                ),
+                ("source_name", models.CharField(max_length=255)),
+                ("destination_name", models.CharField(max_length=255)),
+                ("train_name", models.CharField(max_length=255)),
+                ("departure_time", models.DateTimeField()),
+                ("arrival_time", models.DateTimeField()),
+                ("capacity", models.IntegerField()),
+                ("seats_sold", models.IntegerField()),
+                ("seats_available", models.IntegerField()),
+                ("refreshed_at", models.DateTimeField()),
+            ],
+            options={
+                "verbose_name_plural": "journey availability",
+                "db_table": "train_station_journeyavailability",
+                "ordering": ["departure_time", "journey_id"],
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(
+            create_availability_view, drop_availability_view
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7 on 2026-10-18 05:12
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# SQLite rebuilds tables to add unique columns, which fails while the
+# availability view references them, so there the view is recreated
+# around it.
+availability = import_module(
+    "train_station.migrations.0008_journey_availability"
+)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("train_station", "0008_journey_availability"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            availability.drop_view_for_table_rebuild,
+            availability.create_view_after_table_rebuild,
+        ),
+        migrations.AddField(
+            model_name="journey",
+            name="external_id",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="route",
+            name="external_id",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.AddField(
+            model_name="station",
+            name="external_id",
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+        migrations.RunPython(
+            availability.create_view_after_table_rebuild,
+            availability.drop_view_for_table_rebuild,
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:40
+
+from importlib import import_module
+
+from django.db import migrations, models
+
+# The new column rebuilds the train table on SQLite, see 0009.
+availability = import_module(
+    "train_station.migrations.0008_journey_availability"
+)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("train_station", "0009_external_ids"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            availability.drop_view_for_table_rebuild,
+            availability.create_view_after_table_rebuild,
+        ),
+        migrations.AddField(
+            model_name="train",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.RunPython(
+            availability.create_view_after_table_rebuild,
+            availability.drop_view_for_table_rebuild,
+        ),
+    ]
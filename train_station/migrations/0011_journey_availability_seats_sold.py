@@ -0,0 +1,60 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:40
+
+from importlib import import_module
+
+from django.db import migrations
+
+availability = import_module(
+    "train_station.migrations.0008_journey_availability"
+)
+
+# Journeys keep their own seats_sold counter, the view reads it instead
+# of counting every ticket again on each refresh.
+AVAILABILITY_SELECT = """
+    SELECT
+        journey.id AS journey_id,
+        journey.route_id AS route_id,
+        route.source_id AS source_id,
+        source.name AS source_name,
+        route.destination_id AS destination_id,
+        destination.name AS destination_name,
+        journey.train_id AS train_id,
+        train.name AS train_name,
+        journey.departure_time AS departure_time,
+        journey.arrival_time AS arrival_time,
+        train.cargo_num * train.places_in_cargo AS capacity,
+        journey.seats_sold AS seats_sold,
+        CASE
+            WHEN train.cargo_num * train.places_in_cargo > journey.seats_sold
+            THEN train.cargo_num * train.places_in_cargo - journey.seats_sold
+            ELSE 0
+        END AS seats_available,
+        {now} AS refreshed_at
+    FROM train_station_journey journey
+    JOIN train_station_route route ON route.id = journey.route_id
+    JOIN train_station_station source ON source.id = route.source_id
+    JOIN train_station_station destination
+        ON destination.id = route.destination_id
+    JOIN train_station_train train ON train.id = journey.train_id
+"""
+
+
+def create_availability_view(apps, schema_editor):
+    availability.create_view(schema_editor, AVAILABILITY_SELECT)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("train_station", "0010_train_image_variants"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            availability.drop_availability_view,
+            availability.create_availability_view,
+        ),
+        migrations.RunPython(
+            create_availability_view,
+            availability.drop_availability_view,
+        ),
+    ]
@@ -1,16 +1,25 @@
 import os.path
-import uuid
+from collections import defaultdict
 
 from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils import timezone
 from django.utils.text import slugify
 
+from train_station.seat_map import SeatMap
+
 
 class Station(models.Model):
     name = models.CharField(max_length=255)
     latitude = models.FloatField()
     longitude = models.FloatField()
+    external_id = models.CharField(
+        max_length=64, unique=True, null=True, blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -31,6 +40,10 @@ class Route(models.Model):
         related_name="destination_routes",
     )
     distance = models.IntegerField()
+    external_id = models.CharField(
+        max_length=64, unique=True, null=True, blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def name(self):
@@ -39,9 +52,18 @@ class Route(models.Model):
     def __str__(self):
         return f"{self.source}-{self.destination}"
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["source", "destination"],
+                name="route_source_destination_idx",
+            ),
+        ]
+
 
 class TrainType(models.Model):
     name = models.CharField(max_length=255, unique=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -52,6 +74,7 @@ class TrainType(models.Model):
 
 class Facility(models.Model):
     name = models.CharField(unique=True, max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.name
@@ -62,8 +85,9 @@ class Facility(models.Model):
 
 
 def train_image_file_path(instance, filename):
+    # The storage renames uploads after their content hash.
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(instance.name)}-{uuid.uuid4()}{extension}"
+    filename = f"{slugify(instance.name)}{extension}"
 
     return os.path.join("uploads/trains/", filename)
 
@@ -87,6 +111,34 @@ class Train(models.Model):
         blank=True,
         upload_to=train_image_file_path
     )
+    image_variants = models.JSONField(
+        default=dict, blank=True, editable=False
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_layout = (
+            instance.__dict__.get("cargo_num"),
+            instance.__dict__.get("places_in_cargo"),
+        )
+        if "image" in instance.__dict__:
+            instance._loaded_image = instance.__dict__["image"]
+        return instance
+
+    @property
+    def layout_changed(self):
+        return getattr(self, "_loaded_layout", None) not in (
+            None, (self.cargo_num, self.places_in_cargo)
+        )
+
+    @property
+    def image_changed(self):
+        if not hasattr(self, "_loaded_image"):
+            return False
+
+        return (self._loaded_image or "") != (self.image.name or "")
 
     def __str__(self):
         return f"{self.name} (Type: {self.train_type})"
@@ -109,6 +161,7 @@ class Crew(models.Model):
         choices=POSITION_CHOICES,
         default="attendant"
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     @property
     def full_name(self):
@@ -139,20 +192,116 @@ class Journey(models.Model):
     )
     departure_time = models.DateTimeField()
     arrival_time = models.DateTimeField()
+    seat_map = models.BinaryField(default=bytes, editable=False)
+    seats_sold = models.PositiveIntegerField(default=0, editable=False)
+    external_id = models.CharField(
+        max_length=64, unique=True, null=True, blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    SEAT_FIELDS = ("seat_map", "seats_sold")
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_train_id = instance.__dict__.get("train_id")
+        return instance
+
+    @property
+    def train_changed(self):
+        return getattr(self, "_loaded_train_id", None) not in (
+            None, self.train_id
+        )
 
     @property
     def info(self):
         return f"{self.route} (Train: {self.train})"
 
+    @property
+    def seats(self):
+        return SeatMap(
+            self.train.cargo_num, self.train.places_in_cargo, self.seat_map
+        )
+
+    @property
+    def tickets_available(self):
+        capacity = self.train.cargo_num * self.train.places_in_cargo
+        return max(capacity - self.seats_sold, 0)
+
+    @property
+    def taken_seats(self):
+        return [{"cargo": cargo, "seat": seat} for cargo, seat in self.seats]
+
+    def take_seats(self, seats):
+        seat_map = self.seats
+        for cargo, seat in seats:
+            seat_map.add(cargo, seat)
+        self.seat_map = seat_map.to_bytes()
+        self.updated_at = timezone.now()
+
+    def release_seats(self, seats):
+        seat_map = self.seats
+        for cargo, seat in seats:
+            seat_map.discard(cargo, seat)
+        self.seat_map = seat_map.to_bytes()
+        self.updated_at = timezone.now()
+
+    def rebuild_seat_map(self):
+        seat_map = SeatMap(self.train.cargo_num, self.train.places_in_cargo)
+        for cargo, seat in self.tickets.values_list("cargo", "seat"):
+            try:
+                seat_map.add(cargo, seat)
+            except IndexError:
+                continue
+        self.seat_map = seat_map.to_bytes()
+        self.updated_at = timezone.now()
+
+    def save(
+            self,
+            force_insert=False,
+            force_update=False,
+            using=None,
+            update_fields=None
+    ):
+        # Bookings and ticket receivers update seat_map and seats_sold
+        # with queries, writing back the copies loaded with this
+        # instance would undo sales made since. Name them in
+        # update_fields to save them.
+        if update_fields is None and not (
+            self._state.adding or force_insert
+        ):
+            deferred = self.get_deferred_fields()
+            update_fields = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.attname not in deferred
+                and field.name not in self.SEAT_FIELDS
+            ]
+        return super(Journey, self).save(
+            force_insert, force_update, using, update_fields
+        )
+
     def __str__(self):
         return f"{self.route} (Departure: {self.departure_time})"
 
     class Meta:
         ordering = ["-departure_time"]
+        indexes = [
+            models.Index(
+                fields=["route", "departure_time"],
+                name="journey_route_departure_idx",
+            ),
+            models.Index(
+                fields=["-departure_time", "-id"],
+                name="journey_departure_id_idx",
+            ),
+        ]
 
 
 class Order(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     user = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -161,6 +310,47 @@ class Order(models.Model):
 
     class Meta:
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(
+                fields=["-created_at", "-id"],
+                name="order_created_id_idx",
+            ),
+        ]
+
+
+class TicketQuerySet(models.QuerySet):
+    def release_seats(self):
+        """Free the seats of these tickets with one journey update
+
+        Journeys are locked in id order like bookings do.
+        """
+        seats = defaultdict(list)
+        for journey_id, cargo, seat in self.values_list(
+            "journey_id", "cargo", "seat"
+        ):
+            seats[journey_id].append((cargo, seat))
+        if not seats:
+            return
+
+        journeys = list(
+            Journey.objects.select_for_update(of=("self",))
+            .select_related("train")
+            .filter(pk__in=seats)
+            .order_by("pk")
+        )
+        for journey in journeys:
+            journey.release_seats(seats[journey.pk])
+            journey.seats_sold = Greatest(
+                F("seats_sold") - len(seats[journey.pk]), 0
+            )
+        Journey.objects.bulk_update(
+            journeys, ["seat_map", "seats_sold", "updated_at"]
+        )
+
+    def delete(self):
+        with transaction.atomic(using=self.db):
+            self.release_seats()
+            return super().delete()
 
 
 class Ticket(models.Model):
@@ -176,12 +366,29 @@ class Ticket(models.Model):
         on_delete=models.CASCADE,
         related_name="tickets"
     )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    # Seats are released here rather than from a delete receiver, which
+    # would keep Django from deleting an order's tickets in one query.
+    objects = TicketQuerySet.as_manager()
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_journey_id = instance.__dict__.get("journey_id")
+        return instance
+
+    @property
+    def journey_changed(self):
+        return getattr(self, "_loaded_journey_id", None) not in (
+            None, self.journey_id
+        )
 
     def __str__(self):
         return f"{self.journey} | Cargo & Seat : {self.cargo} & {self.seat}"
 
     @staticmethod
-    def validate_ticket(cargo, seat, train, error_to_raise):
+    def validate_ticket(cargo, seat, train, error_to_raise, journey=None):
         for ticket_attr_value, ticket_attr_name, train_attr_name in [
             (cargo, "cargo", "cargo_num"),
             (seat, "seat", "places_in_cargo")
@@ -198,9 +405,21 @@ class Ticket(models.Model):
                     }
                 )
 
+        if journey is not None and (cargo, seat) in journey.seats:
+            raise error_to_raise(
+                {"seat": f"Seat {seat} in cargo {cargo} is already taken"}
+            )
+
     def clean(self):
+        journey = Journey.objects.select_related("train").get(
+            pk=self.journey_id
+        )
         Ticket.validate_ticket(
-            self.cargo, self.seat, self.journey.train, ValidationError
+            self.cargo,
+            self.seat,
+            journey.train,
+            ValidationError,
+            journey=journey if self._state.adding else None,
         )
 
     def save(
@@ -210,10 +429,18 @@ class Ticket(models.Model):
             using=None,
             update_fields=None
     ):
-        self.full_clean()
-        return super(Ticket, self).save(
-            force_insert, force_update, using, update_fields
-        )
+        self.full_clean(validate_unique=not self._state.adding)
+        # Seat map and seats_sold are updated by post_save receivers,
+        # which then commit or roll back together with the ticket.
+        with transaction.atomic(using=using):
+            return super(Ticket, self).save(
+                force_insert, force_update, using, update_fields
+            )
+
+    def delete(self, using=None, keep_parents=False):
+        with transaction.atomic(using=using):
+            Ticket.objects.filter(pk=self.pk).release_seats()
+            return super(Ticket, self).delete(using, keep_parents)
 
     class Meta:
         unique_together = (
@@ -222,3 +449,45 @@ class Ticket(models.Model):
             "journey",
         )
         ordering = ["cargo", "seat"]
+
+
+class JourneyAvailability(models.Model):
+    """Read-only seat availability per journey for reporting.
+
+    Backed by a materialized view on PostgreSQL (see
+    ``train_station.availability``) and by a plain view elsewhere.
+    """
+
+    journey = models.OneToOneField(
+        Journey,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        related_name="availability",
+    )
+    route = models.ForeignKey(
+        Route, on_delete=models.DO_NOTHING, related_name="+"
+    )
+    source = models.ForeignKey(
+        Station, on_delete=models.DO_NOTHING, related_name="+"
+    )
+    source_name = models.CharField(max_length=255)
+    destination = models.ForeignKey(
+        Station, on_delete=models.DO_NOTHING, related_name="+"
+    )
+    destination_name = models.CharField(max_length=255)
+    train = models.ForeignKey(
+        Train, on_delete=models.DO_NOTHING, related_name="+"
+    )
+    train_name = models.CharField(max_length=255)
+    departure_time = models.DateTimeField()
+    arrival_time = models.DateTimeField()
+    capacity = models.IntegerField()
+    seats_sold = models.IntegerField()
+    seats_available = models.IntegerField()
+    refreshed_at = models.DateTimeField()
+
+    class Meta:
+        managed = False
+        db_table = "train_station_journeyavailability"
+        ordering = ["departure_time", "journey_id"]
+        verbose_name_plural = "journey availability"
@@ -0,0 +1,37 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptionalCursorPagination(CursorPagination):
+    """Keyset pagination switched on per request.
+
+    Lists stay unpaginated unless the client passes ``page_size`` or a
+    ``cursor``. The ordering comes from ``view.cursor_ordering`` or the
+    model ``Meta.ordering`` with an ``id`` tiebreak appended.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = None
+    always_paginate = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if not self.always_paginate and not (
+            self.cursor_query_param in request.query_params
+            or self.page_size_query_param in request.query_params
+        ):
+            return None
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = self.ordering or getattr(view, "cursor_ordering", None)
+        if ordering:
+            return tuple(ordering)
+
+        ordering = tuple(queryset.model._meta.ordering)
+        if any(field.lstrip("-") in ("id", "pk") for field in ordering):
+            return ordering
+
+        direction = "-" if ordering and ordering[0].startswith("-") else ""
+        return ordering + (f"{direction}id",)
@@ -0,0 +1,194 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.http import HttpResponse
+from django.utils.http import parse_http_date
+
+from train_station.conditional import conditional_response
+from train_station.counters import get_counter_store
+from train_station.utils import bump_cache_version, cache_versions
+
+HITS_KEY = "train_station:response-cache:hits"
+MISSES_KEY = "train_station:response-cache:misses"
+
+_cached_models = set()
+
+
+def _version_key(model):
+    return f"train_station:response-cache:{model._meta.label_lower}"
+
+
+def _model_changed(sender, **kwargs):
+    invalidate_response_cache(sender)
+
+
+def _relation_changed(sender, instance, model, action, **kwargs):
+    if action.startswith("post_"):
+        invalidate_cached_models(type(instance), model)
+
+
+def _watch_model(model):
+    """Connect the invalidation receivers for ``model`` once
+
+    Only cached models are watched, other saves and deletes (tickets
+    in particular) do not pay for a receiver call.
+    """
+    if model in _cached_models:
+        return
+
+    _cached_models.add(model)
+    uid = f"response-cache:{model._meta.label_lower}"
+    post_save.connect(_model_changed, sender=model, dispatch_uid=uid)
+    post_delete.connect(_model_changed, sender=model, dispatch_uid=uid)
+    for field in model._meta.get_fields():
+        if field.many_to_many:
+            through = getattr(field, "through", None) or (
+                field.remote_field.through
+            )
+            m2m_changed.connect(
+                _relation_changed,
+                sender=through,
+                dispatch_uid=f"{uid}:{through._meta.label_lower}",
+            )
+
+
+def response_cache_stats():
+    """Hit and miss counts summed over every worker"""
+    counts = get_counter_store().get_many([HITS_KEY, MISSES_KEY])
+    hits, misses = counts[HITS_KEY], counts[MISSES_KEY]
+    lookups = hits + misses
+    return {
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": hits / lookups if lookups else None,
+    }
+
+
+class CachedResponseMixin:
+    """Cache rendered JSON responses of read actions.
+
+    Entries are keyed by path, query params, permission classes and the
+    write versions of ``cache_models``; any save, delete or m2m change of
+    those models bumps their version in the shared counter store and so
+    retires every entry built from them, in every worker.
+
+    The ``ETag`` / ``Last-Modified`` headers of a cached response are
+    kept with it, so conditional requests hitting the cache are answered
+    without asking the database for validators.
+    """
+
+    cache_models = ()
+    cache_actions = ("list", "retrieve")
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for model in cls.cache_models:
+            _watch_model(model)
+
+    def _response_cache_key(self, request):
+        versions = cache_versions(
+            [_version_key(model) for model in self.cache_models]
+        )
+        key_parts = [
+            request.path,
+            request.accepted_renderer.format,
+            ",".join(
+                sorted(
+                    f"{name}={value}"
+                    for name, values in request.query_params.lists()
+                    for value in values
+                )
+            ),
+            ",".join(
+                permission.__class__.__name__
+                for permission in self.get_permissions()
+            ),
+            ",".join(str(version) for version in sorted(versions.items())),
+        ]
+        digest = hashlib.md5("|".join(key_parts).encode()).hexdigest()
+        return f"train_station:response:v2:{digest}"
+
+    def _cacheable(self, request):
+        return (
+            self.action in self.cache_actions
+            and request.accepted_renderer.format == "json"
+        )
+
+    def _cache_lookup(self, request):
+        """The entry's key and its response (or a 304) on a hit"""
+        key = self._response_cache_key(request)
+        cached = cache.get(key)
+        if cached is None:
+            get_counter_store().incr(MISSES_KEY)
+            return key, None
+
+        get_counter_store().incr(HITS_KEY)
+        content, content_type, etag, last_modified = cached
+
+        def hit():
+            response = HttpResponse(content, content_type=content_type)
+            response["X-Cache"] = "HIT"
+            return response
+
+        if etag is None:
+            return key, hit()
+
+        return key, conditional_response(request, etag, last_modified, hit)
+
+    def _cache_store(self, key, request, response):
+        if response.status_code == 200:
+            response.accepted_renderer = request.accepted_renderer
+            response.accepted_media_type = request.accepted_media_type
+            response.renderer_context = self.get_renderer_context()
+            response.render()
+            last_modified = response.get("Last-Modified")
+            cache.set(
+                key,
+                (
+                    response.content,
+                    response["Content-Type"],
+                    response.get("ETag"),
+                    last_modified and parse_http_date(last_modified),
+                ),
+                settings.RESPONSE_CACHE_TIMEOUT,
+            )
+        response["X-Cache"] = "MISS"
+        return response
+
+    def _cached_response(self, handler, request, *args, **kwargs):
+        if not self._cacheable(request):
+            return handler(request, *args, **kwargs)
+
+        key, response = self._cache_lookup(request)
+        if response is None:
+            response = self._cache_store(
+                key, request, handler(request, *args, **kwargs)
+            )
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached_response(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+
+def invalidate_response_cache(*models):
+    """Retire the responses built from ``models`` in every worker"""
+    for model in models:
+        bump_cache_version(_version_key(model))
+
+
+def invalidate_cached_models(*models):
+    """Like invalidate_response_cache, for models a cached view uses
+
+    Only views imported in this process are known, which suits the
+    m2m receivers; bulk loads should name their models explicitly.
+    """
+    invalidate_response_cache(
+        *(model for model in models if model in _cached_models)
+    )
@@ -0,0 +1,287 @@
+import heapq
+import threading
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+
+from train_station.models import Journey, Route
+from train_station.utils import (
+    SYNC_OVERLAP,
+    bump_cache_version,
+    cache_versions,
+)
+
+GRAPH_VERSION_KEY = "train_station:route-graph-version"
+GRAPH_CHANGES_KEY = "train_station:route-graph-changes"
+
+
+class StaleRouteGraph(Exception):
+    """A planned route or journey no longer exists"""
+
+
+class RouteGraph:
+    """Station graph kept in memory for connection planning.
+
+    ``edges`` maps a station id to ``(distance, destination_id, route_id)``
+    tuples, ``timetables`` maps a station id to the departure times and
+    the ``(departure, arrival, destination_id, journey_id)`` tuples of
+    the journeys leaving it, sorted by departure time. Only journeys
+    departing from ``journeys_since`` on are loaded.
+
+    Updates replace a station's tuples as a whole, so readers never see
+    half of one; a single writer at a time is up to the caller.
+    """
+
+    def __init__(self, routes=(), journeys=(), journeys_since=None):
+        self.journeys_since = journeys_since
+        self._route_sources = {}
+        self._journey_sources = {}
+
+        edges = defaultdict(list)
+        for route_id, source_id, destination_id, distance in routes:
+            edges[source_id].append((distance, destination_id, route_id))
+            self._route_sources[route_id] = source_id
+        self.edges = {
+            station_id: tuple(station_edges)
+            for station_id, station_edges in edges.items()
+        }
+
+        departures = defaultdict(list)
+        for journey in journeys:
+            journey_id, source_id, destination_id, departure, arrival = journey
+            departures[source_id].append(
+                (departure, arrival, destination_id, journey_id)
+            )
+            self._journey_sources[journey_id] = source_id
+        self.timetables = {}
+        for station_id, station_departures in departures.items():
+            station_departures.sort()
+            self._set_timetable(station_id, station_departures)
+
+    def _set_timetable(self, station_id, departures):
+        if departures:
+            self.timetables[station_id] = (
+                tuple(departure[0] for departure in departures),
+                tuple(departures),
+            )
+        else:
+            self.timetables.pop(station_id, None)
+
+    @classmethod
+    def from_db(cls, journeys_since=None):
+        return cls(
+            routes=Route.objects.order_by().values_list(
+                "id", "source_id", "destination_id", "distance"
+            ).iterator(),
+            journeys=cls._journey_rows(
+                Journey.objects.order_by(), journeys_since
+            ).iterator(),
+            journeys_since=journeys_since,
+        )
+
+    @staticmethod
+    def _journey_rows(journeys, journeys_since):
+        if journeys_since is not None:
+            journeys = journeys.filter(departure_time__gte=journeys_since)
+
+        return journeys.values_list(
+            "id",
+            "route__source_id",
+            "route__destination_id",
+            "departure_time",
+            "arrival_time",
+        )
+
+    def set_route(self, route_id, source_id, destination_id, distance):
+        if self._route_sources.get(route_id, source_id) != source_id:
+            self.remove_route(route_id)
+
+        self.edges[source_id] = tuple(
+            edge
+            for edge in self.edges.get(source_id, ())
+            if edge[2] != route_id
+        ) + ((distance, destination_id, route_id),)
+        self._route_sources[route_id] = source_id
+
+    def remove_route(self, route_id):
+        source_id = self._route_sources.pop(route_id, None)
+        if source_id is None:
+            return
+
+        edges = tuple(
+            edge for edge in self.edges[source_id] if edge[2] != route_id
+        )
+        if edges:
+            self.edges[source_id] = edges
+        else:
+            del self.edges[source_id]
+
+    def set_journey(
+        self, journey_id, source_id, destination_id, departure, arrival
+    ):
+        departed = (
+            self.journeys_since is not None and departure < self.journeys_since
+        )
+        if departed or (
+            self._journey_sources.get(journey_id, source_id) != source_id
+        ):
+            self.remove_journey(journey_id)
+        if departed:
+            return
+
+        _, departures = self.timetables.get(source_id, ((), ()))
+        departures = [entry for entry in departures if entry[3] != journey_id]
+        insort(departures, (departure, arrival, destination_id, journey_id))
+        self._set_timetable(source_id, departures)
+        self._journey_sources[journey_id] = source_id
+
+    def remove_journey(self, journey_id):
+        source_id = self._journey_sources.pop(journey_id, None)
+        if source_id is None:
+            return
+
+        _, departures = self.timetables[source_id]
+        self._set_timetable(
+            source_id,
+            [entry for entry in departures if entry[3] != journey_id],
+        )
+
+    def sync(self, since):
+        """Apply the routes and journeys updated from ``since`` on
+
+        Journeys move along with their route. Deletions are not seen,
+        they need a rebuild.
+        """
+        for route in Route.objects.filter(updated_at__gte=since).values_list(
+            "id", "source_id", "destination_id", "distance"
+        ):
+            self.set_route(*route)
+
+        journeys = Journey.objects.filter(
+            Q(updated_at__gte=since) | Q(route__updated_at__gte=since)
+        )
+        for journey in self._journey_rows(journeys, None):
+            self.set_journey(*journey)
+
+    @staticmethod
+    def _unwind(previous, destination):
+        path = []
+        station_id = destination
+        while station_id in previous:
+            station_id, edge_id = previous[station_id]
+            path.append(edge_id)
+        path.reverse()
+        return path
+
+    def shortest_path(self, source_id, destination_id):
+        """Return ``(distance, [route_id, ...])`` or ``None``"""
+        best = {source_id: 0}
+        previous = {}
+        heap = [(0, source_id)]
+
+        while heap:
+            distance, station_id = heapq.heappop(heap)
+            if station_id == destination_id:
+                return distance, self._unwind(previous, destination_id)
+            if distance > best[station_id]:
+                continue
+
+            for edge_distance, next_id, route_id in self.edges.get(
+                station_id, ()
+            ):
+                candidate = distance + edge_distance
+                if candidate < best.get(next_id, candidate + 1):
+                    best[next_id] = candidate
+                    previous[next_id] = (station_id, route_id)
+                    heapq.heappush(heap, (candidate, next_id))
+
+        return None
+
+    def earliest_arrival(
+        self,
+        source_id,
+        destination_id,
+        departure_after,
+        min_transfer=timedelta(minutes=10),
+        max_wait=timedelta(days=1),
+    ):
+        """Return ``(arrival, [journey_id, ...])`` or ``None``
+
+        Journeys are chained only when the next one leaves at least
+        ``min_transfer`` after the previous one arrives, and no later than
+        ``max_wait`` after that.
+        """
+        best = {source_id: departure_after}
+        previous = {}
+        heap = [(departure_after, source_id)]
+
+        while heap:
+            arrived_at, station_id = heapq.heappop(heap)
+            if station_id == destination_id:
+                return arrived_at, self._unwind(previous, destination_id)
+            if arrived_at > best[station_id]:
+                continue
+
+            ready_at = arrived_at
+            if station_id != source_id:
+                ready_at += min_transfer
+
+            times, departures = self.timetables.get(station_id, ((), ()))
+            departures = departures[
+                bisect_left(times, ready_at):
+                bisect_right(times, ready_at + max_wait)
+            ]
+            for _, arrival, next_id, journey_id in departures:
+                if next_id not in best or arrival < best[next_id]:
+                    best[next_id] = arrival
+                    previous[next_id] = (station_id, journey_id)
+                    heapq.heappush(heap, (arrival, next_id))
+
+        return None
+
+
+_graph = None
+_graph_versions = None
+_graph_synced_at = None
+_graph_lock = threading.Lock()
+
+
+def invalidate_route_graph():
+    """Make every worker rebuild its graph, e.g. after bulk loads"""
+    bump_cache_version(GRAPH_VERSION_KEY)
+
+
+def route_graph_changed():
+    """Make every worker re-read the recently updated routes and journeys"""
+    bump_cache_version(GRAPH_CHANGES_KEY)
+
+
+def get_route_graph(rebuild=False):
+    """Return the per-worker graph, kept up to date with Route/Journey writes
+
+    The graph holds journeys departing from its build time on, see
+    ``RouteGraph.journeys_since``; plans never start before that.
+    """
+    global _graph, _graph_versions, _graph_synced_at
+
+    versions = cache_versions([GRAPH_VERSION_KEY, GRAPH_CHANGES_KEY])
+    if rebuild or _graph is None or _graph_versions != versions:
+        with _graph_lock:
+            now = timezone.now()
+            if (
+                rebuild
+                or _graph is None
+                or _graph_versions[GRAPH_VERSION_KEY]
+                != versions[GRAPH_VERSION_KEY]
+            ):
+                _graph = RouteGraph.from_db(journeys_since=now)
+                _graph_synced_at = now
+            elif _graph_versions != versions:
+                _graph.sync(_graph_synced_at - SYNC_OVERLAP)
+                _graph_synced_at = now
+            _graph_versions = versions
+
+    return _graph
@@ -0,0 +1,352 @@
+import heapq
+import json
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from train_station.sqlite_store import SQLiteStore
+
+
+class SeatsUnavailable(Exception):
+    def __init__(self, seats):
+        super().__init__(f"Seats are already held: {seats}")
+        self.seats = seats
+
+
+class BaseSeatHoldStore:
+    """Short-lived seat reservations made ahead of an order.
+
+    A hold is a dict with ``token``, ``journey``, ``seats`` (a list of
+    ``(cargo, seat)`` pairs), ``user`` and ``expires_at`` (a unix
+    timestamp).
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+
+    @staticmethod
+    def _new_hold(journey_id, seats, user_id, expires_at):
+        return {
+            "token": uuid.uuid4().hex,
+            "journey": journey_id,
+            "seats": [tuple(seat) for seat in seats],
+            "user": user_id,
+            "expires_at": expires_at,
+        }
+
+    def hold(self, journey_id, seats, user_id, ttl):
+        """Hold all ``seats`` or none, raising SeatsUnavailable"""
+        raise NotImplementedError
+
+    def get(self, token):
+        raise NotImplementedError
+
+    def release(self, token):
+        raise NotImplementedError
+
+    def held_seats(self, journey_id, seats, exclude_token=None):
+        """Return the subset of ``seats`` held by other tokens"""
+        raise NotImplementedError
+
+
+class LocalSeatHoldStore(BaseSeatHoldStore):
+    """In-process store, expired holds are reclaimed by a daemon thread"""
+
+    def __init__(self, reap_interval=5, clock=time.time):
+        super().__init__(clock=clock)
+        self.reap_interval = reap_interval
+        self._lock = threading.Lock()
+        self._holds = {}
+        self._seats = {}
+        self._expiry = []
+        self._reaper = None
+
+    def _start_reaper(self):
+        if self._reaper is None and self.reap_interval:
+            self._reaper = threading.Thread(
+                target=self._reap_forever, name="seat-hold-reaper", daemon=True
+            )
+            self._reaper.start()
+
+    def _reap_forever(self):
+        while True:
+            time.sleep(self.reap_interval)
+            with self._lock:
+                self._reap()
+
+    def _reap(self):
+        now = self.clock()
+        while self._expiry and self._expiry[0][0] <= now:
+            _, token = heapq.heappop(self._expiry)
+            hold = self._holds.get(token)
+            if hold is not None and hold["expires_at"] <= now:
+                self._drop(hold)
+
+    def _drop(self, hold):
+        self._holds.pop(hold["token"], None)
+        for seat in hold["seats"]:
+            if self._seats.get((hold["journey"], seat)) == hold["token"]:
+                del self._seats[(hold["journey"], seat)]
+
+    def hold(self, journey_id, seats, user_id, ttl):
+        with self._lock:
+            self._reap()
+            taken = [
+                seat for seat in seats
+                if (journey_id, tuple(seat)) in self._seats
+            ]
+            if taken:
+                raise SeatsUnavailable(taken)
+
+            hold = self._new_hold(
+                journey_id, seats, user_id, self.clock() + ttl
+            )
+            self._holds[hold["token"]] = hold
+            for seat in hold["seats"]:
+                self._seats[(journey_id, seat)] = hold["token"]
+            heapq.heappush(self._expiry, (hold["expires_at"], hold["token"]))
+
+        self._start_reaper()
+        return dict(hold)
+
+    def get(self, token):
+        with self._lock:
+            self._reap()
+            hold = self._holds.get(token)
+            return dict(hold) if hold else None
+
+    def release(self, token):
+        with self._lock:
+            hold = self._holds.get(token)
+            if hold is not None:
+                self._drop(hold)
+
+    def held_seats(self, journey_id, seats, exclude_token=None):
+        with self._lock:
+            self._reap()
+            return [
+                seat for seat in seats
+                if self._seats.get((journey_id, tuple(seat)), exclude_token)
+                != exclude_token
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._holds.clear()
+            self._seats.clear()
+            self._expiry.clear()
+
+
+class SQLiteSeatHoldStore(SQLiteStore, BaseSeatHoldStore):
+    """Holds in a SQLite file
+
+    Holding runs in a ``BEGIN IMMEDIATE`` transaction, which holds the
+    database write lock, so two workers never hold the same seat.
+    Expired rows are ignored on read and deleted by the next hold.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS seat_hold ("
+        "token TEXT PRIMARY KEY, hold TEXT NOT NULL, "
+        "expires_at REAL NOT NULL) WITHOUT ROWID",
+        "CREATE TABLE IF NOT EXISTS held_seat ("
+        "journey INTEGER NOT NULL, cargo INTEGER NOT NULL, "
+        "seat INTEGER NOT NULL, token TEXT NOT NULL, "
+        "expires_at REAL NOT NULL, "
+        "PRIMARY KEY (journey, cargo, seat)) WITHOUT ROWID",
+    )
+
+    def __init__(self, path, timeout=5, clock=time.time):
+        SQLiteStore.__init__(self, path, timeout=timeout)
+        BaseSeatHoldStore.__init__(self, clock=clock)
+
+    @staticmethod
+    def _load(row):
+        hold = json.loads(row[0])
+        hold["seats"] = [tuple(seat) for seat in hold["seats"]]
+        return hold
+
+    def hold(self, journey_id, seats, user_id, ttl):
+        hold = self._new_hold(journey_id, seats, user_id, self.clock() + ttl)
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            connection.execute(
+                "DELETE FROM held_seat WHERE expires_at <= ?", (now,)
+            )
+            connection.execute(
+                "DELETE FROM seat_hold WHERE expires_at <= ?", (now,)
+            )
+            taken = self._held(connection, journey_id, hold["seats"], None)
+            if taken:
+                raise SeatsUnavailable(taken)
+
+            connection.execute(
+                "INSERT INTO seat_hold (token, hold, expires_at) "
+                "VALUES (?, ?, ?)",
+                (hold["token"], json.dumps(hold), hold["expires_at"]),
+            )
+            connection.executemany(
+                "INSERT INTO held_seat "
+                "(journey, cargo, seat, token, expires_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [
+                    (journey_id, *seat, hold["token"], hold["expires_at"])
+                    for seat in hold["seats"]
+                ],
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        return hold
+
+    def get(self, token):
+        row = self._connection().execute(
+            "SELECT hold FROM seat_hold WHERE token = ? AND expires_at > ?",
+            (token, self.clock()),
+        ).fetchone()
+        return self._load(row) if row else None
+
+    def release(self, token):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.execute(
+                "DELETE FROM held_seat WHERE token = ?", (token,)
+            )
+            connection.execute(
+                "DELETE FROM seat_hold WHERE token = ?", (token,)
+            )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+    def _held(self, connection, journey_id, seats, exclude_token):
+        seats = [tuple(seat) for seat in seats]
+        if not seats:
+            return []
+
+        held = set(
+            connection.execute(
+                "SELECT cargo, seat FROM held_seat WHERE journey = ? "
+                "AND expires_at > ? AND token IS NOT ? "
+                "AND (cargo, seat) IN (VALUES %s)"
+                % ",".join(["(?, ?)"] * len(seats)),
+                [
+                    journey_id,
+                    self.clock(),
+                    exclude_token,
+                    *(value for seat in seats for value in seat),
+                ],
+            )
+        )
+        return [seat for seat in seats if seat in held]
+
+    def held_seats(self, journey_id, seats, exclude_token=None):
+        return self._held(
+            self._connection(), journey_id, seats, exclude_token
+        )
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute("DELETE FROM held_seat")
+        connection.execute("DELETE FROM seat_hold")
+
+
+class CacheSeatHoldStore(BaseSeatHoldStore):
+    """Store on a Django cache, expiry is left to the cache backend.
+
+    ``cache.add`` is an atomic set-if-absent on shared backends such as
+    Redis or Memcached, so all workers see the same holds.
+    """
+
+    def __init__(self, alias="default", prefix="seat-hold", clock=time.time):
+        super().__init__(clock=clock)
+        self.cache = caches[alias]
+        self.prefix = prefix
+
+    def _seat_key(self, journey_id, seat):
+        cargo, number = seat
+        return f"{self.prefix}:seat:{journey_id}:{cargo}:{number}"
+
+    def _hold_key(self, token):
+        return f"{self.prefix}:hold:{token}"
+
+    def hold(self, journey_id, seats, user_id, ttl):
+        hold = self._new_hold(journey_id, seats, user_id, self.clock() + ttl)
+        added = []
+        for seat in hold["seats"]:
+            key = self._seat_key(journey_id, seat)
+            if not self.cache.add(key, hold["token"], ttl):
+                self.cache.delete_many(added)
+                raise SeatsUnavailable(
+                    self.held_seats(journey_id, seats, hold["token"])
+                )
+            added.append(key)
+
+        self.cache.set(self._hold_key(hold["token"]), hold, ttl)
+        return hold
+
+    def get(self, token):
+        return self.cache.get(self._hold_key(token))
+
+    def release(self, token):
+        hold = self.get(token)
+        if hold is None:
+            return
+
+        keys = [
+            self._seat_key(hold["journey"], seat) for seat in hold["seats"]
+        ]
+        owned = self.cache.get_many(keys)
+        self.cache.delete_many(
+            [key for key, value in owned.items() if value == token]
+        )
+        self.cache.delete(self._hold_key(token))
+
+    def held_seats(self, journey_id, seats, exclude_token=None):
+        keys = {
+            self._seat_key(journey_id, seat): tuple(seat) for seat in seats
+        }
+        return [
+            keys[key]
+            for key, token in self.cache.get_many(list(keys)).items()
+            if token != exclude_token
+        ]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_seat_hold_store():
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.SEAT_HOLDS
+                _store = import_string(config["BACKEND"])(
+                    **config.get("OPTIONS", {})
+                )
+
+    return _store
+
+
+@receiver(setting_changed)
+def reset_seat_hold_store(setting, **kwargs):
+    global _store
+
+    if setting == "SEAT_HOLDS":
+        with _store_lock:
+            _store = None
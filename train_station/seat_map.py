@@ -0,0 +1,76 @@
+class SeatMap:
+    """Bitset of taken seats for one journey.
+
+    Seat ``(cargo, seat)`` lives at bit
+    ``(cargo - 1) * places_in_cargo + (seat - 1)``, so the whole train fits
+    into ``ceil(cargo_num * places_in_cargo / 8)`` bytes.
+    """
+
+    def __init__(self, cargo_num, places_in_cargo, data=b""):
+        self.cargo_num = cargo_num
+        self.places_in_cargo = places_in_cargo
+        size = (cargo_num * places_in_cargo + 7) // 8
+        self._bits = bytearray(bytes(data or b"")[:size].ljust(size, b"\0"))
+
+    @property
+    def capacity(self):
+        return self.cargo_num * self.places_in_cargo
+
+    def _position(self, cargo, seat):
+        if not (
+            1 <= cargo <= self.cargo_num
+            and 1 <= seat <= self.places_in_cargo
+        ):
+            raise IndexError(f"Seat {cargo}/{seat} is out of the train range")
+
+        return (cargo - 1) * self.places_in_cargo + (seat - 1)
+
+    def __contains__(self, cargo_seat):
+        try:
+            position = self._position(*cargo_seat)
+        except IndexError:
+            return False
+
+        return bool(self._bits[position >> 3] & (1 << (position & 7)))
+
+    def add(self, cargo, seat):
+        position = self._position(cargo, seat)
+        self._bits[position >> 3] |= 1 << (position & 7)
+
+    def discard(self, cargo, seat):
+        try:
+            position = self._position(cargo, seat)
+        except IndexError:
+            return
+
+        self._bits[position >> 3] &= ~(1 << (position & 7))
+
+    def __len__(self):
+        return int.from_bytes(self._bits, "little").bit_count()
+
+    def __iter__(self):
+        for index, byte in enumerate(self._bits):
+            while byte:
+                low_bit = byte & -byte
+                position = (index << 3) + low_bit.bit_length() - 1
+                cargo, seat = divmod(position, self.places_in_cargo)
+                yield cargo + 1, seat + 1
+                byte ^= low_bit
+
+    def free_seats_near(self, cargo, seat):
+        """Yield free seats, same cargo and closest seat numbers first"""
+        cargos = sorted(
+            range(1, self.cargo_num + 1),
+            key=lambda number: (abs(number - cargo), number),
+        )
+        seats = sorted(
+            range(1, self.places_in_cargo + 1),
+            key=lambda number: (abs(number - seat), number),
+        )
+        for candidate_cargo in cargos:
+            for candidate_seat in seats:
+                if (candidate_cargo, candidate_seat) not in self:
+                    yield candidate_cargo, candidate_seat
+
+    def to_bytes(self):
+        return bytes(self._bits)
@@ -1,6 +1,13 @@
-from django.db import transaction
+from datetime import datetime
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from train_station.booking import book_tickets, suggest_alternatives
+from train_station.exceptions import SeatConflict
 from train_station.models import (
     Station,
     Route,
@@ -9,9 +16,11 @@ from train_station.models import (
     Train,
     Crew,
     Journey,
+    JourneyAvailability,
     Order,
     Ticket,
 )
+from train_station.seat_holds import SeatsUnavailable, get_seat_hold_store
 
 
 class StationSerializer(serializers.ModelSerializer):
@@ -65,6 +74,24 @@ class TrainSerializer(serializers.ModelSerializer):
         )
 
 
+@extend_schema_field(OpenApiTypes.OBJECT)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """``{variant: {format: url}}`` of the rendered image variants"""
+
+    def to_representation(self, value):
+        request = self.context.get("request")
+        urls = {}
+        for variant, formats in (value or {}).items():
+            urls[variant] = {}
+            for image_format, name in formats.items():
+                url = default_storage.url(name)
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                urls[variant][image_format] = url
+
+        return urls
+
+
 class TrainListSerializer(serializers.ModelSerializer):
     train_type = serializers.SlugRelatedField(
         many=False,
@@ -76,11 +103,12 @@ class TrainListSerializer(serializers.ModelSerializer):
         read_only=True,
         slug_field="name"
     )
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Train
         fields = (
-            "id", "name", "image", "cargo_num",
+            "id", "name", "image", "image_variants", "cargo_num",
             "places_in_cargo", "train_type", "facility",
         )
 
@@ -88,11 +116,12 @@ class TrainListSerializer(serializers.ModelSerializer):
 class TrainDetailSerializer(serializers.ModelSerializer):
     train_type = TrainTypeSerializer(many=False, read_only=True)
     facility = FacilitySerializer(many=True, read_only=False)
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Train
         fields = (
-            "id", "name", "image", "cargo_num",
+            "id", "name", "image", "image_variants", "cargo_num",
             "places_in_cargo", "train_type", "facility",
         )
 
@@ -114,6 +143,11 @@ class JourneySerializer(
         )
 
 
+class SeatSerializer(serializers.Serializer):
+    cargo = serializers.IntegerField(min_value=1)
+    seat = serializers.IntegerField(min_value=1)
+
+
 class JourneyListSerializer(serializers.ModelSerializer):
     route = serializers.SlugRelatedField(
         many=False,
@@ -131,12 +165,7 @@ class JourneyListSerializer(serializers.ModelSerializer):
         slug_field="full_name"
     )
     tickets_available = serializers.IntegerField(read_only=True)
-    taken_seats = serializers.SlugRelatedField(
-        source="tickets",
-        many=True,
-        read_only=True,
-        slug_field="id"
-    )
+    taken_seats = SeatSerializer(many=True, read_only=True)
 
     class Meta:
         model = Journey
@@ -148,20 +177,26 @@ class JourneyListSerializer(serializers.ModelSerializer):
 
 
 class TicketSerializer(serializers.ModelSerializer):
-    def validate(self, attrs):
-        data = super(TicketSerializer, self).validate(attrs)
-        Ticket.validate_ticket(
-            cargo=attrs["cargo"],
-            seat=attrs["seat"],
-            train=attrs["journey"].train,
-            error_to_raise=serializers.ValidationError
-        )
-
-        return data
+    # Journeys of all tickets are loaded at once in OrderSerializer.
+    journey = serializers.IntegerField(source="journey_id")
 
     class Meta:
         model = Ticket
         fields = ("id", "cargo", "seat", "journey")
+        # Occupancy is checked against the locked seat maps in
+        # OrderSerializer.create instead of one query per ticket.
+        validators = []
+
+
+class JourneyAvailabilitySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = JourneyAvailability
+        fields = (
+            "journey", "route", "source", "source_name",
+            "destination", "destination_name", "train", "train_name",
+            "departure_time", "arrival_time",
+            "capacity", "seats_sold", "seats_available", "refreshed_at",
+        )
 
 
 class CrewSerializer(serializers.ModelSerializer):
@@ -174,7 +209,6 @@ class JourneyDetailSerializer(JourneyListSerializer):
     route = RouteDetailSerializer(many=False, read_only=True)
     train = TrainSerializer(many=False, read_only=True)
     crew = CrewSerializer(many=True, read_only=True)
-    taken_seats = TicketSerializer(source="tickets", many=True, read_only=True)
 
 
 class CrewListSerializer(serializers.ModelSerializer):
@@ -205,14 +239,52 @@ class OrderSerializer(serializers.ModelSerializer):
         allow_empty=False
     )
 
-    def create(self, validated_data):
-        with transaction.atomic():
-            tickets_data = validated_data.pop("tickets")
-            order = Order.objects.create(**validated_data)
+    def validate(self, attrs):
+        data = super(OrderSerializer, self).validate(attrs)
+        journeys = Journey.objects.select_related("train").in_bulk(
+            {ticket_data["journey_id"] for ticket_data in data["tickets"]}
+        )
+        errors = []
+        for ticket_data in data["tickets"]:
+            journey = journeys.get(ticket_data["journey_id"])
+            try:
+                if journey is None:
+                    raise serializers.ValidationError(
+                        {
+                            "journey": serializers.PrimaryKeyRelatedField
+                            .default_error_messages["does_not_exist"]
+                            .format(pk_value=ticket_data["journey_id"])
+                        }
+                    )
+                Ticket.validate_ticket(
+                    cargo=ticket_data["cargo"],
+                    seat=ticket_data["seat"],
+                    train=journey.train,
+                    error_to_raise=serializers.ValidationError
+                )
+            except serializers.ValidationError as error:
+                errors.append(error.detail)
+            else:
+                errors.append({})
+        if any(errors):
+            raise serializers.ValidationError({"tickets": errors})
 
-            for ticket_data in tickets_data:
-                Ticket.objects.create(order=order, **ticket_data)
-            return Order
+        return data
+
+    def create(self, validated_data):
+        tickets_data = validated_data.pop("tickets")
+        return book_tickets(
+            [
+                (
+                    ticket_data["journey_id"],
+                    ticket_data["cargo"],
+                    ticket_data["seat"],
+                )
+                for ticket_data in tickets_data
+            ],
+            seat_hold=self.context.get("seat_hold"),
+            **validated_data,
+        )
 
     class Meta:
         model = Order
@@ -225,3 +297,81 @@ class OrderListSerializer(OrderSerializer):
 
 class OrderDetailSerializer(OrderListSerializer):
     pass
+
+
+class SeatHoldSerializer(serializers.Serializer):
+    token = serializers.CharField(read_only=True)
+    journey = serializers.PrimaryKeyRelatedField(
+        queryset=Journey.objects.select_related("train")
+    )
+    seats = SeatSerializer(many=True, allow_empty=False)
+    minutes = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.SEAT_HOLD_MAX_MINUTES,
+        default=settings.SEAT_HOLD_MINUTES,
+        write_only=True,
+    )
+    expires_at = serializers.DateTimeField(read_only=True)
+
+    def validate(self, attrs):
+        journey = attrs["journey"]
+        seats = [(seat["cargo"], seat["seat"]) for seat in attrs["seats"]]
+        if len(set(seats)) != len(seats):
+            raise serializers.ValidationError(
+                {"seats": "Each seat can only be held once."}
+            )
+
+        for cargo, seat in seats:
+            Ticket.validate_ticket(
+                cargo=cargo,
+                seat=seat,
+                train=journey.train,
+                error_to_raise=serializers.ValidationError,
+            )
+
+        sold = [seat for seat in seats if seat in journey.seats]
+        if sold:
+            raise SeatConflict(
+                [
+                    {"journey": journey.pk, "cargo": cargo, "seat": seat}
+                    for cargo, seat in sold
+                ],
+                suggest_alternatives(
+                    journey.pk, journey.seats, sold, exclude=seats
+                ),
+            )
+
+        return attrs
+
+    def create(self, validated_data):
+        seats = [
+            (seat["cargo"], seat["seat"]) for seat in validated_data["seats"]
+        ]
+        try:
+            return get_seat_hold_store().hold(
+                validated_data["journey"].pk,
+                seats,
+                self.context["request"].user.pk,
+                validated_data["minutes"] * 60,
+            )
+        except SeatsUnavailable as error:
+            journey = validated_data["journey"]
+            raise SeatConflict(
+                [
+                    {"journey": journey.pk, "cargo": cargo, "seat": seat}
+                    for cargo, seat in error.seats
+                ],
+                suggest_alternatives(
+                    journey.pk, journey.seats, error.seats, exclude=seats
+                ),
+            )
+
+    def to_representation(self, hold):
+        return {
+            "token": hold["token"],
+            "journey": hold["journey"],
+            "seats": [
+                {"cargo": cargo, "seat": seat} for cargo, seat in hold["seats"]
+            ],
+            "expires_at": datetime.fromtimestamp(hold["expires_at"]),
+        }
@@ -0,0 +1,175 @@
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from train_station.geo import station_deleted, station_saved
+from train_station.image_variants import schedule_image_variants
+from train_station.storage import release_media
+from train_station.models import (
+    Journey,
+    Order,
+    Route,
+    Station,
+    Ticket,
+    Train,
+)
+from train_station.route_planner import (
+    invalidate_route_graph,
+    route_graph_changed,
+)
+
+
+def _update_seat_map(journey_id, update, sold=0):
+    with transaction.atomic():
+        journey = (
+            Journey.objects.select_for_update(of=("self",))
+            .select_related("train")
+            .filter(pk=journey_id)
+            .first()
+        )
+        if journey is None:
+            return
+
+        update(journey)
+        Journey.objects.filter(pk=journey_id).update(
+            seat_map=journey.seat_map,
+            seats_sold=Greatest(F("seats_sold") + sold, 0),
+            updated_at=journey.updated_at,
+        )
+
+
+@receiver(post_save, sender=Ticket)
+def take_ticket_seat(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+
+    if created:
+        _update_seat_map(
+            instance.journey_id,
+            lambda journey: journey.take_seats(
+                [(instance.cargo, instance.seat)]
+            ),
+            sold=1,
+        )
+        instance._loaded_journey_id = instance.journey_id
+        return
+
+    # A ticket moved to another journey leaves one seat map and joins
+    # another, both rows are locked in id order like bookings do.
+    sold = {instance.journey_id: 0}
+    if instance.journey_changed:
+        sold = {instance._loaded_journey_id: -1, instance.journey_id: 1}
+        instance._loaded_journey_id = instance.journey_id
+    for journey_id in sorted(sold):
+        _update_seat_map(
+            journey_id,
+            lambda journey: journey.rebuild_seat_map(),
+            sold=sold[journey_id],
+        )
+
+
+@receiver(pre_delete, sender=Order)
+def release_order_seats(sender, instance, **kwargs):
+    # Tickets deleted along with their journey skip this, there is no
+    # seat map left to update.
+    Ticket.objects.filter(order=instance).release_seats()
+
+
+@receiver(post_save, sender=Journey)
+def rebuild_journey_seat_map(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw and instance.train_changed:
+        _update_seat_map(
+            instance.pk, lambda journey: journey.rebuild_seat_map()
+        )
+        instance._loaded_train_id = instance.train_id
+
+
+@receiver(post_save, sender=Train)
+def rebuild_train_seat_maps(sender, instance, created, raw=False, **kwargs):
+    if created or raw or not instance.layout_changed:
+        return
+
+    for journey_id in instance.journeys.values_list("id", flat=True):
+        _update_seat_map(
+            journey_id, lambda journey: journey.rebuild_seat_map()
+        )
+    instance._loaded_layout = (instance.cargo_num, instance.places_in_cargo)
+
+
+@receiver(post_save, sender=Train)
+def render_train_image_variants(
+    sender, instance, created, raw=False, **kwargs
+):
+    if raw:
+        return
+
+    if (created and instance.image) or instance.image_changed:
+        schedule_image_variants(instance.pk)
+    if instance.image_changed:
+        # Variants of the old image go at once, so empty variants always
+        # mean a render is pending (see render_image_variants).
+        trains = Train.objects.filter(pk=instance.pk)
+        stale = trains.values_list("image_variants", flat=True).get()
+        trains.update(image_variants={})
+        instance.image_variants = {}
+        replaced = [instance._loaded_image] + [
+            name for formats in stale.values() for name in formats.values()
+        ]
+        transaction.on_commit(lambda: release_media(replaced))
+    if "image" in instance.__dict__:
+        instance._loaded_image = instance.image.name
+
+
+@receiver(post_delete, sender=Train)
+def release_train_media(sender, instance, **kwargs):
+    names = [instance.image.name] + [
+        name
+        for formats in (instance.image_variants or {}).values()
+        for name in formats.values()
+    ]
+    transaction.on_commit(lambda: release_media(names))
+
+
+@receiver(post_save, sender=Route)
+@receiver(post_save, sender=Journey)
+def update_route_graph(sender, **kwargs):
+    route_graph_changed()
+
+
+@receiver(post_delete, sender=Route)
+@receiver(post_delete, sender=Journey)
+def reset_route_graph(sender, **kwargs):
+    invalidate_route_graph()
+
+
+@receiver(post_save, sender=Station)
+def index_station(sender, instance, raw=False, **kwargs):
+    station_saved(instance)
+
+
+@receiver(post_delete, sender=Station)
+def unindex_station(sender, instance, **kwargs):
+    station_deleted(instance.pk)
+
+
+@receiver(m2m_changed, sender=Train.facility.through)
+@receiver(m2m_changed, sender=Journey.crew.through)
+def touch_m2m_updated_at(sender, instance, model, action, pk_set, **kwargs):
+    if not action.startswith("post_"):
+        return
+
+    now = timezone.now()
+    if hasattr(instance, "updated_at"):
+        type(instance).objects.filter(pk=instance.pk).update(updated_at=now)
+    if pk_set and any(
+        field.name == "updated_at" for field in model._meta.fields
+    ):
+        model.objects.filter(pk__in=pk_set).update(updated_at=now)
@@ -0,0 +1,41 @@
+"""SQLite files holding state shared by every process on the host.
+
+Throttle buckets, seat holds, cache version counters and metrics must be
+seen by all web workers and management commands, so each store keeps its
+tables in a file at a ``path`` they all agree on. Connections are opened
+per thread and reopened after a fork, in WAL mode so readers never wait
+for the single writer.
+"""
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Per-thread connections to a SQLite file with the ``schema`` tables
+
+    ``schema`` is a sequence of ``CREATE TABLE IF NOT EXISTS`` statements
+    run on every new connection.
+    """
+
+    schema = ()
+
+    def __init__(self, path, timeout=5):
+        self.path = path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(
+                self.path, timeout=self.timeout, isolation_level=None
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            for statement in self.schema:
+                connection.execute(statement)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+
+        return connection
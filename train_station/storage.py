@@ -0,0 +1,168 @@
+import hashlib
+import os
+import re
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db.models import Q
+from django.utils import timezone
+from django.views.static import serve
+
+CONTENT_NAME = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.\w+)?$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming files after the SHA-256 of their content
+
+    ``uploads/trains/intercity.png`` is stored as
+    ``uploads/trains/3f/3f9a...e1.png``: identical uploads share one file
+    and a name never changes content, so its URL can be cached forever.
+    Files are removed with :func:`release_media` once nothing refers to
+    them.
+    """
+
+    def _makedirs(self, directory):
+        path = self.path(directory)
+        if self.directory_permissions_mode is None:
+            os.makedirs(path, exist_ok=True)
+            return
+
+        old_umask = os.umask(0o777 & ~self.directory_permissions_mode)
+        try:
+            os.makedirs(path, self.directory_permissions_mode, exist_ok=True)
+        finally:
+            os.umask(old_umask)
+
+    def _save(self, name, content):
+        """Write to a temporary file while hashing, then link it in place
+
+        The link is atomic and fails if the blob exists, so readers
+        never see a partly written blob and a concurrent save of the
+        same content is a dedup hit rather than a clash.
+        """
+        directory, filename = os.path.split(name)
+        _, extension = os.path.splitext(filename)
+        self._makedirs(directory)
+        temp_path = self.path(
+            os.path.join(directory, f".tmp-{uuid.uuid4().hex}")
+        )
+        digest = hashlib.sha256()
+        fd = os.open(
+            temp_path,
+            os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+            0o666,
+        )
+        try:
+            with os.fdopen(fd, "wb") as file:
+                for chunk in content.chunks():
+                    digest.update(chunk)
+                    file.write(chunk)
+            if self.file_permissions_mode is not None:
+                os.chmod(temp_path, self.file_permissions_mode)
+
+            sha = digest.hexdigest()
+            name = os.path.join(
+                directory, sha[:2], f"{sha}{extension.lower()}"
+            )
+            self._makedirs(os.path.dirname(name))
+            while True:
+                try:
+                    os.link(temp_path, self.path(name))
+                    break
+                except FileExistsError:
+                    pass
+                try:
+                    # A fresh mtime keeps the garbage collector off a
+                    # blob that is about to be referenced again.
+                    os.utime(self.path(name))
+                    break
+                except FileNotFoundError:
+                    # Collected in between, link ours after all.
+                    continue
+        finally:
+            os.unlink(temp_path)
+
+        return name
+
+    def get_available_name(self, name, max_length=None):
+        # Names are derived from content in _save, clashes are duplicates.
+        return name
+
+
+def is_content_addressed(name):
+    return bool(CONTENT_NAME.search(name))
+
+
+def serve_media(request, path, document_root=None, show_indexes=False):
+    """``django.views.static.serve`` marking hashed files immutable"""
+    response = serve(request, path, document_root, show_indexes)
+    if response.status_code == 200 and is_content_addressed(path):
+        response["Cache-Control"] = "public, max-age=31536000, immutable"
+
+    return response
+
+
+def referenced_media(names):
+    """The subset of ``names`` used as a train image or image variant"""
+    from train_station.image_variants import FORMATS, VARIANTS
+    from train_station.models import Train
+
+    query = Q(image__in=names)
+    for variant in VARIANTS:
+        for image_format in FORMATS:
+            lookup = f"image_variants__{variant}__{image_format}__in"
+            query |= Q(**{lookup: names})
+
+    referenced = set()
+    for image, variants in Train.objects.filter(query).values_list(
+        "image", "image_variants"
+    ):
+        referenced.add(image)
+        for formats in (variants or {}).values():
+            referenced.update(formats.values())
+
+    return referenced & set(names)
+
+
+def release_media(names, storage=default_storage, grace=None, dry_run=False):
+    """Delete the files in ``names`` that no train refers to any more
+
+    Files written within ``grace`` seconds (``MEDIA_GC_GRACE_SECONDS``
+    by default) are kept, they may belong to an upload that is not
+    committed yet; ``collect_media`` sweeps them later. Returns the
+    deleted names.
+    """
+    names = {name for name in names if name}
+    if not names:
+        return []
+
+    if grace is None:
+        grace = settings.MEDIA_GC_GRACE_SECONDS
+    cutoff = timezone.now() - timedelta(seconds=grace)
+    deleted = []
+    for name in sorted(names - referenced_media(list(names))):
+        try:
+            if storage.get_modified_time(name) > cutoff:
+                continue
+            if not dry_run:
+                storage.delete(name)
+        except (FileNotFoundError, NotImplementedError):
+            continue
+        deleted.append(name)
+
+    return deleted
+
+
+def walk_media(storage=default_storage, directory="uploads"):
+    """Yield every file name below ``directory``"""
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+
+    for filename in files:
+        yield os.path.join(directory, filename)
+    for subdirectory in directories:
+        yield from walk_media(storage, os.path.join(directory, subdirectory))
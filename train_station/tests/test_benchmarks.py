@@ -0,0 +1,86 @@
+import json
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase
+
+from train_station.benchmarks import QUERYSET_BENCHMARKS, SIZED_BENCHMARKS
+
+
+class BenchmarkCommandTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.baseline = Path(directory.name) / "baseline.json"
+        self.options = {
+            "sizes": [5],
+            "queryset_loops": 2,
+            "repeat": 1,
+            "baseline": str(self.baseline),
+            "stdout": StringIO(),
+        }
+
+    def test_save_baseline(self):
+        call_command("benchmark", save_baseline=True, **self.options)
+
+        results = json.loads(self.baseline.read_text())["results"]
+        self.assertEqual(
+            len(results), len(SIZED_BENCHMARKS) + len(QUERYSET_BENCHMARKS)
+        )
+        self.assertIn("serialize.JourneyDetailSerializer[5]", results)
+
+    def test_missing_baseline_fails(self):
+        with self.assertRaisesMessage(CommandError, "No baseline"):
+            call_command("benchmark", only=["OrderList"], **self.options)
+
+        call_command(
+            "benchmark",
+            only=["OrderList"],
+            allow_missing_baseline=True,
+            **self.options,
+        )
+        self.assertIn("No baseline", self.options["stdout"].getvalue())
+
+    def write_baseline(self, calibration, **results):
+        self.baseline.write_text(
+            json.dumps({"calibration": calibration, "results": results})
+        )
+
+    def test_regression_fails(self):
+        name = "serialize.OrderListSerializer[5]"
+        self.write_baseline(1.0, **{name: 1e-9})
+
+        with self.assertRaisesMessage(CommandError, name):
+            call_command("benchmark", only=["OrderList"], **self.options)
+
+    def test_within_threshold_passes(self):
+        name = "serialize.OrderListSerializer[5]"
+        self.write_baseline(1e-9, **{name: 60.0})
+
+        call_command("benchmark", only=["OrderList"], **self.options)
+        self.assertIn("No regressions.", self.options["stdout"].getvalue())
+
+    @mock.patch(
+        "train_station.management.commands.benchmark.run_benchmarks",
+        return_value={"serialize.OrderListSerializer[5]": 0.4},
+    )
+    @mock.patch(
+        "train_station.management.commands.benchmark.calibrate",
+        return_value=0.2,
+    )
+    def test_baseline_scaled_by_calibration(self, *mocks):
+        # Twice as slow as the baseline on a machine half as fast.
+        self.write_baseline(0.1, **{"serialize.OrderListSerializer[5]": 0.2})
+
+        call_command("benchmark", **self.options)
+
+        self.assertIn("No regressions.", self.options["stdout"].getvalue())
+
+    def test_baseline_without_calibration_fails(self):
+        self.baseline.write_text(json.dumps({"results": {}}))
+
+        with self.assertRaisesMessage(CommandError, "no calibration"):
+            call_command("benchmark", only=["OrderList"], **self.options)
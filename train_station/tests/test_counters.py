@@ -0,0 +1,65 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.test import SimpleTestCase
+
+from train_station.counters import LocalCounterStore, SQLiteCounterStore
+
+
+def _incr_many(path, count):
+    store = SQLiteCounterStore(path)
+    for _ in range(count):
+        store.incr("shared")
+
+
+class CounterStoreTestMixin:
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_incr_returns_new_value(self):
+        self.assertEqual(self.store.incr("key"), 1)
+        self.assertEqual(self.store.incr("key", 5), 6)
+        self.assertEqual(self.store.get("key"), 6)
+
+    def test_missing_keys_are_zero(self):
+        self.store.incr("a")
+
+        self.assertEqual(self.store.get_many(["a", "b"]), {"a": 1, "b": 0})
+
+    def test_delete(self):
+        self.store.incr("a")
+        self.store.delete(["a"])
+
+        self.assertEqual(self.store.get("a"), 0)
+
+
+class LocalCounterStoreTests(CounterStoreTestMixin, SimpleTestCase):
+    def make_store(self):
+        return LocalCounterStore()
+
+
+class SQLiteCounterStoreTests(CounterStoreTestMixin, SimpleTestCase):
+    def make_store(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, "counters.sqlite3")
+        return SQLiteCounterStore(self.path)
+
+    def test_processes_share_counters(self):
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_incr_many, args=(self.path, 50))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertEqual(self.store.get("shared"), 200)
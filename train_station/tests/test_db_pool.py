@@ -0,0 +1,251 @@
+import threading
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from rest_framework import status
+from psycopg2 import extensions
+from rest_framework.test import APIClient
+
+from train_station import db_pool
+from train_station.backends.postgresql_pool.base import (
+    DatabaseWrapper,
+    _reset,
+)
+from train_station.db_pool import ConnectionPool, PoolTimeout
+
+DB_POOL_STATS_URL = reverse("train-station:db-pool-stats")
+
+
+class FakeConnection:
+    opened = 0
+
+    def __init__(self):
+        FakeConnection.opened += 1
+        self.closed = False
+        self.healthy = True
+
+    def close(self):
+        self.closed = True
+
+
+def check(connection):
+    if not connection.healthy:
+        raise ConnectionError("server closed the connection")
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.now = 0.0
+
+    def make_pool(self, **options):
+        return ConnectionPool(
+            FakeConnection,
+            check=check,
+            clock=lambda: self.now,
+            **{"max_size": 2, "timeout": 0.05, **options},
+        )
+
+    def test_connections_reused(self):
+        pool = self.make_pool()
+        connection = pool.getconn()
+        pool.putconn(connection)
+
+        self.assertIs(pool.getconn(), connection)
+        self.assertEqual(pool.stats()["created"], 1)
+        self.assertEqual(pool.stats()["checkouts"], 2)
+
+    def test_checkout_times_out_when_exhausted(self):
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=0.05)
+        pool.getconn()
+
+        with self.assertRaises(PoolTimeout):
+            pool.getconn()
+        stats = pool.stats()
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertEqual(stats["in_use"], 1)
+
+    def test_waiting_checkout_gets_returned_connection(self):
+        pool = ConnectionPool(FakeConnection, max_size=1, timeout=5)
+        connection = pool.getconn()
+        timer = threading.Timer(0.05, pool.putconn, [connection])
+        timer.start()
+
+        self.assertIs(pool.getconn(), connection)
+        timer.join()
+        self.assertGreater(pool.stats()["wait_seconds_max"], 0)
+
+    def test_unhealthy_idle_connection_replaced(self):
+        pool = self.make_pool(check_idle=5)
+        connection = pool.getconn()
+        pool.putconn(connection)
+        connection.healthy = False
+
+        self.now = 4
+        self.assertIs(pool.getconn(), connection)
+        pool.putconn(connection)
+
+        self.now = 10
+        replacement = pool.getconn()
+        self.assertIsNot(replacement, connection)
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_old_connections_retired(self):
+        pool = self.make_pool(max_lifetime=60)
+        connection = pool.getconn()
+
+        self.now = 61
+        pool.putconn(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_reset_can_refuse_connection(self):
+        pool = self.make_pool(reset=lambda connection: False)
+        connection = pool.getconn()
+        pool.putconn(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertEqual(pool.stats()["idle"], 0)
+
+    def test_failed_connect_frees_slot(self):
+        pool = ConnectionPool(
+            mock.Mock(side_effect=ConnectionError), max_size=1, timeout=0.05
+        )
+
+        for _ in range(2):
+            with self.assertRaises(ConnectionError):
+                pool.getconn()
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_closed_pool_drops_connections(self):
+        pool = self.make_pool()
+        idle, in_use = pool.getconn(), pool.getconn()
+        pool.putconn(idle)
+
+        pool.close()
+        pool.putconn(in_use)
+
+        self.assertTrue(idle.closed)
+        self.assertTrue(in_use.closed)
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_min_size_filled_in_background(self):
+        pool = self.make_pool(min_size=2)
+        for thread in threading.enumerate():
+            if thread.name == "db-pool-fill":
+                thread.join(1)
+
+        self.assertEqual(pool.stats()["idle"], 2)
+
+
+class DatabasePoolStatsApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.pool = db_pool.get_pool(
+            "test-pool", "test", connect=FakeConnection
+        )
+        self.addCleanup(db_pool._pools.pop, ("test-pool", "test"))
+
+    def test_stats_require_admin(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user("user@test.com", "test12345")
+        )
+
+        res = self.client.get(DB_POOL_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_stats(self):
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "admin@test.com", "test12345", is_staff=True
+            )
+        )
+        self.pool.getconn()
+
+        res = self.client.get(DB_POOL_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["pools"]["test-pool"]["in_use"], 1)
+
+
+def pooled_wrapper(alias="pool-test", **options):
+    settings_dict = {
+        **connection.settings_dict,
+        "ENGINE": "train_station.backends.postgresql_pool",
+        "POOL": {"MAX_SIZE": 1},
+    }
+    settings_dict["OPTIONS"] = {**settings_dict["OPTIONS"], **options}
+    return DatabaseWrapper(settings_dict, alias)
+
+
+class PooledBackendTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(db_pool.close_pools)
+
+    @mock.patch(
+        "train_station.backends.postgresql_pool.base._connect",
+        side_effect=lambda *args: FakeConnection(),
+    )
+    def test_pools_keyed_by_connection_settings(self, connect):
+        first, same = pooled_wrapper(), pooled_wrapper()
+        other = pooled_wrapper(application_name="reports")
+
+        for wrapper in (first, same, other):
+            raw = wrapper.get_new_connection(wrapper.get_connection_params())
+            wrapper.pool.putconn(raw)
+
+        self.assertIs(first.pool, same.pool)
+        self.assertIsNot(first.pool, other.pool)
+        options = connect.call_args.args[0]["OPTIONS"]
+        self.assertEqual(options["application_name"], "reports")
+
+    def test_reset_discards_session_state(self):
+        raw = mock.MagicMock(closed=False, autocommit=False)
+        raw.info.transaction_status = extensions.TRANSACTION_STATUS_INTRANS
+        cursor = raw.cursor.return_value.__enter__.return_value
+
+        self.assertTrue(_reset(raw))
+
+        raw.rollback.assert_called_once_with()
+        cursor.execute.assert_called_once_with("DISCARD ALL")
+        self.assertFalse(raw.autocommit)
+
+
+@skipUnless(
+    isinstance(connection, DatabaseWrapper),
+    "needs the pooled PostgreSQL backend",
+)
+class PooledPostgreSQLTests(SimpleTestCase):
+    def setUp(self):
+        self.addCleanup(db_pool.close_pools)
+        self.wrapper = pooled_wrapper()
+        self.addCleanup(self.wrapper.close)
+
+    def checkout(self):
+        self.wrapper.close()
+        self.wrapper.ensure_connection()
+        return self.wrapper.connection
+
+    def test_checkout_starts_without_session_state(self):
+        raw = self.checkout()
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SET statement_timeout = 1234")
+            cursor.execute("CREATE TEMPORARY TABLE pool_scratch (id int)")
+            cursor.execute("SELECT pg_advisory_lock(4242)")
+
+        self.assertIs(self.checkout(), raw)
+        with self.wrapper.cursor() as cursor:
+            cursor.execute("SHOW statement_timeout")
+            self.assertNotEqual(cursor.fetchone()[0], "1234ms")
+            cursor.execute("SELECT to_regclass('pg_temp.pool_scratch')")
+            self.assertIsNone(cursor.fetchone()[0])
+            cursor.execute(
+                "SELECT count(*) FROM pg_locks "
+                "WHERE locktype = 'advisory' AND pid = pg_backend_pid()"
+            )
+            self.assertEqual(cursor.fetchone()[0], 0)
@@ -0,0 +1,139 @@
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from train_station import db_router
+from train_station.db_router import ReplicaLagMonitor, replica_reads
+from train_station.models import Facility, Station
+
+STATION_URL = reverse("train-station:station-list")
+ASYNC_STATION_URL = reverse("train-station:async-station-list")
+FACILITY_URL = reverse("train-station:facility-list")
+
+
+class ReplicaTestMixin:
+    """Serve a ``replica`` alias from the default test connection"""
+
+    def setUp(self):
+        super().setUp()
+        self.settings = override_settings(DATABASE_REPLICAS=["replica"])
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        connections["replica"] = connections["default"]
+        self.addCleanup(delattr, connections._connections, "replica")
+        db_router.lag_monitor.clear()
+        self.addCleanup(db_router.lag_monitor.clear)
+
+
+class ReplicaRouterTests(ReplicaTestMixin, TestCase):
+    def test_reads_outside_block_use_primary(self):
+        self.assertEqual(Station.objects.all().db, "default")
+
+    def test_reads_in_block_use_replica(self):
+        with replica_reads():
+            self.assertEqual(Station.objects.all().db, "replica")
+
+    def test_reads_after_write_use_primary(self):
+        with replica_reads():
+            Station.objects.create(name="Kyiv", latitude=50.4, longitude=30.5)
+            self.assertEqual(Station.objects.all().db, "default")
+
+    def test_lagging_replica_skipped(self):
+        with mock.patch.object(
+            db_router.lag_monitor, "measure", return_value=30.0
+        ):
+            with replica_reads():
+                self.assertEqual(Station.objects.all().db, "default")
+            with replica_reads(max_lag=5):
+                self.assertEqual(Station.objects.all().db, "default")
+
+    def test_replica_behind_own_write_skipped(self):
+        with mock.patch.object(
+            db_router.lag_monitor, "measure", return_value=2.0
+        ):
+            with replica_reads(max_lag=1):
+                self.assertEqual(Station.objects.all().db, "default")
+            with replica_reads(max_lag=3):
+                self.assertEqual(Station.objects.all().db, "replica")
+
+    def test_lag_measured_once_per_interval(self):
+        now = [0]
+        monitor = ReplicaLagMonitor(interval=5, clock=lambda: now[0])
+        with mock.patch.object(monitor, "measure", return_value=1.0) as m:
+            monitor.lag("replica")
+            now[0] = 4
+            monitor.lag("replica")
+            now[0] = 5
+            monitor.lag("replica")
+
+        self.assertEqual(m.call_count, 2)
+
+
+class ReplicaRoutingMiddlewareTests(ReplicaTestMixin, TestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "admin@test.com", "test12345", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        cache.clear()
+        self.choose = mock.patch.object(
+            db_router, "choose_replica", wraps=db_router.choose_replica
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_replica_views_read_from_replica(self):
+        res = self.client.get(STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.choose.called)
+        self.assertNotIn("last_write", res.cookies)
+
+    def test_async_views_read_from_replica(self):
+        res = self.client.get(ASYNC_STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.choose.called)
+
+    async def test_asgi_requests_read_from_replica(self):
+        token = await sync_to_async(AccessToken.for_user)(self.user)
+        res = await self.async_client.get(
+            STATION_URL, headers={"Authorization": f"Bearer {token}"}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.choose.called)
+
+    def test_other_views_stay_on_primary(self):
+        Facility.objects.create(name="wifi")
+
+        self.client.get(FACILITY_URL)
+
+        self.assertFalse(self.choose.called)
+
+    def test_writes_pin_client_to_primary(self):
+        res = self.client.post(
+            STATION_URL,
+            {"name": "Lviv", "latitude": 49.8, "longitude": 24.0},
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertIn("last_write", res.cookies)
+
+        with mock.patch.object(
+            db_router.lag_monitor, "measure", return_value=1.0
+        ):
+            res = self.client.get(STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        # The write is fresher than the replica's one second of lag.
+        self.assertLess(self.choose.call_args.args[0], 1.0)
+        self.assertEqual(res.data[0]["name"], "Lviv")
@@ -1,13 +1,18 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models.signals import post_delete, post_save
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from train_station.models import Facility
+from train_station.counters import get_counter_store
+from train_station.models import Facility, Order, Ticket, Train, TrainType
+from train_station.response_cache import HITS_KEY, MISSES_KEY, _version_key
 from train_station.serializers import FacilitySerializer
 
 FACILITY_URL = reverse("train-station:facility-list")
+CACHE_STATS_URL = reverse("train-station:response-cache-stats")
 
 
 def detail_url(facility_id: int):
@@ -94,3 +99,97 @@ class AdminFacilityTests(TestCase):
         url = detail_url(facility.id)
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class FacilityResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        get_counter_store().delete([HITS_KEY, MISSES_KEY])
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_list_served_from_cache_until_facility_changes(self):
+        facility = sample_facility(name="wifi")
+
+        res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+
+        res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertEqual(res.json(), [{"id": facility.id, "name": "wifi"}])
+
+        facility.name = "WC"
+        facility.save()
+
+        res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.json(), [{"id": facility.id, "name": "WC"}])
+
+        facility.delete()
+
+        res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.json(), [])
+
+    def test_train_facility_changes_retire_entries(self):
+        facility = sample_facility()
+        train = Train.objects.create(
+            name="Intercity",
+            cargo_num=5,
+            places_in_cargo=20,
+            train_type=TrainType.objects.create(name="intercity"),
+        )
+        self.client.get(FACILITY_URL)
+
+        train.facility.add(facility)
+
+        res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+
+    def test_only_cached_models_are_watched(self):
+        self.assertFalse(post_save.has_listeners(Order))
+        self.assertFalse(post_delete.has_listeners(Ticket))
+
+    def test_version_bumped_by_another_process_retires_entries(self):
+        sample_facility()
+        self.client.get(FACILITY_URL)
+
+        get_counter_store().incr(_version_key(Facility))
+
+        res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+
+    def test_cached_response_answers_conditional_requests(self):
+        sample_facility()
+        etag = self.client.get(FACILITY_URL)["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(FACILITY_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(FACILITY_URL)
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertEqual(res["ETag"], etag)
+
+    def test_query_params_are_part_of_the_key(self):
+        sample_facility()
+
+        self.client.get(FACILITY_URL)
+        res = self.client.get(FACILITY_URL, {"page_size": 1})
+        self.assertEqual(res["X-Cache"], "MISS")
+
+    def test_cache_stats(self):
+        sample_facility()
+        self.client.get(FACILITY_URL)
+        self.client.get(FACILITY_URL)
+        self.client.get(FACILITY_URL)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["hits"], 2)
+        self.assertEqual(res.data["misses"], 1)
@@ -0,0 +1,53 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from train_station.models import Journey, Order, Route, Station, Ticket
+
+
+class GenerateNetworkTest(TestCase):
+    def generate(self, **options):
+        defaults = {
+            "stations": 20,
+            "routes": 40,
+            "trains": 5,
+            "journeys": 30,
+            "batch_size": 50,
+            "stdout": StringIO(),
+        }
+        defaults.update(options)
+        call_command("generate_network", **defaults)
+
+    def test_generates_consistent_network(self):
+        self.generate()
+
+        self.assertEqual(Station.objects.count(), 20)
+        self.assertEqual(Route.objects.count(), 40)
+        self.assertEqual(Journey.objects.count(), 30)
+        self.assertTrue(Ticket.objects.exists())
+        for journey in Journey.objects.select_related("train"):
+            tickets = set(journey.tickets.values_list("cargo", "seat"))
+            self.assertEqual(set(journey.seats), tickets)
+            self.assertEqual(journey.seats_sold, len(tickets))
+            self.assertLessEqual(len(tickets), journey.seats.capacity)
+
+    def test_same_seed_same_network(self):
+        self.generate(seed=7)
+        first = list(
+            Ticket.objects.order_by("id").values_list("cargo", "seat")
+        )
+        Order.objects.all().delete()
+        Journey.objects.all().delete()
+
+        self.generate(seed=7)
+        second = list(
+            Ticket.objects.order_by("id").values_list("cargo", "seat")
+        )
+        self.assertEqual(first, second)
+
+    def test_sequences_continue_after_explicit_ids(self):
+        self.generate()
+
+        station = Station.objects.create(name="new", latitude=0, longitude=0)
+        self.assertGreater(station.id, 20)
@@ -1,21 +1,36 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
 from train_station.models import (
-    Journey, Route, Train, Crew, Station, TrainType,
+    Journey, Route, Train, Crew, Station, TrainType, Order, Ticket,
 )
 from train_station.serializers import JourneyDetailSerializer
 
 JOURNEY_URL = reverse("train-station:journey-list")
+JOURNEY_SEARCH_URL = reverse("train-station:journey-search")
+ASYNC_JOURNEY_URL = reverse("train-station:async-journey-list")
 
 
 def detail_url(journey_id: int):
     return reverse("train-station:journey-detail", args=[journey_id])
 
 
+def manifest_url(journey_id: int):
+    return reverse("train-station:journey-manifest", args=[journey_id])
+
+
+def async_detail_url(journey_id: int):
+    return reverse("train-station:async-journey-detail", args=[journey_id])
+
+
 def sample_station(**params):
     defaults = {
         "name": "test_station",
@@ -61,20 +76,20 @@ def sample_train_type(**params):
 
 
 def sample_journey(**params):
-    route = Route.objects.create(
-        source=sample_station(),
-        destination=sample_station(),
-        distance=100,
-    )
-    train = Train.objects.create(
-        name="Test Train",
-        cargo_num=50,
-        places_in_cargo=25,
-        train_type=sample_train_type(),
-    )
+    if "route" not in params:
+        params["route"] = Route.objects.create(
+            source=sample_station(),
+            destination=sample_station(),
+            distance=100,
+        )
+    if "train" not in params:
+        params["train"] = Train.objects.create(
+            name="Test Train",
+            cargo_num=50,
+            places_in_cargo=25,
+            train_type=sample_train_type(),
+        )
     defaults = {
-        "route": route,
-        "train": train,
         "departure_time": "2023-09-05T18:00:00",
         "arrival_time": "2023-09-05T19:00:00",
     }
@@ -102,6 +117,22 @@ class UnauthenticatedJourneyApiTest(TestCase):
         res = self.client.get(JOURNEY_URL)
         self.assertEquals(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
+    def test_async_auth_required(self):
+        res = self.client.get(ASYNC_JOURNEY_URL)
+        self.assertEquals(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_async_jwt_authentication(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+        )
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}"
+        )
+
+        res = self.client.get(ASYNC_JOURNEY_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
 
 class AuthenticatedJourneyApiTest(TestCase):
     def setUp(self):
@@ -118,6 +149,30 @@ class AuthenticatedJourneyApiTest(TestCase):
         res = self.client.get(JOURNEY_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
 
+    def test_list_journey_cursor_pagination(self):
+        first = sample_journey()
+        journeys = [first] + [
+            sample_journey(
+                route=first.route,
+                train=first.train,
+                departure_time=f"2023-09-{day:02d}T18:00:00",
+            )
+            for day in range(6, 13)
+        ]
+        expected = [journey.id for journey in reversed(journeys)]
+
+        res = self.client.get(JOURNEY_URL)
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]], expected[:5]
+        )
+        self.assertIsNone(res.data["previous"])
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]], expected[5:]
+        )
+        self.assertIsNone(res.data["next"])
+
     def test_retrieve_journey_detail(self):
         journey = sample_journey()
 
@@ -130,6 +185,249 @@ class AuthenticatedJourneyApiTest(TestCase):
         for key in serializer.data:
             self.assertEqual(serializer.data[key], res.data[key])
 
+    def test_async_list_matches_sync_list(self):
+        first = sample_journey()
+        for day in range(6, 13):
+            sample_journey(
+                route=first.route,
+                train=first.train,
+                departure_time=f"2023-09-{day:02d}T18:00:00",
+            )
+
+        res = self.client.get(ASYNC_JOURNEY_URL)
+        expected = self.client.get(JOURNEY_URL)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json()["results"], expected.json()["results"])
+
+        res = self.client.get(res.json()["next"])
+        expected = self.client.get(expected.json()["next"])
+        self.assertEqual(res.json()["results"], expected.json()["results"])
+        self.assertIsNone(res.json()["next"])
+
+    def test_async_retrieve_matches_sync_retrieve(self):
+        journey = sample_journey()
+        journey.crew.add(sample_crew())
+
+        res = self.client.get(async_detail_url(journey.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.json(), self.client.get(detail_url(journey.id)).json()
+        )
+
+    def test_async_retrieve_conditional_get(self):
+        journey = sample_journey()
+        url = async_detail_url(journey.id)
+
+        res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", res)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+    def test_async_retrieve_missing_journey(self):
+        res = self.client.get(async_detail_url(12345))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_seat_map_follows_tickets(self):
+        journey = sample_journey()
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=1, seat=2, journey=journey, order=order)
+        ticket = Ticket.objects.create(
+            cargo=3, seat=25, journey=journey, order=order
+        )
+
+        res = self.client.get(detail_url(journey.id))
+        self.assertEqual(res.data["tickets_available"], 50 * 25 - 2)
+        self.assertEqual(
+            res.data["taken_seats"],
+            [{"cargo": 1, "seat": 2}, {"cargo": 3, "seat": 25}],
+        )
+
+        ticket.delete()
+        journey.refresh_from_db()
+        self.assertEqual(journey.tickets_available, 50 * 25 - 1)
+        self.assertEqual(journey.taken_seats, [{"cargo": 1, "seat": 2}])
+
+    def test_seats_sold_counter(self):
+        journey = sample_journey()
+        other = sample_journey(route=journey.route, train=journey.train)
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=1, seat=1, journey=journey, order=order)
+        ticket = Ticket.objects.create(
+            cargo=1, seat=2, journey=journey, order=order
+        )
+
+        ticket.journey = other
+        ticket.save()
+        journey.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual((journey.seats_sold, other.seats_sold), (1, 1))
+        self.assertEqual(other.taken_seats, [{"cargo": 1, "seat": 2}])
+
+        order.delete()
+        journey.refresh_from_db()
+        self.assertEqual(journey.seats_sold, 0)
+
+    def test_save_keeps_seats_sold_since_load(self):
+        journey = sample_journey()
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=1, seat=1, journey=journey, order=order)
+
+        journey.arrival_time = "2023-09-05T20:00:00"
+        journey.save()
+        journey.refresh_from_db()
+        self.assertEqual(journey.seats_sold, 1)
+        self.assertEqual(journey.taken_seats, [{"cargo": 1, "seat": 1}])
+
+        journey.seats_sold = 5
+        journey.save(update_fields=["seats_sold"])
+        journey.refresh_from_db()
+        self.assertEqual(journey.seats_sold, 5)
+
+    def test_repair_seat_counters(self):
+        journey = sample_journey()
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=1, seat=1, journey=journey, order=order)
+        Journey.objects.filter(pk=journey.pk).update(seats_sold=7)
+
+        call_command("repair_seat_counters", dry_run=True, stdout=StringIO())
+        journey.refresh_from_db()
+        self.assertEqual(journey.seats_sold, 7)
+
+        call_command("repair_seat_counters", stdout=StringIO())
+        journey.refresh_from_db()
+        self.assertEqual(journey.seats_sold, 1)
+        self.assertEqual(journey.tickets_available, 50 * 25 - 1)
+
+    def test_manifest_admin_only(self):
+        journey = sample_journey()
+
+        res = self.client.get(manifest_url(journey.id))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_manifest(self):
+        self.user.is_staff = True
+        self.user.save()
+        journey = sample_journey()
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=2, seat=1, journey=journey, order=order)
+        Ticket.objects.create(cargo=1, seat=5, journey=journey, order=order)
+
+        res = self.client.get(manifest_url(journey.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(lines[1].endswith(",1,5"))
+        self.assertIn(
+            f"journey-{journey.id}-manifest.csv", res["Content-Disposition"]
+        )
+
+    def test_taken_seat_rejected(self):
+        journey = sample_journey()
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=1, seat=1, journey=journey, order=order)
+
+        with self.assertRaises(ValidationError):
+            Ticket.objects.create(
+                cargo=1, seat=1, journey=journey, order=order
+            )
+
+    def test_search_journeys(self):
+        route = sample_route()
+        reverse_route = sample_route(
+            source=route.destination, destination=route.source
+        )
+        early = sample_journey(
+            route=route, departure_time="2023-09-05T08:00:00"
+        )
+        late = sample_journey(
+            route=route,
+            train=early.train,
+            departure_time="2023-09-06T08:00:00",
+        )
+        sample_journey(
+            route=reverse_route,
+            train=early.train,
+            departure_time="2023-09-05T09:00:00",
+        )
+
+        res = self.client.get(
+            JOURNEY_SEARCH_URL,
+            {
+                "source": route.source_id,
+                "destination": route.destination_id,
+                "departure_after": "2023-09-05T00:00:00",
+                "departure_before": "2023-09-05T23:59:59",
+            },
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        results = res.data["results"]
+        self.assertEqual([journey["id"] for journey in results], [early.id])
+        self.assertEqual(results[0]["tickets_available"], 50 * 25)
+
+        res = self.client.get(
+            JOURNEY_SEARCH_URL,
+            {"source": route.source_id, "destination": route.destination_id},
+        )
+        self.assertEqual(
+            [journey["id"] for journey in res.data["results"]],
+            [late.id, early.id],
+        )
+
+    def test_search_journeys_invalid_params(self):
+        res = self.client.get(JOURNEY_SEARCH_URL, {"source": 1})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("destination", res.data)
+
+        res = self.client.get(
+            JOURNEY_SEARCH_URL,
+            {"source": 1, "destination": 2, "departure_after": "tomorrow"},
+        )
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("departure_after", res.data)
+
+    def test_retrieve_journey_conditional_get(self):
+        journey = sample_journey()
+        url = detail_url(journey.id)
+
+        res = self.client.get(url)
+        etag = res["ETag"]
+        self.assertIn("Last-Modified", res)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res.content, b"")
+
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(cargo=1, seat=1, journey=journey, order=order)
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res["ETag"], etag)
+
+    def test_journey_etag_follows_related_changes(self):
+        journey = sample_journey()
+        url = detail_url(journey.id)
+        etag = self.client.get(url)["ETag"]
+
+        journey.crew.add(sample_crew())
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        etag = res["ETag"]
+
+        station = journey.route.source
+        station.name = "renamed"
+        station.save()
+
+        res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
     def test_create_journey_forbidden(self):
         route = Route.objects.create(
             source=sample_station(),
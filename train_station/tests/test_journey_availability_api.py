@@ -0,0 +1,124 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from train_station.models import (
+    Journey, Route, Train, Station, TrainType, Order, Ticket,
+)
+
+AVAILABILITY_URL = reverse("train-station:journeyavailability-list")
+
+
+def detail_url(journey_id: int):
+    return reverse(
+        "train-station:journeyavailability-detail", args=[journey_id]
+    )
+
+
+class UnauthenticatedJourneyAvailabilityApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.get(AVAILABILITY_URL)
+        self.assertEquals(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AuthenticatedJourneyAvailabilityApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+        )
+        self.client.force_authenticate(self.user)
+
+        self.kyiv = Station.objects.create(
+            name="Kyiv", latitude=50.44, longitude=30.49
+        )
+        self.lviv = Station.objects.create(
+            name="Lviv", latitude=49.84, longitude=24.03
+        )
+        self.route = Route.objects.create(
+            source=self.kyiv, destination=self.lviv, distance=540
+        )
+        self.train = Train.objects.create(
+            name="Intercity",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=TrainType.objects.create(name="express"),
+        )
+        self.journey = Journey.objects.create(
+            route=self.route,
+            train=self.train,
+            departure_time="2023-09-05T08:00:00",
+            arrival_time="2023-09-05T13:00:00",
+        )
+
+    def test_list_availability(self):
+        order = Order.objects.create(user=self.user)
+        for seat in (1, 2, 3):
+            Ticket.objects.create(
+                cargo=1, seat=seat, journey=self.journey, order=order
+            )
+
+        res = self.client.get(AVAILABILITY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        [row] = res.data["results"]
+        self.assertEqual(row["journey"], self.journey.id)
+        self.assertEqual(row["source_name"], "Kyiv")
+        self.assertEqual(row["destination_name"], "Lviv")
+        self.assertEqual(row["train_name"], "Intercity")
+        self.assertEqual(
+            (row["capacity"], row["seats_sold"], row["seats_available"]),
+            (20, 3, 17),
+        )
+
+    def test_filter_availability(self):
+        reverse_route = Route.objects.create(
+            source=self.lviv, destination=self.kyiv, distance=540
+        )
+        Journey.objects.create(
+            route=reverse_route,
+            train=self.train,
+            departure_time="2023-09-06T08:00:00",
+            arrival_time="2023-09-06T13:00:00",
+        )
+
+        res = self.client.get(AVAILABILITY_URL, {"source": self.kyiv.id})
+        self.assertEqual(
+            [row["journey"] for row in res.data["results"]],
+            [self.journey.id],
+        )
+
+        res = self.client.get(
+            AVAILABILITY_URL, {"departure_after": "2023-09-06T00:00:00"}
+        )
+        self.assertEqual(
+            [row["source_name"] for row in res.data["results"]], ["Lviv"]
+        )
+
+    def test_retrieve_availability(self):
+        res = self.client.get(detail_url(self.journey.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["seats_available"], 20)
+
+    def test_availability_follows_seats_sold(self):
+        Journey.objects.filter(pk=self.journey.pk).update(seats_sold=25)
+
+        res = self.client.get(detail_url(self.journey.id))
+
+        self.assertEqual(res.data["seats_sold"], 25)
+        self.assertEqual(res.data["seats_available"], 0)
+
+    def test_refresh_command_on_plain_view(self):
+        out = StringIO()
+        call_command("refresh_journey_availability", stdout=out)
+        self.assertIn("plain view", out.getvalue())
@@ -0,0 +1,197 @@
+import os
+import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from train_station.models import Train, TrainType
+from train_station.storage import (
+    ContentAddressedStorage,
+    is_content_addressed,
+    release_media,
+    serve_media,
+)
+from train_station.tests.test_train_api import sample_image
+
+
+def image_upload_url(train_id):
+    return reverse("train-station:train-upload-image", args=[train_id])
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0, MEDIA_GC_GRACE_SECONDS=0)
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.client = APIClient()
+        self.client.force_authenticate(
+            get_user_model().objects.create_user(
+                "admin@test.com", "test12345", is_staff=True
+            )
+        )
+        train_type = TrainType.objects.create(name="Intercity")
+        self.trains = [
+            Train.objects.create(
+                name=f"Train {index}",
+                cargo_num=4,
+                places_in_cargo=20,
+                train_type=train_type,
+            )
+            for index in range(2)
+        ]
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, train, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(train.id),
+                {"image": sample_image(**params)},
+                format="multipart",
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        train.refresh_from_db()
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.media_root, name))
+
+    def test_names_are_content_hashes(self):
+        self.upload(self.trains[0])
+
+        name = self.trains[0].image.name
+        self.assertTrue(name.startswith("uploads/trains/"))
+        self.assertTrue(is_content_addressed(name))
+        self.assertTrue(name.endswith(".png"))
+
+    def test_identical_uploads_share_one_file(self):
+        first, second = self.trains
+        self.upload(first)
+        self.upload(second)
+
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.image_variants, second.image_variants)
+        directory = os.path.dirname(
+            os.path.join(self.media_root, first.image.name)
+        )
+        self.assertEqual(len(os.listdir(directory)), 1)
+
+    def test_concurrent_identical_saves_share_one_file(self):
+        storage = ContentAddressedStorage(location=self.media_root)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            names = set(
+                executor.map(
+                    lambda _: storage.save(
+                        "uploads/trains/a.png", ContentFile(b"same")
+                    ),
+                    range(16),
+                )
+            )
+
+        self.assertEqual(len(names), 1)
+        directory = os.path.join(self.media_root, "uploads/trains")
+        self.assertEqual(
+            [
+                filename
+                for _, _, files in os.walk(directory)
+                for filename in files
+            ],
+            [os.path.basename(names.pop())],
+        )
+
+    def test_save_racing_another_writer_is_a_dedup_hit(self):
+        storage = ContentAddressedStorage(location=self.media_root)
+        link = os.link
+
+        def link_after_other_writer(source, target):
+            with open(target, "wb") as file:
+                file.write(b"same")
+            link(source, target)
+
+        with mock.patch("os.link", link_after_other_writer):
+            name = storage.save("uploads/trains/a.png", ContentFile(b"same"))
+
+        self.assertTrue(is_content_addressed(name))
+        self.assertEqual(
+            os.listdir(os.path.dirname(os.path.join(self.media_root, name))),
+            [os.path.basename(name)],
+        )
+        self.assertEqual(
+            os.listdir(os.path.join(self.media_root, "uploads/trains")),
+            [os.path.basename(os.path.dirname(name))],
+        )
+
+    def test_replaced_image_is_collected(self):
+        train = self.trains[0]
+        self.upload(train)
+        old_names = [train.image.name, train.image_variants["card"]["jpeg"]]
+
+        self.upload(train, color="firebrick")
+
+        for name in old_names:
+            self.assertFalse(self.exists(name))
+        self.assertTrue(self.exists(train.image.name))
+
+    def test_shared_image_kept_until_last_reference_goes(self):
+        first, second = self.trains
+        self.upload(first)
+        self.upload(second)
+        name = first.image.name
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(self.exists(name))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(self.exists(name))
+
+    def test_recent_files_survive_grace_period(self):
+        name = default_storage.save(
+            "uploads/trains/orphan.png", sample_image()
+        )
+
+        with override_settings(MEDIA_GC_GRACE_SECONDS=3600):
+            self.assertEqual(release_media([name]), [])
+        self.assertTrue(self.exists(name))
+
+    def test_collect_media_sweeps_orphans(self):
+        self.upload(self.trains[0])
+        orphan = default_storage.save(
+            "uploads/trains/orphan.png", sample_image(color="gold")
+        )
+        out = StringIO()
+
+        call_command("collect_media", "--dry-run", stdout=out)
+        self.assertIn(orphan, out.getvalue())
+        self.assertTrue(self.exists(orphan))
+
+        call_command("collect_media", stdout=StringIO())
+        self.assertFalse(self.exists(orphan))
+        self.assertTrue(self.exists(self.trains[0].image.name))
+
+    def test_hashed_media_served_immutable(self):
+        self.upload(self.trains[0])
+        request = RequestFactory().get("/media/")
+
+        response = serve_media(
+            request,
+            self.trains[0].image.name,
+            document_root=self.media_root,
+        )
+
+        self.assertEqual(
+            response["Cache-Control"], "public, max-age=31536000, immutable"
+        )
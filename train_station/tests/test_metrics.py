@@ -0,0 +1,195 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from train_station.metrics import (
+    LocalMetricsStore,
+    MetricsRegistry,
+    SQLiteMetricsStore,
+    get_metrics,
+    render_metrics,
+)
+from train_station.tests.test_journey_api import JOURNEY_URL, sample_journey
+
+METRICS_URL = reverse("metrics")
+
+
+def _observe_many(path, count):
+    registry = MetricsRegistry(SQLiteMetricsStore(path), flush_interval=0)
+    for _ in range(count):
+        registry.observe_request(
+            "JourneyViewSet.list", "GET", "200", 0.02, 3, 0.001, 100
+        )
+    registry.flush()
+
+
+class MetricsRenderTests(SimpleTestCase):
+    def setUp(self):
+        self.registry = MetricsRegistry(LocalMetricsStore(), flush_interval=0)
+
+    def render(self):
+        self.registry.flush()
+        return render_metrics(self.registry.store.collect())
+
+    def test_histogram_buckets_are_cumulative(self):
+        for seconds in (0.003, 0.02, 0.02, 30):
+            self.registry.observe_request(
+                "JourneyViewSet.list", "GET", "200", seconds, 2, 0.001, 10
+            )
+
+        text = self.render()
+        labels = 'method="GET",view="JourneyViewSet.list"'
+        self.assertIn("# TYPE http_request_duration_seconds histogram", text)
+        for le, count in (("0.005", 1), ("0.01", 1), ("0.025", 3),
+                          ("10.0", 3), ("+Inf", 4)):
+            self.assertIn(
+                f'http_request_duration_seconds_bucket{{{labels},le="{le}"}} '
+                f"{count}\n",
+                text,
+            )
+        self.assertIn(
+            f"http_request_duration_seconds_count{{{labels}}} 4\n", text
+        )
+        self.assertIn(
+            f"http_request_db_queries_bucket{{{labels},le=\"2\"}} 4\n", text
+        )
+        self.assertIn(f"http_request_db_queries_sum{{{labels}}} 8\n", text)
+        self.assertIn(
+            f"http_response_size_bytes_total{{{labels}}} 40\n", text
+        )
+
+    def test_counts_by_status(self):
+        for code in ("201", "201", "400"):
+            self.registry.observe_request(
+                "OrderViewSet.create", "POST", code, 0.01, 4, 0.002, None
+            )
+
+        text = self.render()
+        self.assertIn(
+            'http_requests_total{method="POST",status="201",'
+            'view="OrderViewSet.create"} 2\n',
+            text,
+        )
+        self.assertIn(
+            'http_requests_total{method="POST",status="400",'
+            'view="OrderViewSet.create"} 1\n',
+            text,
+        )
+        self.assertNotIn("http_response_size_bytes_total", text)
+
+    def test_label_values_escaped(self):
+        self.registry.observe_request(
+            'odd"view\\', "GET", "200", 0.01, 0, 0, 0
+        )
+
+        self.assertIn('view="odd\\"view\\\\"', self.render())
+
+
+class SQLiteMetricsStoreTests(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, "metrics.sqlite3")
+
+    def test_processes_aggregate_in_shared_store(self):
+        context = multiprocessing.get_context("fork")
+        processes = [
+            context.Process(target=_observe_many, args=(self.path, 25))
+            for _ in range(4)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+
+        text = render_metrics(SQLiteMetricsStore(self.path).collect())
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",'
+            'view="JourneyViewSet.list"} 100\n',
+            text,
+        )
+        self.assertIn(
+            'http_request_db_queries_sum{method="GET",'
+            'view="JourneyViewSet.list"} 300\n',
+            text,
+        )
+
+    def test_gauges_replaced_per_process(self):
+        store = SQLiteMetricsStore(self.path)
+        key = ("db_pool_waiting", '{"alias":"default","pid":"1"}')
+        store.set(1, {key: 3}, stale_after=60)
+        store.set(1, {key: 1}, stale_after=60)
+
+        self.assertEqual(store.collect(), {key: 1})
+
+
+class MetricsEndpointTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        get_metrics().clear()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.client.force_authenticate(self.user)
+        sample_journey()
+
+    def test_requests_labelled_by_viewset_action(self):
+        self.client.get(JOURNEY_URL)
+        res = self.client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res["Content-Type"].startswith("text/plain"))
+        text = res.content.decode()
+        self.assertIn(
+            'http_requests_total{method="GET",status="200",'
+            'view="JourneyViewSet.list"} 1\n',
+            text,
+        )
+        self.assertRegex(
+            text,
+            r'http_request_db_queries_sum\{method="GET",'
+            r'view="JourneyViewSet.list"\} [1-9]',
+        )
+
+    async def test_async_requests_measured(self):
+        token = await sync_to_async(AccessToken.for_user)(self.user)
+        res = await self.async_client.get(
+            JOURNEY_URL, headers={"Authorization": f"Bearer {token}"}
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        text = await sync_to_async(
+            lambda: self.client.get(METRICS_URL).content.decode()
+        )()
+        self.assertRegex(
+            text,
+            r'http_request_db_queries_sum\{method="GET",'
+            r'view="JourneyViewSet.list"\} [1-9]',
+        )
+
+    def test_unmatched_paths_share_a_label(self):
+        self.client.get("/no/such/page/")
+
+        self.assertIn(
+            'view="unmatched"', self.client.get(METRICS_URL).content.decode()
+        )
+
+    @override_settings(METRICS_TOKEN="secret")
+    def test_token_required_when_set(self):
+        res = self.client.get(METRICS_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        res = self.client.get(
+            METRICS_URL, HTTP_AUTHORIZATION="Bearer secret"
+        )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
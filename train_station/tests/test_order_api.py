@@ -0,0 +1,296 @@
+import csv
+import json
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from train_station.booking import book_tickets
+from train_station.models import (
+    Journey, Route, Train, Station, TrainType, Order, Ticket,
+)
+from train_station.serializers import OrderSerializer
+
+ORDER_URL = reverse("train-station:order-list")
+ORDER_EXPORT_URL = reverse("train-station:order-export")
+
+
+def sample_journey(**params):
+    route = Route.objects.create(
+        source=Station.objects.create(
+            name="test_station1", latitude=50.45, longitude=30.52
+        ),
+        destination=Station.objects.create(
+            name="test_station2", latitude=49.84, longitude=24.03
+        ),
+        distance=540,
+    )
+    train = Train.objects.create(
+        name="Test Train",
+        cargo_num=5,
+        places_in_cargo=20,
+        train_type=TrainType.objects.create(name="test-train-type"),
+    )
+    defaults = {
+        "route": route,
+        "train": train,
+        "departure_time": "2023-09-05T18:00:00",
+        "arrival_time": "2023-09-05T19:00:00",
+    }
+    defaults.update(params)
+
+    return Journey.objects.create(**defaults)
+
+
+class UnauthenticatedOrderApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.get(ORDER_URL)
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AdminOrderTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def test_create_order(self):
+        payload = {
+            "tickets": [
+                {"cargo": 1, "seat": seat, "journey": self.journey.id}
+                for seat in range(1, 11)
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=res.data["id"])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.tickets.count(), 10)
+        self.assertEqual(len(res.data["tickets"]), 10)
+
+        self.journey.refresh_from_db()
+        self.assertEqual(self.journey.tickets_available, 100 - 10)
+
+    def test_create_order_seat_out_of_range(self):
+        payload = {
+            "tickets": [
+                {"cargo": 1, "seat": 1, "journey": self.journey.id},
+                {"cargo": 6, "seat": 1, "journey": self.journey.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("cargo", res.data["tickets"][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_create_order_taken_seat(self):
+        order = Order.objects.create(user=self.user)
+        Ticket.objects.create(
+            cargo=2, seat=3, journey=self.journey, order=order
+        )
+        payload = {
+            "tickets": [
+                {"cargo": 2, "seat": 4, "journey": self.journey.id},
+                {"cargo": 2, "seat": 3, "journey": self.journey.id},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["seats"],
+            [{"journey": self.journey.id, "cargo": 2, "seat": 3}],
+        )
+        self.assertEqual(
+            res.data["alternatives"],
+            [
+                {"journey": self.journey.id, "cargo": 2, "seat": 2},
+                {"journey": self.journey.id, "cargo": 2, "seat": 1},
+                {"journey": self.journey.id, "cargo": 2, "seat": 5},
+            ],
+        )
+        self.assertEqual(Ticket.objects.count(), 1)
+
+    def test_create_order_duplicate_seats(self):
+        ticket = {"cargo": 1, "seat": 1, "journey": self.journey.id}
+
+        res = self.client.post(
+            ORDER_URL, {"tickets": [ticket, ticket]}, format="json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("seat", res.data["tickets"][1])
+        self.assertFalse(Ticket.objects.exists())
+
+    def test_create_order_unknown_journey(self):
+        payload = {
+            "tickets": [
+                {"cargo": 1, "seat": 1, "journey": self.journey.id},
+                {"cargo": 1, "seat": 2, "journey": self.journey.id + 100},
+            ]
+        }
+
+        res = self.client.post(ORDER_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["tickets"][0], {})
+        self.assertIn("journey", res.data["tickets"][1])
+        self.assertFalse(Order.objects.exists())
+
+    def test_book_tickets_for_deleted_journey(self):
+        journey_id = self.journey.id
+        self.journey.delete()
+
+        with self.assertRaises(ValidationError) as raised:
+            book_tickets([(journey_id, 1, 1)], user=self.user)
+
+        self.assertIn("journey", raised.exception.detail["tickets"][0])
+        self.assertFalse(Order.objects.exists())
+
+    def test_order_validation_loads_journeys_at_once(self):
+        journeys = [self.journey] + [
+            Journey.objects.create(
+                route=self.journey.route,
+                train=self.journey.train,
+                departure_time=f"2023-09-0{day}T18:00:00",
+                arrival_time=f"2023-09-0{day}T19:00:00",
+            )
+            for day in (6, 7, 8)
+        ]
+        serializer = OrderSerializer(
+            data={
+                "tickets": [
+                    {"cargo": 1, "seat": seat, "journey": journey.id}
+                    for journey in journeys
+                    for seat in (1, 2)
+                ]
+            }
+        )
+
+        with self.assertNumQueries(1):
+            self.assertTrue(serializer.is_valid(), serializer.errors)
+
+    def journey_updates(self, queries):
+        return [
+            query["sql"]
+            for query in queries
+            if query["sql"].startswith('UPDATE "train_station_journey"')
+        ]
+
+    def test_delete_releases_seats_per_journey(self):
+        other = Journey.objects.create(
+            route=self.journey.route,
+            train=self.journey.train,
+            departure_time="2023-09-06T18:00:00",
+            arrival_time="2023-09-06T19:00:00",
+        )
+        order = book_tickets(
+            [(self.journey.id, 1, seat) for seat in (1, 2, 3)]
+            + [(other.id, 2, 1), (other.id, 2, 2)],
+            user=self.user,
+        )
+        Ticket.objects.filter(journey=other, seat=1).delete()
+        other.refresh_from_db()
+        self.assertEqual(other.taken_seats, [{"cargo": 2, "seat": 2}])
+
+        with CaptureQueriesContext(connection) as queries:
+            order.delete()
+
+        self.assertEqual(len(self.journey_updates(queries)), 1)
+        for journey in (self.journey, other):
+            journey.refresh_from_db()
+            self.assertEqual(journey.seats_sold, 0)
+            self.assertEqual(journey.taken_seats, [])
+
+    def test_journey_delete_skips_seat_updates(self):
+        book_tickets(
+            [(self.journey.id, 1, seat) for seat in (1, 2, 3)], user=self.user
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            self.journey.delete()
+
+        self.assertEqual(self.journey_updates(queries), [])
+        self.assertFalse(Ticket.objects.exists())
+
+
+class OrderExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.other = get_user_model().objects.create_user(
+            "other@test.com", "test12345"
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+        order = Order.objects.create(user=self.user)
+        for seat in (1, 2):
+            Ticket.objects.create(
+                cargo=1, seat=seat, journey=self.journey, order=order
+            )
+        Ticket.objects.create(
+            cargo=2,
+            seat=1,
+            journey=self.journey,
+            order=Order.objects.create(user=self.other),
+        )
+
+    def test_export_csv(self):
+        res = self.client.get(ORDER_EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv")
+        self.assertIn("tickets.csv", res["Content-Disposition"])
+        rows = list(
+            csv.DictReader(
+                b"".join(res.streaming_content).decode().splitlines()
+            )
+        )
+        self.assertEqual([row["seat"] for row in rows], ["1", "2"])
+        self.assertEqual(rows[0]["email"], "test@test.com")
+        self.assertEqual(rows[0]["source"], "test_station1")
+
+    def test_export_ndjson_for_staff(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(ORDER_EXPORT_URL, {"export_format": "ndjson"})
+
+        rows = [
+            json.loads(line)
+            for line in b"".join(res.streaming_content).splitlines()
+        ]
+        self.assertEqual(
+            [(row["cargo"], row["seat"]) for row in rows],
+            [(1, 1), (1, 2), (2, 1)],
+        )
+        self.assertEqual(rows[0]["departure_time"], "2023-09-05T18:00:00")
+
+    def test_export_filters_by_date(self):
+        res = self.client.get(
+            ORDER_EXPORT_URL, {"departure_after": "2023-09-06T00:00:00"}
+        )
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+
+    def test_export_rejects_unknown_format(self):
+        res = self.client.get(ORDER_EXPORT_URL, {"export_format": "xml"})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
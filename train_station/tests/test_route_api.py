@@ -1,15 +1,21 @@
+from datetime import timedelta, timezone as dt_timezone
+from unittest import mock
+
 from django.contrib.auth import get_user_model
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from train_station.models import Station, Route
+from train_station.models import Station, Route, Train, TrainType, Journey
+from train_station.route_planner import RouteGraph, get_route_graph
 from train_station.serializers import (
     RouteListSerializer, RouteDetailSerializer,
 )
 
 ROUTE_URL = reverse("train-station:route-list")
+ROUTE_PLAN_URL = reverse("train-station:route-plan")
 
 
 def detail_url(route_id: int):
@@ -146,3 +152,178 @@ class AdminRouteTests(TestCase):
         url = detail_url(route.id)
         res = self.client.patch(url, payload)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+class RoutePlanApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+        )
+        self.client.force_authenticate(self.user)
+
+        self.kyiv, self.lviv, self.odesa, self.dnipro = (
+            Station.objects.create(name=name, latitude=0, longitude=0)
+            for name in ("Kyiv", "Lviv", "Odesa", "Dnipro")
+        )
+        self.kyiv_lviv = Route.objects.create(
+            source=self.kyiv, destination=self.lviv, distance=540
+        )
+        self.kyiv_odesa = Route.objects.create(
+            source=self.kyiv, destination=self.odesa, distance=475
+        )
+        self.odesa_lviv = Route.objects.create(
+            source=self.odesa, destination=self.lviv, distance=790
+        )
+        self.lviv_dnipro = Route.objects.create(
+            source=self.lviv, destination=self.dnipro, distance=1000
+        )
+        self.train = Train.objects.create(
+            name="Intercity",
+            cargo_num=5,
+            places_in_cargo=20,
+            train_type=TrainType.objects.create(name="intercity"),
+        )
+        # Drop graphs of rolled back tests, whose ids SQLite reuses.
+        get_route_graph(rebuild=True)
+
+    def sample_journey(self, route, departure, hours):
+        return Journey.objects.create(
+            route=route,
+            train=self.train,
+            departure_time=departure,
+            arrival_time=departure + timedelta(hours=hours),
+        )
+
+    def test_plan_shortest_distance(self):
+        res = self.client.get(
+            ROUTE_PLAN_URL,
+            {"source": self.kyiv.id, "destination": self.dnipro.id},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["distance"], 1540)
+        self.assertEqual(
+            [route["id"] for route in res.data["routes"]],
+            [self.kyiv_lviv.id, self.lviv_dnipro.id],
+        )
+
+    def test_plan_earliest_arrival_respects_transfer_time(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        self.sample_journey(self.kyiv_lviv, start, hours=7)
+        to_odesa = self.sample_journey(self.kyiv_odesa, start, hours=6)
+        self.sample_journey(
+            self.odesa_lviv, start + timedelta(hours=6, minutes=5), hours=1
+        )
+        odesa_lviv = self.sample_journey(
+            self.odesa_lviv, start + timedelta(hours=6, minutes=10), hours=0.5
+        )
+
+        res = self.client.get(
+            ROUTE_PLAN_URL,
+            {
+                "source": self.kyiv.id,
+                "destination": self.lviv.id,
+                "mode": "time",
+                "departure_after": start.isoformat(),
+                "min_transfer": 10,
+            },
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [journey["id"] for journey in res.data["journeys"]],
+            [to_odesa.id, odesa_lviv.id],
+        )
+        self.assertEqual(
+            res.data["arrival_time"],
+            start + timedelta(hours=6, minutes=40),
+        )
+
+    def test_plan_graph_follows_route_changes(self):
+        params = {"source": self.dnipro.id, "destination": self.kyiv.id}
+        res = self.client.get(ROUTE_PLAN_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+        Route.objects.create(
+            source=self.dnipro, destination=self.kyiv, distance=480
+        )
+
+        res = self.client.get(ROUTE_PLAN_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["distance"], 480)
+
+    def time_plan(self, source, destination, departure_after):
+        return self.client.get(
+            ROUTE_PLAN_URL,
+            {
+                "source": source.id,
+                "destination": destination.id,
+                "mode": "time",
+                "departure_after": departure_after.isoformat(),
+            },
+        )
+
+    def test_plan_from_the_past_starts_at_the_graph_horizon(self):
+        now = timezone.now().replace(microsecond=0)
+        self.sample_journey(self.kyiv_lviv, now - timedelta(days=2), hours=7)
+        upcoming = self.sample_journey(
+            self.kyiv_lviv, now + timedelta(days=1), hours=7
+        )
+
+        with mock.patch.object(
+            RouteGraph, "from_db", side_effect=AssertionError("loaded")
+        ):
+            res = self.time_plan(
+                self.kyiv, self.lviv, now - timedelta(days=3)
+            )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [journey["id"] for journey in res.data["journeys"]],
+            [upcoming.id],
+        )
+
+    def test_plan_accepts_departure_with_utc_offset(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+        journey = self.sample_journey(self.kyiv_lviv, start, hours=7)
+
+        res = self.time_plan(
+            self.kyiv,
+            self.lviv,
+            timezone.make_aware(start).astimezone(dt_timezone.utc),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["journeys"][0]["id"], journey.id)
+
+    def test_journey_saves_update_graph_in_place(self):
+        start = timezone.now().replace(microsecond=0) + timedelta(days=1)
+
+        with mock.patch.object(
+            RouteGraph, "from_db", side_effect=AssertionError("rebuilt")
+        ):
+            journey = self.sample_journey(self.kyiv_lviv, start, hours=7)
+            res = self.time_plan(self.kyiv, self.lviv, start)
+            self.assertEqual(res.data["journeys"][0]["id"], journey.id)
+
+            self.kyiv_lviv.source = self.odesa
+            self.kyiv_lviv.save()
+            res = self.time_plan(self.kyiv, self.lviv, start)
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+            res = self.time_plan(self.odesa, self.lviv, start)
+            self.assertEqual(res.data["journeys"][0]["id"], journey.id)
+
+    def test_plan_rebuilds_graph_with_deleted_route(self):
+        # As if deleted by a worker whose bump this one has not seen.
+        with mock.patch("train_station.signals.invalidate_route_graph"):
+            self.kyiv_lviv.delete()
+
+        res = self.client.get(
+            ROUTE_PLAN_URL,
+            {"source": self.kyiv.id, "destination": self.lviv.id},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["distance"], 1265)
@@ -0,0 +1,299 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from train_station.models import (
+    Journey, Route, Train, Station, TrainType, Order,
+)
+from train_station.seat_holds import (
+    LocalSeatHoldStore,
+    SQLiteSeatHoldStore,
+    SeatsUnavailable,
+    get_seat_hold_store,
+)
+
+SEAT_HOLD_URL = reverse("train-station:seat-hold-list")
+ORDER_URL = reverse("train-station:order-list")
+
+
+def detail_url(token: str):
+    return reverse("train-station:seat-hold-detail", args=[token])
+
+
+def confirm_url(token: str):
+    return reverse("train-station:seat-hold-confirm", args=[token])
+
+
+def _try_hold(path, results):
+    try:
+        SQLiteSeatHoldStore(path).hold(1, [(1, 1)], user_id=1, ttl=60)
+    except SeatsUnavailable:
+        results.put(False)
+    else:
+        results.put(True)
+
+
+def sample_journey(**params):
+    route = Route.objects.create(
+        source=Station.objects.create(
+            name="test_station1", latitude=50.45, longitude=30.52
+        ),
+        destination=Station.objects.create(
+            name="test_station2", latitude=49.84, longitude=24.03
+        ),
+        distance=540,
+    )
+    train = Train.objects.create(
+        name="Test Train",
+        cargo_num=5,
+        places_in_cargo=20,
+        train_type=TrainType.objects.create(name="test-train-type"),
+    )
+    defaults = {
+        "route": route,
+        "train": train,
+        "departure_time": "2023-09-05T18:00:00",
+        "arrival_time": "2023-09-05T19:00:00",
+    }
+    defaults.update(params)
+
+    return Journey.objects.create(**defaults)
+
+
+class UnauthenticatedSeatHoldApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_auth_required(self):
+        res = self.client.post(SEAT_HOLD_URL, {})
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class AuthenticatedSeatHoldApiTest(TestCase):
+    def setUp(self):
+        get_seat_hold_store().clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+        )
+        self.client.force_authenticate(self.user)
+        self.journey = sample_journey()
+
+    def hold(self, *seats, client=None):
+        return (client or self.client).post(
+            SEAT_HOLD_URL,
+            {
+                "journey": self.journey.id,
+                "seats": [
+                    {"cargo": cargo, "seat": seat} for cargo, seat in seats
+                ],
+            },
+            format="json",
+        )
+
+    def test_hold_seats(self):
+        res = self.hold((1, 1), (1, 2))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["journey"], self.journey.id)
+        self.assertEqual(len(res.data["token"]), 32)
+
+        res = self.client.get(detail_url(res.data["token"]))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            res.data["seats"],
+            [{"cargo": 1, "seat": 1}, {"cargo": 1, "seat": 2}],
+        )
+
+    def test_held_seats_conflict(self):
+        self.hold((1, 1), (1, 2))
+
+        res = self.hold((1, 2), (1, 3))
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["seats"],
+            [{"journey": self.journey.id, "cargo": 1, "seat": 2}],
+        )
+        self.assertNotIn(
+            {"journey": self.journey.id, "cargo": 1, "seat": 1},
+            res.data["alternatives"],
+        )
+
+    def test_hold_seat_out_of_range(self):
+        res = self.hold((6, 1))
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_confirm_hold_requires_order_permission(self):
+        token = self.hold((2, 1)).data["token"]
+
+        res = self.client.post(confirm_url(token))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertFalse(Order.objects.exists())
+        self.assertIsNotNone(get_seat_hold_store().get(token))
+
+    def test_confirm_hold_creates_order(self):
+        token = self.hold((2, 1), (2, 2)).data["token"]
+        admin = get_user_model().objects.create_user(
+            "admin@test.com", "test12345", is_staff=True
+        )
+        self.client.force_authenticate(admin)
+
+        res = self.client.post(confirm_url(token))
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(id=res.data["id"])
+        self.assertEqual(order.user, self.user)
+        self.assertEqual(order.tickets.count(), 2)
+        self.assertIsNone(get_seat_hold_store().get(token))
+
+        res = self.hold((2, 1))
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["seats"],
+            [{"journey": self.journey.id, "cargo": 2, "seat": 1}],
+        )
+        self.assertTrue(res.data["alternatives"])
+        self.assertNotIn(
+            {"journey": self.journey.id, "cargo": 2, "seat": 2},
+            res.data["alternatives"],
+        )
+
+    def test_order_cannot_take_held_seat(self):
+        self.hold((3, 3))
+        admin = get_user_model().objects.create_user(
+            "admin@test.com", "test12345", is_staff=True
+        )
+        self.client.force_authenticate(admin)
+
+        res = self.client.post(
+            ORDER_URL,
+            {
+                "tickets": [
+                    {"cargo": 3, "seat": 3, "journey": self.journey.id}
+                ]
+            },
+            format="json",
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(
+            res.data["seats"],
+            [{"journey": self.journey.id, "cargo": 3, "seat": 3}],
+        )
+
+    def test_release_hold(self):
+        token = self.hold((4, 4)).data["token"]
+
+        res = self.client.delete(detail_url(token))
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.hold((4, 4)).status_code, 201)
+
+    def test_hold_of_other_user_not_visible(self):
+        token = self.hold((1, 1)).data["token"]
+        other = get_user_model().objects.create_user(
+            "other@test.com", "test12345"
+        )
+        self.client.force_authenticate(other)
+
+        res = self.client.get(detail_url(token))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.delete(detail_url(token))
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class SQLiteSeatHoldApiTest(AuthenticatedSeatHoldApiTest):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.enterContext(
+            override_settings(
+                SEAT_HOLDS={
+                    "BACKEND": "train_station.seat_holds.SQLiteSeatHoldStore",
+                    "OPTIONS": {
+                        "path": os.path.join(directory, "holds.sqlite3")
+                    },
+                }
+            )
+        )
+        super().setUp()
+
+
+class SeatHoldStoreTestMixin:
+    def make_store(self, clock):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.now = 1000.0
+        self.store = self.make_store(lambda: self.now)
+
+    def test_expired_hold_is_reclaimed(self):
+        hold = self.store.hold(1, [(1, 1)], user_id=1, ttl=60)
+
+        with self.assertRaises(SeatsUnavailable):
+            self.store.hold(1, [(1, 1)], user_id=2, ttl=60)
+
+        self.now += 61
+        self.assertIsNone(self.store.get(hold["token"]))
+        self.assertEqual(self.store.held_seats(1, [(1, 1)]), [])
+        self.store.hold(1, [(1, 1)], user_id=2, ttl=60)
+
+    def test_held_seats_ignores_own_token(self):
+        hold = self.store.hold(1, [(1, 1), (1, 2)], user_id=1, ttl=60)
+
+        self.assertEqual(
+            self.store.held_seats(1, [(1, 2), (1, 3)]), [(1, 2)]
+        )
+        self.assertEqual(
+            self.store.held_seats(1, [(1, 2)], exclude_token=hold["token"]),
+            [],
+        )
+
+    def test_release_frees_seats(self):
+        hold = self.store.hold(1, [(1, 1)], user_id=1, ttl=60)
+        self.assertEqual(self.store.get(hold["token"]), hold)
+
+        self.store.release(hold["token"])
+
+        self.assertIsNone(self.store.get(hold["token"]))
+        self.store.hold(1, [(1, 1)], user_id=2, ttl=60)
+
+
+class LocalSeatHoldStoreTests(SeatHoldStoreTestMixin, SimpleTestCase):
+    def make_store(self, clock):
+        return LocalSeatHoldStore(reap_interval=0, clock=clock)
+
+
+class SQLiteSeatHoldStoreTests(SeatHoldStoreTestMixin, SimpleTestCase):
+    def make_store(self, clock):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, "holds.sqlite3")
+        return SQLiteSeatHoldStore(self.path, clock=clock)
+
+    def test_processes_never_hold_the_same_seat(self):
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        processes = [
+            context.Process(target=_try_hold, args=(self.path, results))
+            for _ in range(6)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join(30)
+            self.assertEqual(process.exitcode, 0)
+
+        self.assertEqual(
+            sorted(results.get() for _ in processes), [False] * 5 + [True]
+        )
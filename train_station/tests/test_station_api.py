@@ -1,13 +1,20 @@
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from unittest import mock
+
+from django.db import transaction
 from django.test import TestCase
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
+from train_station.geo import StationGrid, invalidate_station_index
 from train_station.models import Station
 from train_station.serializers import StationSerializer
 
 STATION_URL = reverse("train-station:station-list")
+STATION_NEARBY_URL = reverse("train-station:station-nearby")
+ASYNC_STATION_URL = reverse("train-station:async-station-list")
 
 
 def detail_url(station_id: int):
@@ -36,6 +43,8 @@ class UnauthenticatedStationApiTest(TestCase):
 
 class AuthenticatedStationApiTest(TestCase):
     def setUp(self):
+        # Drop grids of rolled back tests, whose ids SQLite reuses.
+        invalidate_station_index()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             "test@test.com",
@@ -53,6 +62,159 @@ class AuthenticatedStationApiTest(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_stations_cursor_pagination(self):
+        for name in ("Kyiv", "Lviv", "Odesa"):
+            sample_station(name=name)
+
+        res = self.client.get(STATION_URL, {"page_size": 2})
+        self.assertEqual(
+            [station["name"] for station in res.data["results"]],
+            ["Kyiv", "Lviv"],
+        )
+
+        res = self.client.get(res.data["next"])
+        self.assertEqual(
+            [station["name"] for station in res.data["results"]], ["Odesa"]
+        )
+
+    def test_nearby_stations(self):
+        kyiv = sample_station(name="Kyiv", latitude=50.4401, longitude=30.4888)
+        darnytsia = sample_station(
+            name="Darnytsia", latitude=50.4555, longitude=30.6170
+        )
+        sample_station(name="Lviv", latitude=49.8397, longitude=24.0297)
+
+        res = self.client.get(
+            STATION_NEARBY_URL, {"lat": 50.45, "lon": 30.52, "radius": 50}
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [station["id"] for station in res.data], [kyiv.id, darnytsia.id]
+        )
+        self.assertLess(res.data[0]["distance"], res.data[1]["distance"])
+
+        res = self.client.get(
+            STATION_NEARBY_URL,
+            {"lat": 50.45, "lon": 30.52, "radius": 50, "limit": 1},
+        )
+        self.assertEqual([station["id"] for station in res.data], [kyiv.id])
+
+    def test_nearby_follows_station_changes(self):
+        station = sample_station(name="Kyiv", latitude=50.44, longitude=30.49)
+        params = {"lat": 49.84, "lon": 24.03, "radius": 10}
+
+        res = self.client.get(STATION_NEARBY_URL, params)
+        self.assertEqual(res.data, [])
+
+        station.latitude, station.longitude = 49.8397, 24.0297
+        with self.captureOnCommitCallbacks(execute=True):
+            station.save()
+        res = self.client.get(STATION_NEARBY_URL, params)
+        self.assertEqual([item["id"] for item in res.data], [station.id])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            station.delete()
+        res = self.client.get(STATION_NEARBY_URL, params)
+        self.assertEqual(res.data, [])
+
+    def test_nearby_syncs_station_saves_without_rebuild(self):
+        params = {"lat": 49.84, "lon": 24.03, "radius": 10}
+        self.client.get(STATION_NEARBY_URL, params)
+
+        with mock.patch.object(
+            StationGrid, "from_db", side_effect=AssertionError("rebuilt")
+        ):
+            with self.captureOnCommitCallbacks(execute=True):
+                station = sample_station(
+                    name="Lviv", latitude=49.8397, longitude=24.0297
+                )
+            res = self.client.get(STATION_NEARBY_URL, params)
+            self.assertEqual([item["id"] for item in res.data], [station.id])
+
+            station.latitude, station.longitude = 50.44, 30.49
+            with self.captureOnCommitCallbacks(execute=True):
+                station.save()
+            res = self.client.get(STATION_NEARBY_URL, params)
+            self.assertEqual(res.data, [])
+
+    def test_nearby_ignores_rolled_back_changes(self):
+        params = {"lat": 49.84, "lon": 24.03, "radius": 10}
+        self.client.get(STATION_NEARBY_URL, params)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    sample_station(
+                        name="Lviv", latitude=49.8397, longitude=24.0297
+                    )
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+
+        res = self.client.get(STATION_NEARBY_URL, params)
+        self.assertEqual(res.data, [])
+
+    def test_filter_stations_by_bbox(self):
+        kyiv = sample_station(name="Kyiv", latitude=50.4401, longitude=30.4888)
+        lviv = sample_station(name="Lviv", latitude=49.8397, longitude=24.0297)
+
+        res = self.client.get(STATION_URL, {"bbox": "29,49,32,51"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn(StationSerializer(kyiv).data, res.data)
+        self.assertNotIn(StationSerializer(lviv).data, res.data)
+
+    def test_async_list_filters_by_bbox(self):
+        kyiv = sample_station(name="Kyiv", latitude=50.4401, longitude=30.4888)
+        sample_station(name="Lviv", latitude=49.8397, longitude=24.0297)
+
+        res = self.client.get(ASYNC_STATION_URL, {"bbox": "29,49,32,51"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), [StationSerializer(kyiv).data])
+
+    def test_async_list_served_from_cache(self):
+        cache.clear()
+        sample_station(name="Kyiv", latitude=50.4401, longitude=30.4888)
+
+        res = self.client.get(ASYNC_STATION_URL)
+        self.assertEqual(res["X-Cache"], "MISS")
+        etag = res["ETag"]
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ASYNC_STATION_URL)
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertEqual(res.json()[0]["name"], "Kyiv")
+
+        res = self.client.get(ASYNC_STATION_URL, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_nearby_requires_coordinates(self):
+        res = self.client.get(STATION_NEARBY_URL, {"lat": 50.45})
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nearby_rejects_invalid_coordinates(self):
+        for params in (
+            {"lat": "nan", "lon": 30.52},
+            {"lat": 50.45, "lon": "inf"},
+            {"lat": 91, "lon": 30.52},
+            {"lat": 50.45, "lon": -181},
+            {"lat": 50.45, "lon": 30.52, "radius": 0},
+            {"lat": 50.45, "lon": 30.52, "radius": "-inf"},
+        ):
+            res = self.client.get(STATION_NEARBY_URL, params)
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, params
+            )
+
+    def test_bbox_rejects_invalid_coordinates(self):
+        for bbox in ("29,49,32", "29,nan,32,51", "29,-91,32,51", "inf"):
+            res = self.client.get(STATION_URL, {"bbox": bbox})
+            self.assertEqual(
+                res.status_code, status.HTTP_400_BAD_REQUEST, bbox
+            )
+
     def test_create_station_forbidden(self):
         defaults = {
             "name": "test_station",
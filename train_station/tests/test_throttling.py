@@ -0,0 +1,257 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from train_station.models import Facility
+from train_station.tests.test_journey_api import sample_journey
+from train_station.throttling import (
+    ActionCostMeter,
+    CostWeightedThrottle,
+    LocalThrottleStore,
+    SQLiteThrottleStore,
+    UserTokenBucketThrottle,
+    action_cost_meter,
+    action_key,
+    get_throttle_store,
+)
+from train_station.views import FacilityViewSet, JourneyViewSet
+
+STATION_URL = reverse("train-station:station-list")
+FACILITY_URL = reverse("train-station:facility-list")
+
+
+def _consume_many(path, attempts, results):
+    store = SQLiteThrottleStore(path)
+    results.put(
+        sum(store.consume("shared", 60, 0)[0] for _ in range(attempts))
+    )
+
+
+class ThrottleStoreTestMixin:
+    def make_store(self, clock):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.now = 1000.0
+        self.store = self.make_store(lambda: self.now)
+
+    def test_bucket_allows_burst_then_refills(self):
+        for _ in range(3):
+            self.assertEqual(self.store.consume("key", 3, 1 / 10), (True, 0))
+
+        allowed, wait = self.store.consume("key", 3, 1 / 10)
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 10)
+
+        self.now += 10
+        self.assertTrue(self.store.consume("key", 3, 1 / 10)[0])
+        self.assertFalse(self.store.consume("key", 3, 1 / 10)[0])
+
+    def test_refill_capped_at_capacity(self):
+        self.store.consume("key", 2, 1)
+        self.now += 3600
+
+        results = [self.store.consume("key", 2, 1)[0] for _ in range(3)]
+
+        self.assertEqual(results, [True, True, False])
+
+    def test_cost_takes_several_tokens(self):
+        self.assertTrue(self.store.consume("key", 5, 1, cost=4)[0])
+        allowed, wait = self.store.consume("key", 5, 1, cost=4)
+
+        self.assertFalse(allowed)
+        self.assertAlmostEqual(wait, 3)
+        self.assertEqual(self.store.consume("key", 5, 1, cost=6), (
+            False, None
+        ))
+
+    def test_keys_are_independent(self):
+        self.store.consume("a", 1, 0)
+
+        self.assertFalse(self.store.consume("a", 1, 0)[0])
+        self.assertTrue(self.store.consume("b", 1, 0)[0])
+
+
+class LocalThrottleStoreTests(ThrottleStoreTestMixin, SimpleTestCase):
+    def make_store(self, clock):
+        return LocalThrottleStore(clock=clock)
+
+
+class SQLiteThrottleStoreTests(ThrottleStoreTestMixin, SimpleTestCase):
+    def make_store(self, clock):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory, ignore_errors=True)
+        self.path = os.path.join(self.directory, "throttle.sqlite3")
+        return SQLiteThrottleStore(self.path, clock=clock)
+
+    def test_limit_exact_across_processes(self):
+        context = multiprocessing.get_context("fork")
+        results = context.Queue()
+        workers = [
+            context.Process(
+                target=_consume_many, args=(self.path, 40, results)
+            )
+            for _ in range(4)
+        ]
+        for worker in workers:
+            worker.start()
+        allowed = sum(results.get(timeout=30) for _ in workers)
+        for worker in workers:
+            worker.join()
+
+        self.assertEqual(allowed, 60)
+
+
+@override_settings(
+    THROTTLE_STORE={"BACKEND": "train_station.throttling.LocalThrottleStore"}
+)
+class TokenBucketThrottleApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.client.force_authenticate(self.user)
+        get_throttle_store().clear()
+
+    def test_user_requests_throttled(self):
+        rates = {**UserTokenBucketThrottle.THROTTLE_RATES, "user": "2/min"}
+        with mock.patch.object(
+            UserTokenBucketThrottle, "THROTTLE_RATES", rates
+        ):
+            statuses = [
+                self.client.get(STATION_URL).status_code for _ in range(3)
+            ]
+            res = self.client.get(STATION_URL)
+
+        self.assertEqual(statuses[2], status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(res["Retry-After"], "30")
+
+
+class ActionCostMeterTests(SimpleTestCase):
+    def test_averages_smoothed(self):
+        meter = ActionCostMeter(smoothing=0.5)
+        meter.record("key", 10, 0.1)
+        meter.record("key", 20, 0.3)
+
+        queries, seconds = meter.get("key")
+        self.assertEqual(queries, 15)
+        self.assertAlmostEqual(seconds, 0.2)
+
+    @override_settings(THROTTLE_COST_PER_QUERY=1, THROTTLE_COST_PER_SECOND=100)
+    def test_cost_from_queries_and_time(self):
+        meter = ActionCostMeter()
+        meter.record("key", 4, 0.055)
+
+        self.assertEqual(meter.cost("key"), 10)
+        self.assertIsNone(meter.cost("other"))
+
+
+@override_settings(
+    THROTTLE_STORE={"BACKEND": "train_station.throttling.LocalThrottleStore"},
+    THROTTLE_COST_PER_QUERY=1,
+    THROTTLE_COST_PER_SECOND=0,
+    THROTTLE_FREE_COST=3,
+)
+class CostWeightedThrottleApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345"
+        )
+        self.client.force_authenticate(self.user)
+        get_throttle_store().clear()
+        action_cost_meter.clear()
+        self.addCleanup(action_cost_meter.clear)
+        self.journey = sample_journey()
+        self.rates = mock.patch.object(
+            CostWeightedThrottle,
+            "THROTTLE_RATES",
+            {**CostWeightedThrottle.THROTTLE_RATES, "cost": "20/hour"},
+        )
+        self.rates.start()
+        self.addCleanup(self.rates.stop)
+
+    def journey_url(self):
+        return reverse("train-station:journey-detail", args=[self.journey.id])
+
+    def test_middleware_measures_actions(self):
+        self.client.get(self.journey_url())
+
+        queries, seconds = action_cost_meter.get(
+            action_key(JourneyViewSet, "retrieve")
+        )
+        self.assertGreater(queries, 0)
+        self.assertGreater(seconds, 0)
+
+    async def test_middleware_measures_asgi_requests(self):
+        token = await sync_to_async(AccessToken.for_user)(self.user)
+        await self.async_client.get(
+            self.journey_url(), headers={"Authorization": f"Bearer {token}"}
+        )
+
+        queries, seconds = action_cost_meter.get(
+            action_key(JourneyViewSet, "retrieve")
+        )
+        self.assertGreater(queries, 0)
+        self.assertGreater(seconds, 0)
+
+    def test_expensive_action_charged_by_cost(self):
+        action_cost_meter.record(
+            action_key(JourneyViewSet, "retrieve"), 10, 0
+        )
+
+        statuses = [
+            self.client.get(self.journey_url()).status_code
+            for _ in range(3)
+        ]
+
+        self.assertEqual(
+            statuses,
+            [
+                status.HTTP_200_OK,
+                status.HTTP_200_OK,
+                status.HTTP_429_TOO_MANY_REQUESTS,
+            ],
+        )
+
+    def test_cost_above_budget_charges_whole_budget(self):
+        action_cost_meter.record(
+            action_key(JourneyViewSet, "retrieve"), 50, 0
+        )
+
+        res = self.client.get(self.journey_url())
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+        res = self.client.get(self.journey_url())
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertLessEqual(int(res["Retry-After"]), 60 * 60)
+
+    @override_settings(THROTTLE_FREE_COST=1000)
+    def test_cheap_actions_not_charged(self):
+        action_cost_meter.record(
+            action_key(JourneyViewSet, "retrieve"), 10, 0
+        )
+
+        for _ in range(25):
+            res = self.client.get(self.journey_url())
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_static_costs(self):
+        Facility.objects.create(name="wifi")
+        action_cost_meter.record(action_key(FacilityViewSet, "list"), 50, 0)
+
+        for _ in range(25):
+            res = self.client.get(FACILITY_URL)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
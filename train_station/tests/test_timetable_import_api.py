@@ -0,0 +1,212 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from train_station.counters import get_counter_store
+from train_station.geo import INDEX_VERSION_KEY
+from train_station.models import Journey, Route, Station, Train, TrainType
+from train_station.response_cache import _version_key
+from train_station.route_planner import GRAPH_VERSION_KEY
+from train_station.timetable_import import TimetableImport
+
+TIMETABLE_IMPORT_URL = reverse("train-station:timetable-import")
+
+STOPS = (
+    "stop_id,stop_name,stop_lat,stop_lon\n"
+    "KYIV,Kyiv,50.4401,30.4888\n"
+    "LVIV,Lviv,49.8397,24.0297\n"
+)
+ROUTES = (
+    "route_id,origin_stop_id,destination_stop_id,distance\n"
+    "KL,KYIV,LVIV,540\n"
+    "LK,LVIV,KYIV,540\n"
+)
+TRIPS = (
+    "trip_id,route_id,train,departure_time,arrival_time\n"
+    "T1,KL,Intercity,2023-09-05T08:00:00,2023-09-05T13:00:00\n"
+    "T2,LK,Intercity,2023-09-05T15:00:00,2023-09-05T20:00:00\n"
+)
+
+
+def feed(**files):
+    return {
+        name: SimpleUploadedFile(f"{name}.txt", content.encode())
+        for name, content in files.items()
+    }
+
+
+class TimetableImportApiTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.admin = get_user_model().objects.create_superuser(
+            "admin@test.com",
+            "test12345",
+        )
+        self.client.force_authenticate(self.admin)
+        Train.objects.create(
+            name="Intercity",
+            cargo_num=2,
+            places_in_cargo=10,
+            train_type=TrainType.objects.create(name="express"),
+        )
+
+    def test_import_requires_admin(self):
+        user = get_user_model().objects.create_user(
+            "test@test.com",
+            "test12345",
+        )
+        self.client.force_authenticate(user)
+
+        res = self.client.post(TIMETABLE_IMPORT_URL, feed(stops=STOPS))
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_import_feed(self):
+        res = self.client.post(
+            TIMETABLE_IMPORT_URL,
+            feed(stops=STOPS, routes=ROUTES, trips=TRIPS),
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["errors"], [])
+        self.assertEqual(res.data["stats"]["trips.txt"]["created"], 2)
+        journey = Journey.objects.get(external_id="T1")
+        self.assertEqual(journey.route.source.name, "Kyiv")
+        self.assertEqual(journey.route.destination.name, "Lviv")
+        self.assertEqual(journey.tickets_available, 20)
+
+    def test_reimport_is_idempotent(self):
+        self.client.post(
+            TIMETABLE_IMPORT_URL,
+            feed(stops=STOPS, routes=ROUTES, trips=TRIPS),
+        )
+
+        res = self.client.post(
+            TIMETABLE_IMPORT_URL,
+            feed(
+                stops=STOPS.replace("Lviv,", "Lwow,"),
+                routes=ROUTES,
+                trips=TRIPS,
+            ),
+        )
+
+        self.assertEqual(
+            res.data["stats"]["stops.txt"],
+            {"created": 0, "updated": 1, "unchanged": 1, "errors": 0},
+        )
+        self.assertEqual(res.data["stats"]["trips.txt"]["unchanged"], 2)
+        self.assertEqual(Station.objects.count(), 2)
+        self.assertEqual(Route.objects.count(), 2)
+        self.assertEqual(Journey.objects.count(), 2)
+        self.assertTrue(Station.objects.filter(name="Lwow").exists())
+
+    def test_import_reports_bad_rows(self):
+        trips = TRIPS + (
+            "T3,XX,Intercity,2023-09-06T08:00:00,2023-09-06T13:00:00\n"
+            "T4,KL,Hyperloop,2023-09-06T08:00:00,2023-09-06T13:00:00\n"
+            "T5,KL,Intercity,tomorrow,2023-09-06T13:00:00\n"
+        )
+
+        res = self.client.post(
+            TIMETABLE_IMPORT_URL,
+            feed(stops=STOPS, routes=ROUTES, trips=trips),
+        )
+
+        self.assertEqual(res.data["stats"]["trips.txt"]["errors"], 3)
+        self.assertEqual(len(res.data["errors"]), 3)
+        self.assertIn("trips.txt line 4: unknown route", res.data["errors"])
+        self.assertEqual(Journey.objects.count(), 2)
+
+    def test_import_validates_rows(self):
+        stops = STOPS + (
+            "NORTH,North,91,30\n"
+            "NAN,Nowhere,nan,30\n"
+            "EAST,East,50,181\n"
+        )
+        routes = ROUTES + "ZERO,KYIV,LVIV,0\n"
+        trips = TRIPS + (
+            "BACK,KL,Intercity,2023-09-06T13:00:00,2023-09-06T08:00:00\n"
+        )
+
+        res = self.client.post(
+            TIMETABLE_IMPORT_URL,
+            feed(stops=stops, routes=routes, trips=trips),
+        )
+
+        errors = {
+            name: stats["errors"] for name, stats in res.data["stats"].items()
+        }
+        self.assertEqual(
+            errors, {"stops.txt": 3, "routes.txt": 1, "trips.txt": 1}
+        )
+        self.assertIn(
+            "trips.txt line 4: arrival_time is not after departure_time",
+            res.data["errors"],
+        )
+        self.assertEqual(Station.objects.count(), 2)
+        self.assertEqual(Route.objects.count(), 2)
+        self.assertEqual(Journey.objects.count(), 2)
+
+    @override_settings(TIMETABLE_IMPORT_MAX_UPLOAD_SIZE=64)
+    def test_large_feed_refused(self):
+        res = self.client.post(TIMETABLE_IMPORT_URL, feed(stops=STOPS))
+
+        self.assertEqual(
+            res.status_code, status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+        )
+        self.assertFalse(Station.objects.exists())
+
+    def test_lookups_are_bounded_by_the_chunk(self):
+        self.client.post(
+            TIMETABLE_IMPORT_URL, feed(stops=STOPS, routes=ROUTES)
+        )
+        timetable = TimetableImport(chunk_size=1)
+
+        with self.assertNumQueries(2):
+            found = timetable._lookup(
+                Station.objects, "external_id", ["KYIV", "LVIV", "KYIV"]
+            )
+        self.assertEqual(set(found), {"KYIV", "LVIV"})
+
+    def test_import_command(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for name, content in (
+                ("stops", STOPS), ("routes", ROUTES), ("trips", TRIPS),
+            ):
+                Path(directory, f"{name}.txt").write_text(content)
+
+            out = StringIO()
+            call_command(
+                "import_timetable", directory, chunk_size=1, stdout=out
+            )
+
+        self.assertIn("trips.txt: 2 created", out.getvalue())
+        self.assertEqual(Journey.objects.count(), 2)
+
+    def test_import_command_retires_caches_of_other_workers(self):
+        keys = [
+            INDEX_VERSION_KEY,
+            GRAPH_VERSION_KEY,
+            _version_key(Station),
+            _version_key(Route),
+        ]
+        before = get_counter_store().get_many(keys)
+
+        # A command process has not imported the cached views.
+        with mock.patch(
+            "train_station.response_cache._cached_models", set()
+        ), tempfile.TemporaryDirectory() as directory:
+            Path(directory, "stops.txt").write_text(STOPS)
+            call_command("import_timetable", directory, stdout=StringIO())
+
+        after = get_counter_store().get_many(keys)
+        for key in keys:
+            self.assertGreater(after[key], before[key], key)
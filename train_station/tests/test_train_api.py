@@ -1,7 +1,16 @@
+import io
+import os
+import shutil
+import tempfile
+from io import StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
+from PIL import Image
 from rest_framework.test import APIClient
 
 from train_station.models import Train, TrainType, Facility
@@ -15,6 +24,18 @@ def detail_url(train_id: int):
     return reverse("train-station:train-detail", args=[train_id])
 
 
+def image_upload_url(train_id: int):
+    return reverse("train-station:train-upload-image", args=[train_id])
+
+
+def sample_image(size=(1600, 1200), color="steelblue"):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, "PNG")
+    return SimpleUploadedFile(
+        "train.png", buffer.getvalue(), content_type="image/png"
+    )
+
+
 def sample_train_type(**params):
     defaults = {
         "name": "Test Train Type",
@@ -126,6 +147,23 @@ class AuthenticatedTrainApiTest(TestCase):
         self.assertIn(serializer2.data, res.data)
         self.assertNotIn(serializer3.data, res.data)
 
+    def test_list_trains_conditional_get(self):
+        train = sample_train()
+
+        res = self.client.get(TRAIN_URL)
+        last_modified = res["Last-Modified"]
+
+        res = self.client.get(
+            TRAIN_URL, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        train.facility.add(sample_facility(name="wifi"))
+
+        res = self.client.get(TRAIN_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data[0]["facility"], ["wifi"])
+
     def test_retrieve_train_detail(self):
         train = sample_train()
         train.facility.add(sample_facility(name="wifi"))
@@ -211,3 +249,108 @@ class AdminTrainTests(TestCase):
         url = detail_url(train.id)
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+@override_settings(IMAGE_VARIANT_WORKERS=0, MEDIA_GC_GRACE_SECONDS=0)
+class TrainImageVariantTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "test@test.com", "test12345", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        self.train = sample_train()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def upload(self, train, **params):
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(
+                image_upload_url(train.id),
+                {"image": sample_image(**params)},
+                format="multipart",
+            )
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        train.refresh_from_db()
+
+    def test_upload_renders_variants(self):
+        self.upload(self.train)
+
+        self.assertEqual(
+            set(self.train.image_variants), {"thumbnail", "card", "full"}
+        )
+        thumbnail = self.train.image_variants["thumbnail"]
+        self.assertEqual(set(thumbnail), {"webp", "jpeg"})
+        with Image.open(f"{self.media_root}/{thumbnail['webp']}") as image:
+            self.assertEqual(image.format, "WEBP")
+            self.assertEqual(image.size, (160, 120))
+
+    def test_variant_urls_in_list_and_detail(self):
+        self.upload(self.train)
+
+        list_res = self.client.get(TRAIN_URL)
+        detail_res = self.client.get(detail_url(self.train.id))
+
+        for data in (list_res.data[0], detail_res.data):
+            url = data["image_variants"]["card"]["jpeg"]
+            self.assertTrue(url.startswith("http://testserver/media/"))
+            self.assertTrue(url.endswith(".jpeg"))
+
+    def test_new_upload_replaces_variants(self):
+        self.upload(self.train)
+        old_name = self.train.image_variants["full"]["webp"]
+
+        self.upload(self.train, color="firebrick")
+
+        self.assertNotEqual(
+            self.train.image_variants["full"]["webp"], old_name
+        )
+        self.assertFalse(
+            os.path.exists(os.path.join(self.media_root, old_name))
+        )
+
+    def test_new_upload_drops_old_variants_until_rendered(self):
+        self.upload(self.train)
+
+        with self.captureOnCommitCallbacks():
+            self.client.post(
+                image_upload_url(self.train.id),
+                {"image": sample_image(color="firebrick")},
+                format="multipart",
+            )
+
+        self.train.refresh_from_db()
+        self.assertEqual(self.train.image_variants, {})
+
+    def test_render_command_renders_missing_variants(self):
+        self.upload(self.train)
+        variants = self.train.image_variants
+        Train.objects.filter(pk=self.train.pk).update(image_variants={})
+        sample_train(name="Without image")
+
+        out = StringIO()
+        call_command("render_image_variants", dry_run=True, stdout=out)
+        self.assertIn(f"Train {self.train.id}\n", out.getvalue())
+        self.assertIn("Would render variants of 1 trains.", out.getvalue())
+        self.train.refresh_from_db()
+        self.assertEqual(self.train.image_variants, {})
+
+        call_command("render_image_variants", stdout=StringIO())
+        self.train.refresh_from_db()
+        self.assertEqual(self.train.image_variants, variants)
+
+    def test_other_updates_keep_variants(self):
+        self.upload(self.train)
+        variants = self.train.image_variants
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(detail_url(self.train.id), {"name": "Renamed"})
+
+        self.assertEqual(callbacks, [])
+        self.train.refresh_from_db()
+        self.assertEqual(self.train.image_variants, variants)
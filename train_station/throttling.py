@@ -0,0 +1,296 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import SimpleRateThrottle
+
+from train_station.sqlite_store import SQLiteStore
+
+
+class BaseThrottleStore:
+    """Token buckets keyed by throttle key.
+
+    A bucket holds up to ``capacity`` tokens and refills at ``rate``
+    tokens per second; a request taking ``cost`` tokens is allowed only
+    if that many are left. Checks are one atomic read-modify-write of a
+    single bucket.
+    """
+
+    def __init__(self, clock=time.time):
+        self.clock = clock
+
+    @staticmethod
+    def _take(tokens, elapsed, capacity, rate, cost):
+        """Return ``(allowed, tokens, wait)`` for a bucket at ``tokens``"""
+        tokens = min(capacity, tokens + max(elapsed, 0) * rate)
+        if tokens >= cost:
+            return True, tokens - cost, 0.0
+
+        if cost > capacity or not rate:
+            return False, tokens, None
+        return False, tokens, (cost - tokens) / rate
+
+    def consume(self, key, capacity, rate, cost=1):
+        """Take ``cost`` tokens, return ``(allowed, wait_seconds)``"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+
+class LocalThrottleStore(BaseThrottleStore):
+    """In-process buckets, each worker counts on its own"""
+
+    def __init__(self, clock=time.time):
+        super().__init__(clock=clock)
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def consume(self, key, capacity, rate, cost=1):
+        with self._lock:
+            now = self.clock()
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            allowed, tokens, wait = self._take(
+                tokens, now - updated, capacity, rate, cost
+            )
+            self._buckets[key] = (tokens, now)
+
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class SQLiteThrottleStore(SQLiteStore, BaseThrottleStore):
+    """Buckets in a SQLite file
+
+    Each check runs in a ``BEGIN IMMEDIATE`` transaction, which holds
+    the database write lock, so concurrent processes never both spend
+    the same token. Buckets idle for longer than ``idle_seconds`` are
+    full again and get pruned now and then.
+    """
+
+    schema = (
+        "CREATE TABLE IF NOT EXISTS throttle_bucket ("
+        "key TEXT PRIMARY KEY, tokens REAL NOT NULL, "
+        "updated REAL NOT NULL) WITHOUT ROWID",
+    )
+
+    def __init__(
+        self, path, timeout=5, idle_seconds=24 * 60 * 60, clock=time.time
+    ):
+        SQLiteStore.__init__(self, path, timeout=timeout)
+        BaseThrottleStore.__init__(self, clock=clock)
+        self.idle_seconds = idle_seconds
+        self._checks = 0
+
+    def consume(self, key, capacity, rate, cost=1):
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            now = self.clock()
+            row = connection.execute(
+                "SELECT tokens, updated FROM throttle_bucket WHERE key = ?",
+                (key,),
+            ).fetchone()
+            tokens, updated = row or (capacity, now)
+            allowed, tokens, wait = self._take(
+                tokens, now - updated, capacity, rate, cost
+            )
+            connection.execute(
+                "INSERT INTO throttle_bucket (key, tokens, updated) "
+                "VALUES (?, ?, ?) ON CONFLICT (key) DO UPDATE SET "
+                "tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            self._checks += 1
+            if self._checks % 10000 == 0:
+                connection.execute(
+                    "DELETE FROM throttle_bucket WHERE updated < ?",
+                    (now - self.idle_seconds,),
+                )
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+
+        return allowed, wait
+
+    def clear(self):
+        self._connection().execute("DELETE FROM throttle_bucket")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    global _store
+
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = settings.THROTTLE_STORE
+                _store = import_string(config["BACKEND"])(
+                    **config.get("OPTIONS", {})
+                )
+
+    return _store
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    global _store
+
+    if setting == "THROTTLE_STORE":
+        with _store_lock:
+            _store = None
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """``SimpleRateThrottle`` counting in the shared throttle store
+
+    A rate of ``"30/day"`` is a bucket of 30 tokens refilled at 30 per
+    day, so short bursts up to the full rate are allowed and each check
+    costs O(1) instead of trimming a list of request timestamps.
+    """
+
+    cost = 1
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self._wait = get_throttle_store().consume(
+            self.key,
+            self.num_requests,
+            self.num_requests / self.duration,
+            self.cost,
+        )
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class AnonTokenBucketThrottle(TokenBucketThrottle):
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class ActionCostMeter:
+    """Moving averages of queries and seconds per view action
+
+    Filled by ``ThrottleCostMiddleware`` in each process, the averages
+    only price requests, budgets still live in the shared store.
+    """
+
+    def __init__(self, smoothing=0.2):
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+        self._averages = {}
+
+    def record(self, key, queries, seconds):
+        with self._lock:
+            average = self._averages.get(key)
+            if average is None:
+                self._averages[key] = (float(queries), seconds)
+                return
+
+            self._averages[key] = tuple(
+                old + self.smoothing * (new - old)
+                for old, new in zip(average, (queries, seconds))
+            )
+
+    def get(self, key):
+        """Return the average ``(queries, seconds)`` or None"""
+        with self._lock:
+            return self._averages.get(key)
+
+    def cost(self, key):
+        average = self.get(key)
+        if average is None:
+            return None
+
+        queries, seconds = average
+        return math.ceil(
+            queries * settings.THROTTLE_COST_PER_QUERY
+            + seconds * settings.THROTTLE_COST_PER_SECOND
+        )
+
+    def clear(self):
+        with self._lock:
+            self._averages.clear()
+
+
+action_cost_meter = ActionCostMeter()
+
+
+def action_key(view_class, action):
+    return f"{view_class.__module__}.{view_class.__qualname__}.{action}"
+
+
+class CostWeightedThrottle(UserTokenBucketThrottle):
+    """Charge a per-user budget by what each action costs the database
+
+    Views price actions with ``throttle_costs``, an int for every action
+    or a dict of action costs; other actions are priced from their
+    measured query count and duration. Measured costs up to
+    ``THROTTLE_FREE_COST`` are not charged, so cheap reads never use up
+    the budget.
+    """
+
+    scope = "cost"
+
+    def get_cost(self, request, view):
+        action = getattr(view, "action", None) or request.method.lower()
+        costs = getattr(view, "throttle_costs", None)
+        if isinstance(costs, dict):
+            costs = costs.get(action)
+        if costs is not None:
+            return costs
+
+        cost = action_cost_meter.cost(action_key(type(view), action))
+        if cost is None or cost <= settings.THROTTLE_FREE_COST:
+            return 0
+        return cost
+
+    def allow_request(self, request, view):
+        self.cost = self.get_cost(request, view)
+        if not self.cost:
+            return True
+
+        if self.rate is not None:
+            # A cost above the bucket would never fit, such actions take
+            # the whole budget instead of being denied for good.
+            self.cost = min(self.cost, self.num_requests)
+        return super().allow_request(request, view)
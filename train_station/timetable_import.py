@@ -0,0 +1,313 @@
+"""Streaming import of GTFS-style timetable CSV files.
+
+``stops.txt``
+    ``stop_id, stop_name, stop_lat, stop_lon`` into ``Station``
+``routes.txt``
+    ``route_id, origin_stop_id, destination_stop_id, distance`` into
+    ``Route``
+``trips.txt``
+    ``trip_id, route_id, train, departure_time, arrival_time`` into
+    ``Journey``, ``train`` being a train name and the times ISO 8601
+
+Rows are matched on ``external_id`` and upserted in chunks, unchanged
+rows are skipped, so re-importing the same feed writes nothing. Stops,
+routes and trains are looked up per chunk, so memory use depends on the
+chunk size rather than on the size of the feed.
+"""
+import csv
+import math
+from itertools import islice
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from train_station.geo import invalidate_station_index
+from train_station.models import Journey, Route, Station, Train
+from train_station.response_cache import invalidate_response_cache
+from train_station.route_planner import invalidate_route_graph
+
+MAX_ERRORS = 100
+
+
+def _parse_number(value, name, low=-math.inf, high=math.inf):
+    number = float(value)
+    if not (math.isfinite(number) and low <= number <= high):
+        raise ValueError(f"{name} {value!r} out of range")
+    return number
+
+
+class TimetableImport:
+    def __init__(self, chunk_size=5000):
+        self.chunk_size = chunk_size
+        self.stats = {}
+        self.errors = []
+
+    def _lookup(self, queryset, field, keys):
+        """``{key: pk}`` of the rows whose ``field`` is one of ``keys``"""
+        keys = iter(set(keys))
+        found = {}
+        while chunk := list(islice(keys, self.chunk_size)):
+            # Reversed so the oldest row wins for duplicate train names.
+            found.update(
+                queryset.filter(**{f"{field}__in": chunk})
+                .order_by("-pk")
+                .values_list(field, "pk")
+            )
+        return found
+
+    def _error(self, filename, line, message):
+        self.stats[filename]["errors"] += 1
+        if len(self.errors) < MAX_ERRORS:
+            self.errors.append(f"{filename} line {line}: {message}")
+
+    def _upsert(self, model, rows, fields, filename):
+        """Write new and changed ``rows`` (``{external_id: values}``)
+
+        Returns the ``external_id -> pk`` of rows that existed before
+        along with their old values, so callers can react to changes.
+        """
+        existing = {
+            row.pop("external_id"): row
+            for row in model.objects.filter(external_id__in=list(rows))
+            .order_by()
+            .values("external_id", "pk", *fields)
+        }
+        changed = []
+        for external_id, values in rows.items():
+            current = existing.get(external_id)
+            if current and all(current[f] == values[f] for f in fields):
+                continue
+
+            changed.append(
+                model(
+                    external_id=external_id,
+                    **{
+                        model._meta.get_field(field).attname: values[field]
+                        for field in fields
+                    },
+                )
+            )
+
+        model.objects.bulk_create(
+            changed,
+            update_conflicts=True,
+            unique_fields=["external_id"],
+            update_fields=[*fields, "updated_at"],
+        )
+        stats = self.stats[filename]
+        updated = sum(obj.external_id in existing for obj in changed)
+        stats["created"] += len(changed) - updated
+        stats["updated"] += updated
+        stats["unchanged"] += len(rows) - len(changed)
+        return existing
+
+    def _read(self, file, filename, columns, parse, write):
+        self.stats[filename] = {
+            "created": 0, "updated": 0, "unchanged": 0, "errors": 0,
+        }
+        reader = csv.DictReader(file)
+        missing = set(columns) - set(reader.fieldnames or ())
+        if missing:
+            self._error(
+                filename, 1, f"missing columns {', '.join(sorted(missing))}"
+            )
+            return
+
+        rows, lines = {}, {}
+        for row in reader:
+            try:
+                external_id, values = parse(row)
+            except (KeyError, TypeError, ValueError) as error:
+                self._error(filename, reader.line_num, error)
+                continue
+
+            rows[external_id] = values
+            lines[external_id] = reader.line_num
+            if len(rows) >= self.chunk_size:
+                write(rows, filename, lines)
+                rows, lines = {}, {}
+
+        if rows:
+            write(rows, filename, lines)
+
+    def import_stops(self, file):
+        def parse(row):
+            if not row["stop_name"]:
+                raise ValueError("empty stop_name")
+            return row["stop_id"], {
+                "name": row["stop_name"],
+                "latitude": _parse_number(
+                    row["stop_lat"], "stop_lat", -90, 90
+                ),
+                "longitude": _parse_number(
+                    row["stop_lon"], "stop_lon", -180, 180
+                ),
+            }
+
+        def write(rows, filename, lines):
+            with transaction.atomic():
+                self._upsert(
+                    Station, rows, ["name", "latitude", "longitude"], filename
+                )
+
+        self._read(
+            file,
+            "stops.txt",
+            ("stop_id", "stop_name", "stop_lat", "stop_lon"),
+            parse,
+            write,
+        )
+
+    def import_routes(self, file):
+        def parse(row):
+            distance = int(row["distance"])
+            if distance <= 0:
+                raise ValueError(f"distance {distance} is not positive")
+            return row["route_id"], {
+                "source": row["origin_stop_id"],
+                "destination": row["destination_stop_id"],
+                "distance": distance,
+            }
+
+        def write(rows, filename, lines):
+            stations = self._lookup(
+                Station.objects,
+                "external_id",
+                (
+                    stop
+                    for values in rows.values()
+                    for stop in (values["source"], values["destination"])
+                ),
+            )
+            resolved = {}
+            for external_id, values in rows.items():
+                source = stations.get(values["source"])
+                destination = stations.get(values["destination"])
+                if source is None or destination is None:
+                    self._error(
+                        filename, lines[external_id], "unknown stop"
+                    )
+                    continue
+                resolved[external_id] = {
+                    **values, "source": source, "destination": destination,
+                }
+
+            with transaction.atomic():
+                self._upsert(
+                    Route,
+                    resolved,
+                    ["source", "destination", "distance"],
+                    filename,
+                )
+
+        self._read(
+            file,
+            "routes.txt",
+            ("route_id", "origin_stop_id", "destination_stop_id", "distance"),
+            parse,
+            write,
+        )
+
+    def import_trips(self, file):
+        def parse_time(value):
+            parsed = parse_datetime(value)
+            if parsed is None:
+                raise ValueError(f"invalid datetime {value!r}")
+            if timezone.is_aware(parsed) and not settings.USE_TZ:
+                parsed = timezone.make_naive(parsed)
+            return parsed
+
+        def parse(row):
+            departure_time = parse_time(row["departure_time"])
+            arrival_time = parse_time(row["arrival_time"])
+            if arrival_time <= departure_time:
+                raise ValueError("arrival_time is not after departure_time")
+            return row["trip_id"], {
+                "route": row["route_id"],
+                "train": row["train"],
+                "departure_time": departure_time,
+                "arrival_time": arrival_time,
+            }
+
+        def write(rows, filename, lines):
+            routes = self._lookup(
+                Route.objects,
+                "external_id",
+                (values["route"] for values in rows.values()),
+            )
+            trains = self._lookup(
+                Train.objects,
+                "name",
+                (values["train"] for values in rows.values()),
+            )
+            resolved = {}
+            for external_id, values in rows.items():
+                route = routes.get(values["route"])
+                train = trains.get(values["train"])
+                if route is None or train is None:
+                    self._error(
+                        filename,
+                        lines[external_id],
+                        "unknown route" if route is None
+                        else f"unknown train {values['train']!r}",
+                    )
+                    continue
+                resolved[external_id] = {
+                    **values, "route": route, "train": train,
+                }
+
+            with transaction.atomic():
+                existing = self._upsert(
+                    Journey,
+                    resolved,
+                    ["route", "train", "departure_time", "arrival_time"],
+                    filename,
+                )
+                self._rebuild_seat_maps(
+                    current["pk"]
+                    for external_id, current in existing.items()
+                    if external_id in resolved
+                    and current["train"] != resolved[external_id]["train"]
+                )
+
+        self._read(
+            file,
+            "trips.txt",
+            ("trip_id", "route_id", "train", "departure_time", "arrival_time"),
+            parse,
+            write,
+        )
+
+    @staticmethod
+    def _rebuild_seat_maps(journey_ids):
+        journeys = Journey.objects.select_for_update(of=("self",))
+        for journey in journeys.select_related("train").filter(
+            pk__in=list(journey_ids)
+        ):
+            journey.rebuild_seat_map()
+            Journey.objects.filter(pk=journey.pk).update(
+                seat_map=journey.seat_map, updated_at=journey.updated_at
+            )
+
+    def finish(self):
+        """Bulk upserts skip signals, so retire the derived caches of
+        every worker sharing the counter store here"""
+        invalidate_station_index()
+        invalidate_route_graph()
+        invalidate_response_cache(Station, Route, Journey)
+
+
+def import_timetable(stops=None, routes=None, trips=None, chunk_size=5000):
+    """Import the given text files, return ``(stats, errors)``"""
+    timetable = TimetableImport(chunk_size=chunk_size)
+    if stops is not None:
+        timetable.import_stops(stops)
+    if routes is not None:
+        timetable.import_routes(routes)
+    if trips is not None:
+        timetable.import_trips(trips)
+    timetable.finish()
+
+    return timetable.stats, timetable.errors
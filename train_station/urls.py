@@ -1,5 +1,11 @@
+from django.urls import path
 from rest_framework import routers
 
+from train_station.async_views import (
+    AsyncJourneyView,
+    AsyncRouteView,
+    AsyncStationView,
+)
 from train_station.views import (
     StationViewSet,
     RouteViewSet,
@@ -7,8 +13,13 @@ from train_station.views import (
     FacilityViewSet,
     TrainViewSet,
     JourneyViewSet,
+    JourneyAvailabilityViewSet,
     CrewViewSet,
     OrderViewSet,
+    ResponseCacheStatsView,
+    DatabasePoolStatsView,
+    SeatHoldViewSet,
+    TimetableImportView,
 )
 
 app_name = "train_station"
@@ -20,7 +31,45 @@ router.register("train-types", TrainTypeViewSet)
 router.register("facilities", FacilityViewSet)
 router.register("trains", TrainViewSet)
 router.register("journeys", JourneyViewSet)
+router.register("journey-availability", JourneyAvailabilityViewSet)
 router.register("crews", CrewViewSet)
 router.register("orders", OrderViewSet)
+router.register("seat-holds", SeatHoldViewSet, basename="seat-hold")
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path(
+        "async/stations/",
+        AsyncStationView.as_view(),
+        name="async-station-list",
+    ),
+    path(
+        "async/routes/",
+        AsyncRouteView.as_view(),
+        name="async-route-list",
+    ),
+    path(
+        "async/journeys/",
+        AsyncJourneyView.as_view(),
+        name="async-journey-list",
+    ),
+    path(
+        "async/journeys/<int:pk>/",
+        AsyncJourneyView.as_view(),
+        name="async-journey-detail",
+    ),
+    path(
+        "timetable-import/",
+        TimetableImportView.as_view(),
+        name="timetable-import",
+    ),
+    path(
+        "response-cache/stats/",
+        ResponseCacheStatsView.as_view(),
+        name="response-cache-stats",
+    ),
+    path(
+        "db-pool/stats/",
+        DatabasePoolStatsView.as_view(),
+        name="db-pool-stats",
+    ),
+]
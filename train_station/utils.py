@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.db import transaction
+
+from train_station.counters import get_counter_store
+
+# Overlap of incremental syncs by updated_at, longer than any transaction
+# writing the synced rows: updated_at is set before commit.
+SYNC_OVERLAP = timedelta(minutes=5)
+
+
+def cache_version(key):
+    return get_counter_store().get(key)
+
+
+def cache_versions(keys):
+    return get_counter_store().get_many(keys)
+
+
+def bump_cache_version(key):
+    """Increment a version counter shared by every process, return it
+
+    The version is bumped again once the transaction commits, so caches
+    other processes rebuilt from the uncommitted state meanwhile are
+    retired too.
+    """
+    store = get_counter_store()
+    transaction.on_commit(lambda: store.incr(key))
+    return store.incr(key)
@@ -1,10 +1,22 @@
-from django.db.models import F, Count
-from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets, status
+import io
+import math
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from drf_spectacular.utils import (
+    extend_schema,
+    inline_serializer,
+    OpenApiParameter,
+)
+from rest_framework import serializers, viewsets, status
 from rest_framework.decorators import action
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.permissions import IsAdminUser
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
 from train_station.models import (
     Station,
@@ -14,9 +26,22 @@ from train_station.models import (
     Train,
     Crew,
     Journey,
+    JourneyAvailability,
     Order,
+    Ticket,
 )
+from train_station.conditional import ConditionalGetMixin
+from train_station.db_pool import pool_stats
+from train_station.exports import export_tickets, get_export_format
+from train_station.geo import nearest_stations, stations_in_bbox
+from train_station.pagination import OptionalCursorPagination
 from train_station.permission import IsAdminOrIfAuthenticatedReadOnly
+from train_station.response_cache import (
+    CachedResponseMixin,
+    response_cache_stats,
+)
+from train_station.route_planner import StaleRouteGraph, get_route_graph
+from train_station.seat_holds import get_seat_hold_store
 from train_station.serializers import (
     StationSerializer,
     RouteListSerializer,
@@ -30,6 +55,7 @@ from train_station.serializers import (
     JourneyListSerializer,
     TrainDetailSerializer,
     JourneyDetailSerializer,
+    JourneyAvailabilitySerializer,
     CrewSerializer,
     CrewListSerializer,
     CrewDetailSerializer,
@@ -37,19 +63,178 @@ from train_station.serializers import (
     OrderListSerializer,
     OrderDetailSerializer,
     TrainImageSerializer,
+    SeatHoldSerializer,
 )
+from train_station.timetable_import import import_timetable
+
+
+def _param_to_int(params, name, default=None):
+    value = params.get(name)
+    if value in (None, ""):
+        if default is None:
+            raise ValidationError({name: "This query parameter is required."})
+        return default
+
+    try:
+        return int(value)
+    except ValueError:
+        raise ValidationError({name: "A valid integer is required."})
+
+
+LATITUDE_RANGE = (-90.0, 90.0)
+LONGITUDE_RANGE = (-180.0, 180.0)
+
+
+def _to_finite_float(name, value, bounds):
+    try:
+        number = float(value)
+    except ValueError:
+        raise ValidationError({name: "A valid number is required."})
+
+    # float() takes "nan" and "inf", which no grid cell can hold.
+    if not math.isfinite(number):
+        raise ValidationError({name: "A finite number is required."})
+    if bounds and not bounds[0] <= number <= bounds[1]:
+        raise ValidationError(
+            {name: f"Must be between {bounds[0]:g} and {bounds[1]:g}."}
+        )
+
+    return number
+
+
+def _param_to_float(params, name, default=None, bounds=None):
+    value = params.get(name)
+    if value in (None, ""):
+        if default is None:
+            raise ValidationError({name: "This query parameter is required."})
+        return default
+
+    return _to_finite_float(name, value, bounds)
+
+
+def _param_to_datetime(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: "A valid ISO 8601 datetime is required."})
+
+    if timezone.is_aware(parsed) and not settings.USE_TZ:
+        # Stored times are naive local ones, compare like with like.
+        parsed = timezone.make_naive(parsed)
+    return parsed
 
 
-class StationViewSet(viewsets.ModelViewSet):
+class StationViewSet(
+    CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Station.objects
     serializer_class = StationSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    replica_reads = True
+    cache_models = (Station,)
 
+    @staticmethod
+    def _params_to_bbox(qs):
+        coordinates = qs.split(",")
+        if len(coordinates) != 4:
+            raise ValidationError(
+                {"bbox": "Expected min_lon,min_lat,max_lon,max_lat."}
+            )
 
-class RouteViewSet(viewsets.ModelViewSet):
+        min_lon, min_lat, max_lon, max_lat = (
+            _to_finite_float("bbox", coordinate, bounds)
+            for coordinate, bounds in zip(
+                coordinates, (LONGITUDE_RANGE, LATITUDE_RANGE) * 2
+            )
+        )
+        return min_lat, min_lon, max_lat, max_lon
+
+    def get_queryset(self):
+        queryset = self.queryset
+        bbox = self.request.query_params.get("bbox")
+
+        if bbox and self.action == "list":
+            station_ids = stations_in_bbox(*self._params_to_bbox(bbox))
+            queryset = queryset.filter(id__in=station_ids)
+
+        return queryset
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "bbox",
+                type=str,
+                description="Filter by bounding box "
+                "(ex. ?bbox=min_lon,min_lat,max_lon,max_lat)",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "lat", type=float, required=True, description="Latitude"
+            ),
+            OpenApiParameter(
+                "lon", type=float, required=True, description="Longitude"
+            ),
+            OpenApiParameter(
+                "radius",
+                type=float,
+                description="Search radius in km (default: 10)",
+            ),
+            OpenApiParameter(
+                "limit",
+                type=int,
+                description="Maximum number of stations (default: 10)",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="nearby")
+    def nearby(self, request):
+        """Stations closest to a point, nearest first"""
+        params = request.query_params
+        latitude = _param_to_float(params, "lat", bounds=LATITUDE_RANGE)
+        longitude = _param_to_float(params, "lon", bounds=LONGITUDE_RANGE)
+        radius = _param_to_float(params, "radius", default=10.0)
+        if radius <= 0:
+            raise ValidationError({"radius": "Must be greater than 0."})
+        limit = min(_param_to_int(params, "limit", default=10), 100)
+
+        nearest = nearest_stations(latitude, longitude, radius, limit)
+        stations = self.queryset.in_bulk(
+            [station_id for _, station_id in nearest]
+        )
+        data = []
+        for distance, station_id in nearest:
+            if station_id in stations:
+                station = self.get_serializer(stations[station_id]).data
+                station["distance"] = round(distance, 3)
+                data.append(station)
+
+        return Response(data)
+
+
+class RouteViewSet(
+    CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Route.objects.select_related("source", "destination")
     serializer_class = RouteSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    replica_reads = True
+    cache_models = (Route, Station)
+    cache_actions = ("list",)
+    last_modified_fields = (
+        "updated_at", "source__updated_at", "destination__updated_at",
+    )
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -60,26 +245,156 @@ class RouteViewSet(viewsets.ModelViewSet):
 
         return RouteSerializer
 
-
-class TrainTypeViewSet(viewsets.ModelViewSet):
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "source",
+                type=int,
+                required=True,
+                description="Source station id (ex. ?source=1)",
+            ),
+            OpenApiParameter(
+                "destination",
+                type=int,
+                required=True,
+                description="Destination station id (ex. ?destination=2)",
+            ),
+            OpenApiParameter(
+                "mode",
+                type=str,
+                enum=["distance", "time"],
+                description="Shortest by route distance or earliest arrival "
+                "by chaining journeys (default: distance)",
+            ),
+            OpenApiParameter(
+                "departure_after",
+                type=str,
+                description="Time mode: earliest departure, times before "
+                "the planner's timetable start are moved up to it "
+                "(default: now)",
+            ),
+            OpenApiParameter(
+                "min_transfer",
+                type=int,
+                description="Time mode: minutes between connecting journeys "
+                "(default: 10)",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="plan")
+    def plan(self, request):
+        """Plan a multi-leg connection between two stations"""
+        params = request.query_params
+        source_id = _param_to_int(params, "source")
+        destination_id = _param_to_int(params, "destination")
+        mode = params.get("mode", "distance")
+
+        if mode == "distance":
+            plan = self._plan_distance
+            options = {}
+        elif mode == "time":
+            plan = self._plan_time
+            options = {
+                "departure_after": (
+                    _param_to_datetime(params, "departure_after")
+                    or timezone.now()
+                ),
+                "min_transfer": timedelta(
+                    minutes=_param_to_int(params, "min_transfer", default=10)
+                ),
+            }
+        else:
+            raise ValidationError({"mode": "Must be 'distance' or 'time'."})
+
+        for rebuild in (False, True):
+            graph = get_route_graph(rebuild=rebuild)
+            try:
+                return plan(graph, source_id, destination_id, **options)
+            except StaleRouteGraph:
+                # Deleted since this worker's graph was built, rebuild once.
+                continue
+        raise NotFound("No connection found.")
+
+    def _plan_distance(self, graph, source_id, destination_id):
+        connection = graph.shortest_path(source_id, destination_id)
+        if connection is None:
+            raise NotFound("No connection found.")
+
+        distance, route_ids = connection
+        routes = self.get_queryset().in_bulk(route_ids)
+        if len(routes) < len(set(route_ids)):
+            raise StaleRouteGraph()
+        return Response(
+            {
+                "distance": distance,
+                "routes": RouteListSerializer(
+                    [routes[route_id] for route_id in route_ids],
+                    many=True,
+                ).data,
+            }
+        )
+
+    def _plan_time(
+        self, graph, source_id, destination_id, departure_after, min_transfer
+    ):
+        # Earlier journeys are not in the graph, and loading them for a
+        # single request would read the timetable's whole history.
+        connection = graph.earliest_arrival(
+            source_id,
+            destination_id,
+            max(departure_after, graph.journeys_since),
+            min_transfer=min_transfer,
+        )
+        if connection is None:
+            raise NotFound("No connection found.")
+
+        arrival_time, journey_ids = connection
+        journeys = JourneyViewSet.queryset.in_bulk(journey_ids)
+        if len(journeys) < len(set(journey_ids)):
+            raise StaleRouteGraph()
+        return Response(
+            {
+                "arrival_time": arrival_time,
+                "journeys": JourneyListSerializer(
+                    [journeys[journey_id] for journey_id in journey_ids],
+                    many=True,
+                ).data,
+            }
+        )
+
+
+class TrainTypeViewSet(
+    CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = TrainType.objects
     serializer_class = TrainTypeSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (TrainType,)
+    # Served from the response cache, never worth a budget.
+    throttle_costs = 0
 
 
-class FacilityViewSet(viewsets.ModelViewSet):
+class FacilityViewSet(
+    CachedResponseMixin, ConditionalGetMixin, viewsets.ModelViewSet
+):
     queryset = Facility.objects
     serializer_class = FacilitySerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    cache_models = (Facility,)
+    throttle_costs = 0
 
 
-class TrainViewSet(viewsets.ModelViewSet):
+class TrainViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = (
         Train.objects.select_related("train_type")
         .prefetch_related("facility")
     )
     serializer_class = TrainSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    replica_reads = True
+    last_modified_fields = (
+        "updated_at", "train_type__updated_at", "facility__updated_at",
+    )
 
     @staticmethod
     def _params_to_int(qs):
@@ -147,22 +462,37 @@ class TrainViewSet(viewsets.ModelViewSet):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class JourneyPagePagination(PageNumberPagination):
+class JourneyPagePagination(OptionalCursorPagination):
     page_size = 5
     max_page_size = 50
+    ordering = ("-departure_time", "-id")
+    always_paginate = True
 
 
-class JourneyViewSet(viewsets.ModelViewSet):
+class JourneyViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = (
         Journey.objects.
-        select_related("route", "train")
+        select_related("route__source", "route__destination", "train")
         .prefetch_related("crew")
     )
     serializer_class = JourneySerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    replica_reads = True
+    pagination_class = JourneyPagePagination
+    conditional_actions = ("retrieve",)
+    # Streamed responses finish after the middleware measures them.
+    throttle_costs = {"manifest": 50}
+    last_modified_fields = (
+        "updated_at",
+        "route__updated_at",
+        "route__source__updated_at",
+        "route__destination__updated_at",
+        "train__updated_at",
+        "crew__updated_at",
+    )
 
     def get_serializer_class(self):
-        if self.action == "list":
+        if self.action in ("list", "search"):
             return JourneyListSerializer
 
         if self.action == "retrieve":
@@ -170,23 +500,165 @@ class JourneyViewSet(viewsets.ModelViewSet):
 
         return JourneySerializer
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "source",
+                type=int,
+                required=True,
+                description="Source station id (ex. ?source=1)",
+            ),
+            OpenApiParameter(
+                "destination",
+                type=int,
+                required=True,
+                description="Destination station id (ex. ?destination=2)",
+            ),
+            OpenApiParameter(
+                "departure_after",
+                type=str,
+                description="Earliest departure time "
+                "(ex. ?departure_after=2023-09-05T00:00:00)",
+            ),
+            OpenApiParameter(
+                "departure_before",
+                type=str,
+                description="Latest departure time "
+                "(ex. ?departure_before=2023-09-06T00:00:00)",
+            ),
+        ]
+    )
+    @action(methods=["GET"], detail=False, url_path="search")
+    def search(self, request):
+        """Search journeys between two stations in a departure window"""
+        params = request.query_params
+        routes = Route.objects.filter(
+            source_id=_param_to_int(params, "source"),
+            destination_id=_param_to_int(params, "destination"),
+        ).values("id")
+        queryset = self.get_queryset().filter(route_id__in=routes)
+
+        departure_after = _param_to_datetime(params, "departure_after")
+        if departure_after:
+            queryset = queryset.filter(departure_time__gte=departure_after)
+
+        departure_before = _param_to_datetime(params, "departure_before")
+        if departure_before:
+            queryset = queryset.filter(departure_time__lte=departure_before)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "export_format",
+                type=str,
+                enum=["csv", "ndjson"],
+                description="Export format (default: csv)",
+            ),
+        ],
+        responses={(200, "text/csv"): str},
+    )
+    @action(
+        methods=["GET"],
+        detail=True,
+        url_path="manifest",
+        permission_classes=[IsAdminUser],
+    )
+    def manifest(self, request, pk=None):
+        """Stream the passenger manifest of a journey"""
+        journey = self.get_object()
+        return export_tickets(
+            Ticket.objects.filter(journey=journey).order_by("cargo", "seat"),
+            get_export_format(request.query_params),
+            f"journey-{journey.pk}-manifest",
+        )
+
+
+class JourneyAvailabilityPagination(OptionalCursorPagination):
+    page_size = 100
+    max_page_size = 1000
+    ordering = ("departure_time", "journey_id")
+    always_paginate = True
+
+
+class JourneyAvailabilityViewSet(
+    ConditionalGetMixin, viewsets.ReadOnlyModelViewSet
+):
+    """Precomputed seat availability for reporting and timetable reads"""
+
+    queryset = JourneyAvailability.objects
+    serializer_class = JourneyAvailabilitySerializer
+    permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    pagination_class = JourneyAvailabilityPagination
+    last_modified_fields = ("refreshed_at",)
+
     def get_queryset(self):
         queryset = self.queryset
+        params = self.request.query_params
 
-        if self.action in ("list", "retrieve"):
-            queryset = queryset.annotate(
-                tickets_available=F("train__cargo_num") *
-                F("train__places_in_cargo")
-                - Count("tickets")
-            )
+        for name in ("source", "destination", "route", "train"):
+            if params.get(name):
+                queryset = queryset.filter(
+                    **{f"{name}_id": _param_to_int(params, name)}
+                )
+
+        departure_after = _param_to_datetime(params, "departure_after")
+        if departure_after:
+            queryset = queryset.filter(departure_time__gte=departure_after)
+
+        departure_before = _param_to_datetime(params, "departure_before")
+        if departure_before:
+            queryset = queryset.filter(departure_time__lte=departure_before)
 
         return queryset
 
+    @extend_schema(
+        parameters=[
+            *(
+                OpenApiParameter(
+                    name,
+                    type=int,
+                    description=f"Filter by {name} id (ex. ?{name}=1)",
+                )
+                for name in ("source", "destination", "route", "train")
+            ),
+            OpenApiParameter(
+                "departure_after",
+                type=str,
+                description="Earliest departure time "
+                "(ex. ?departure_after=2023-09-05T00:00:00)",
+            ),
+            OpenApiParameter(
+                "departure_before",
+                type=str,
+                description="Latest departure time "
+                "(ex. ?departure_before=2023-09-06T00:00:00)",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
-class CrewViewSet(viewsets.ModelViewSet):
+class CrewViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Crew.objects.prefetch_related("journeys__train")
     serializer_class = CrewSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    last_modified_fields = (
+        "updated_at",
+        "journeys__updated_at",
+        "journeys__route__source__updated_at",
+        "journeys__route__destination__updated_at",
+        "journeys__train__updated_at",
+        "journeys__train__train_type__updated_at",
+    )
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -198,15 +670,29 @@ class CrewViewSet(viewsets.ModelViewSet):
         return CrewSerializer
 
 
-class OrderPagePagination(PageNumberPagination):
+class OrderPagePagination(OptionalCursorPagination):
     page_size = 10
     max_page_size = 100
+    ordering = ("-created_at", "-id")
+    always_paginate = True
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(ConditionalGetMixin, viewsets.ModelViewSet):
     queryset = Order.objects
     serializer_class = OrderSerializer
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    pagination_class = OrderPagePagination
+    conditional_actions = ("retrieve",)
+    throttle_costs = {"export": 50}
+    last_modified_fields = (
+        "updated_at",
+        "tickets__updated_at",
+        "tickets__journey__updated_at",
+        "tickets__journey__route__source__updated_at",
+        "tickets__journey__route__destination__updated_at",
+        "tickets__journey__train__updated_at",
+        "tickets__journey__crew__updated_at",
+    )
 
     def get_serializer_class(self):
         if self.action == "list":
@@ -219,3 +705,208 @@ class OrderViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                name,
+                type=str,
+                description=description,
+            )
+            for name, description in (
+                ("created_after", "Orders created at or after"),
+                ("created_before", "Orders created at or before"),
+                ("departure_after", "Journeys departing at or after"),
+                ("departure_before", "Journeys departing at or before"),
+            )
+        ]
+        + [
+            OpenApiParameter(
+                "export_format",
+                type=str,
+                enum=["csv", "ndjson"],
+                description="Export format (default: csv)",
+            ),
+        ],
+        responses={(200, "text/csv"): str},
+    )
+    @action(methods=["GET"], detail=False, url_path="export")
+    def export(self, request):
+        """Stream tickets of orders as CSV or NDJSON, staff get everyone's"""
+        params = request.query_params
+        export_format = get_export_format(params)
+        tickets = Ticket.objects.order_by("id")
+        if not request.user.is_staff:
+            tickets = tickets.filter(order__user_id=request.user.id)
+
+        for name, lookup in (
+            ("created_after", "order__created_at__gte"),
+            ("created_before", "order__created_at__lte"),
+            ("departure_after", "journey__departure_time__gte"),
+            ("departure_before", "journey__departure_time__lte"),
+        ):
+            value = _param_to_datetime(params, name)
+            if value:
+                tickets = tickets.filter(**{lookup: value})
+
+        return export_tickets(tickets, export_format, "tickets")
+
+
+class SeatHoldViewSet(viewsets.GenericViewSet):
+    serializer_class = SeatHoldSerializer
+    permission_classes = (IsAuthenticated,)
+    lookup_value_regex = "[0-9a-f]{32}"
+
+    def get_permissions(self):
+        if self.action == "confirm":
+            # Creates an order, allowed to whoever may create orders.
+            return [
+                permission()
+                for permission in OrderViewSet.permission_classes
+            ]
+
+        return super().get_permissions()
+
+    def _get_hold(self, token):
+        hold = get_seat_hold_store().get(token)
+        if hold is None or not (
+            hold["user"] == self.request.user.pk or self.request.user.is_staff
+        ):
+            raise NotFound("Seat hold not found or expired.")
+
+        return hold
+
+    def create(self, request):
+        """Hold seats on a journey for a few minutes"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, pk=None):
+        serializer = self.get_serializer(self._get_hold(pk))
+        return Response(serializer.data)
+
+    def destroy(self, request, pk=None):
+        self._get_hold(pk)
+        get_seat_hold_store().release(pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @extend_schema(request=None, responses=OrderSerializer)
+    @action(methods=["POST"], detail=True, url_path="confirm")
+    def confirm(self, request, pk=None):
+        """Turn a seat hold into an order for the user holding it"""
+        hold = self._get_hold(pk)
+        serializer = OrderSerializer(
+            data={
+                "tickets": [
+                    {"cargo": cargo, "seat": seat, "journey": hold["journey"]}
+                    for cargo, seat in hold["seats"]
+                ]
+            },
+            context={"request": request, "seat_hold": pk},
+        )
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user_id=hold["user"])
+        get_seat_hold_store().release(pk)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ResponseCacheStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        responses=inline_serializer(
+            "ResponseCacheStats",
+            fields={
+                "hits": serializers.IntegerField(),
+                "misses": serializers.IntegerField(),
+                "hit_rate": serializers.FloatField(allow_null=True),
+            },
+        )
+    )
+    def get(self, request):
+        """Shared hit and miss counters of the reference-data cache"""
+        return Response(response_cache_stats())
+
+
+class DatabasePoolStatsView(APIView):
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(
+        responses=inline_serializer(
+            "DatabasePoolStats",
+            fields={
+                "pools": serializers.DictField(
+                    child=serializers.DictField(
+                        child=serializers.FloatField()
+                    )
+                ),
+            },
+        )
+    )
+    def get(self, request):
+        """Connection pool counters of the worker serving the request"""
+        return Response({"pools": pool_stats()})
+
+
+class TimetableImportView(APIView):
+    permission_classes = (IsAdminUser,)
+    parser_classes = (MultiPartParser,)
+    files = ("stops", "routes", "trips")
+
+    @extend_schema(
+        request={
+            "multipart/form-data": inline_serializer(
+                "TimetableImportRequest",
+                fields={
+                    name: serializers.FileField(required=False)
+                    for name in files
+                },
+            )
+        },
+        responses=inline_serializer(
+            "TimetableImportResult",
+            fields={
+                "stats": serializers.DictField(),
+                "errors": serializers.ListField(
+                    child=serializers.CharField()
+                ),
+            },
+        ),
+    )
+    def post(self, request):
+        """Upsert stations, routes and journeys from GTFS-style CSV files
+
+        Feeds above ``TIMETABLE_IMPORT_MAX_UPLOAD_SIZE`` are refused, they
+        would hold a worker for minutes; import them with the
+        ``import_timetable`` command instead.
+        """
+        size = sum(
+            request.FILES[name].size
+            for name in self.files
+            if name in request.FILES
+        )
+        if size > settings.TIMETABLE_IMPORT_MAX_UPLOAD_SIZE:
+            return Response(
+                {
+                    "detail": "Timetable too large to import in a request, "
+                    "use the import_timetable management command."
+                },
+                status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            )
+
+        files = {
+            name: io.TextIOWrapper(
+                request.FILES[name].file, encoding="utf-8-sig", newline=""
+            )
+            for name in self.files
+            if name in request.FILES
+        }
+        if not files:
+            raise ValidationError(
+                {"detail": "Upload at least one of stops, routes, trips."}
+            )
+
+        stats, errors = import_timetable(**files)
+        return Response({"stats": stats, "errors": errors})
@@ -44,13 +44,16 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "train_station.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "train_station.middleware.ReplicaRoutingMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "train_station.middleware.ThrottleCostMiddleware",
 ]
 
 ROOT_URLCONF = "train_station_service.urls"
@@ -78,14 +81,40 @@ WSGI_APPLICATION = "train_station_service.wsgi.application"
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        "ENGINE": "train_station.backends.postgresql_pool",
         "HOST": os.environ["POSTGRES_HOST"],
         "NAME": os.environ["POSTGRES_DB"],
         "USER": os.environ["POSTGRES_USER"],
         "PASSWORD": os.environ["POSTGRES_PASSWORD"],
+        # Per-process connection pool, see the backend's docstring.
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", 2)),
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", 20)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 5)),
+            "MAX_LIFETIME": int(os.getenv("DB_POOL_MAX_LIFETIME", 30 * 60)),
+            "CHECK_IDLE": float(os.getenv("DB_POOL_CHECK_IDLE", 5)),
+        },
     }
 }
 
+# Read replicas, e.g. POSTGRES_REPLICA_HOSTS=replica-1,replica-2, are
+# used for GET requests of views with replica_reads = True.
+DATABASE_REPLICAS = []
+for index, host in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(","))
+):
+    DATABASES[f"replica_{index}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica_{index}")
+
+DATABASE_ROUTERS = ["train_station.db_router.ReplicaRouter"]
+# Seconds a replica may lag behind, and a client's own writes stay on
+# the primary for.
+REPLICA_MAX_LAG = int(os.getenv("REPLICA_MAX_LAG", 10))
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -123,6 +152,17 @@ STATIC_URL = "static/"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = "/vol/web/media/"
 
+STORAGES = {
+    "default": {
+        "BACKEND": "train_station.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+# Unreferenced media younger than this is left to `collect_media`.
+MEDIA_GC_GRACE_SECONDS = int(os.getenv("MEDIA_GC_GRACE_SECONDS", 10 * 60))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -132,15 +172,94 @@ AUTH_USER_MODEL = "user.User"
 
 REST_FRAMEWORK = {
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "train_station.throttling.AnonTokenBucketThrottle",
+        "train_station.throttling.UserTokenBucketThrottle",
+        "train_station.throttling.CostWeightedThrottle",
     ],
-    "DEFAULT_THROTTLE_RATES": {"anon": "10/day", "user": "30/day"},
+    "DEFAULT_THROTTLE_RATES": {
+        "anon": "10/day", "user": "30/day", "cost": "2000/hour",
+    },
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        "user.authentication.LightweightJWTAuthentication",
     ),
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    "DEFAULT_PAGINATION_CLASS": (
+        "train_station.pagination.OptionalCursorPagination"
+    ),
+}
+
+# THROTTLE_STORE, METRICS_STORE, COUNTER_STORE and SEAT_HOLDS keep their
+# state in SQLite files (train_station.sqlite_store) that every worker and
+# management command on the host must share.
+
+# Token buckets. Tests run with LocalThrottleStore, see
+# train_station_service.test_runner.
+THROTTLE_STORE = {
+    "BACKEND": "train_station.throttling.SQLiteThrottleStore",
+    "OPTIONS": {
+        "path": os.getenv(
+            "THROTTLE_STORE_PATH", "/tmp/train-station-throttle.sqlite3"
+        ),
+    },
+}
+
+# Measured action cost: a query costs 1, a second of work costs 100, and
+# actions averaging THROTTLE_FREE_COST or less are not charged.
+THROTTLE_COST_PER_QUERY = 1
+THROTTLE_COST_PER_SECOND = 100
+THROTTLE_FREE_COST = 3
+
+# Request metrics served at /metrics, summed over the host's workers.
+# Each worker flushes every METRICS_FLUSH_INTERVAL seconds, scrapes need
+# "Authorization: Bearer <METRICS_TOKEN>" when the token is set.
+METRICS_STORE = {
+    "BACKEND": "train_station.metrics.SQLiteMetricsStore",
+    "OPTIONS": {
+        "path": os.getenv(
+            "METRICS_STORE_PATH", "/tmp/train-station-metrics.sqlite3"
+        ),
+    },
+}
+METRICS_FLUSH_INTERVAL = float(os.getenv("METRICS_FLUSH_INTERVAL", 1))
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+TEST_RUNNER = "train_station_service.test_runner.TestRunner"
+
+# Cache versions and response cache counters.
+COUNTER_STORE = {
+    "BACKEND": "train_station.counters.SQLiteCounterStore",
+    "OPTIONS": {
+        "path": os.getenv(
+            "COUNTER_STORE_PATH", "/tmp/train-station-counters.sqlite3"
+        ),
+    },
+}
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", 60 * 60))
+
+# Seat holds. Tests run with LocalSeatHoldStore, see
+# train_station_service.test_runner.
+SEAT_HOLDS = {
+    "BACKEND": "train_station.seat_holds.SQLiteSeatHoldStore",
+    "OPTIONS": {
+        "path": os.getenv(
+            "SEAT_HOLD_STORE_PATH", "/tmp/train-station-seat-holds.sqlite3"
+        ),
+    },
 }
+SEAT_HOLD_MINUTES = 10
+SEAT_HOLD_MAX_MINUTES = 30
+
+# Largest timetable upload imported within a request, in bytes. Bigger
+# feeds go through the import_timetable management command.
+TIMETABLE_IMPORT_MAX_UPLOAD_SIZE = int(
+    os.getenv("TIMETABLE_IMPORT_MAX_UPLOAD_SIZE", 5 * 1024 * 1024)
+)
+
+# Threads rendering train image variants per process, 0 renders inline.
+IMAGE_VARIANT_WORKERS = int(os.getenv("IMAGE_VARIANT_WORKERS", 2))
+
+# Seconds a worker trusts cached is_staff/is_active flags on reads.
+AUTH_USER_CACHE_TTL = int(os.getenv("AUTH_USER_CACHE_TTL", 30))
 
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=540),
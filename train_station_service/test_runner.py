@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.db import connections
+from django.test.runner import DiscoverRunner
+from django.test.utils import iter_test_cases
+
+from train_station.db_pool import close_pools
+from train_station.throttling import action_cost_meter, get_throttle_store
+
+
+def reset_throttling():
+    get_throttle_store().clear()
+    action_cost_meter.clear()
+
+
+class TestRunner(DiscoverRunner):
+    """Keep test throttling, seat holds, counters and metrics in memory,
+    away from the shared stores, and let go of pooled connections before
+    test databases are dropped
+
+    Throttle buckets and measured action costs are reset after every
+    test: buckets are keyed by user pk, which some backends hand out
+    again after a rollback.
+    """
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        settings.THROTTLE_STORE = {
+            "BACKEND": "train_station.throttling.LocalThrottleStore",
+        }
+        settings.SEAT_HOLDS = {
+            "BACKEND": "train_station.seat_holds.LocalSeatHoldStore",
+            "OPTIONS": {"reap_interval": 5},
+        }
+        settings.COUNTER_STORE = {
+            "BACKEND": "train_station.counters.LocalCounterStore",
+        }
+        settings.METRICS_STORE = {
+            "BACKEND": "train_station.metrics.LocalMetricsStore",
+        }
+        settings.METRICS_FLUSH_INTERVAL = 0
+
+    def build_suite(self, *args, **kwargs):
+        suite = super().build_suite(*args, **kwargs)
+        for test in iter_test_cases(suite):
+            test.addCleanup(reset_throttling)
+        return suite
+
+    def teardown_databases(self, old_config, **kwargs):
+        connections.close_all()
+        close_pools()
+        super().teardown_databases(old_config, **kwargs)
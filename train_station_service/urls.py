@@ -6,9 +6,13 @@ from drf_spectacular.views import (
     SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView,
 )
 
+from train_station.metrics import metrics_view
+from train_station.storage import serve_media
+
 
 urlpatterns = [
     path("admin/", admin.site.urls),
+    path("metrics", metrics_view, name="metrics"),
     path(
         "api/train-station/",
         include("train_station.urls", namespace="train-station")
@@ -28,4 +32,6 @@ urlpatterns = [
         SpectacularRedocView.as_view(url_name="schema"),
         name="redoc"
     ),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+] + static(
+    settings.MEDIA_URL, view=serve_media, document_root=settings.MEDIA_ROOT
+)
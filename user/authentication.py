@@ -0,0 +1,133 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserFlagCache:
+    """Per-process ``user id -> (is_staff, is_active)`` map with a TTL
+
+    Entries are trusted for ``ttl`` seconds, so a demoted or deactivated
+    user keeps read access on a worker for at most that long.
+    """
+
+    def __init__(self, ttl=30, max_size=10000, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, user_id):
+        """Return ``(is_staff, is_active)`` or None if unknown or stale"""
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+
+            expires_at, flags = entry
+            if expires_at <= self.clock():
+                del self._entries[user_id]
+                return None
+
+            self._entries.move_to_end(user_id)
+            return flags
+
+    def set(self, user_id, flags):
+        with self._lock:
+            self._entries[user_id] = (self.clock() + self.ttl, flags)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_flag_cache = UserFlagCache(ttl=settings.AUTH_USER_CACHE_TTL)
+
+
+class LightweightUser(TokenUser):
+    """Token user whose staff and active flags come from the flag cache"""
+
+    def __init__(self, token, is_staff, is_active):
+        super().__init__(token)
+        self.__dict__["is_staff"] = is_staff
+        self.is_active = is_active
+
+    @cached_property
+    def id(self):
+        return int(self.token[api_settings.USER_ID_CLAIM])
+
+
+class LightweightJWTAuthentication(JWTAuthentication):
+    """JWT authentication skipping the user query on safe requests
+
+    GET, HEAD and OPTIONS get a :class:`LightweightUser` built from the
+    token's user id and the cached flags; the database is only read when
+    the cache has no fresh entry. Other methods load the full user.
+    """
+
+    def authenticate(self, request):
+        if request.method not in SAFE_METHODS:
+            return super().authenticate(request)
+
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return self.get_lightweight_user(validated_token), validated_token
+
+    def get_lightweight_user(self, validated_token):
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise AuthenticationFailed(
+                _("Token contained no recognizable user identification")
+            )
+
+        flags = user_flag_cache.get(user_id)
+        if flags is None:
+            flags = (
+                get_user_model()
+                .objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list("is_staff", "is_active")
+                .first()
+            )
+            if flags is None:
+                raise AuthenticationFailed(
+                    _("User not found"), code="user_not_found"
+                )
+            user_flag_cache.set(user_id, flags)
+
+        is_staff, is_active = flags
+        if not is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+
+        return LightweightUser(validated_token, is_staff, is_active)
+
+
+class LightweightJWTScheme(SimpleJWTScheme):
+    target_class = LightweightJWTAuthentication
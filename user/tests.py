@@ -1,3 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from user.authentication import (
+    LightweightUser,
+    UserFlagCache,
+    user_flag_cache,
+)
+
+STATION_URL = reverse("train-station:station-list")
+ASYNC_STATION_URL = reverse("train-station:async-station-list")
+EXPORT_URL = reverse("train-station:order-export")
+ME_URL = reverse("user:manage")
+
+
+class LightweightJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        user_flag_cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@test.com", "test12345"
+        )
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}"
+        )
+
+    def user_queries(self, url):
+        table = get_user_model()._meta.db_table
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(url)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [q["sql"] for q in queries if table in q["sql"]]
+
+    def test_reads_use_cached_flags(self):
+        self.assertEqual(len(self.user_queries(STATION_URL)), 1)
+        self.assertEqual(self.user_queries(STATION_URL), [])
+        self.assertEqual(self.user_queries(ASYNC_STATION_URL), [])
+
+    def test_reads_get_lightweight_staff_user(self):
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(res.wsgi_request.user, LightweightUser)
+        self.assertEqual(res.wsgi_request.user.id, self.user.id)
+        self.assertTrue(res.wsgi_request.user.is_staff)
+
+    def test_writes_load_full_user(self):
+        res = self.client.post(STATION_URL, {})
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertIsInstance(res.wsgi_request.user, get_user_model())
+
+    def test_manage_user_loads_full_user(self):
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_deactivated_user_rejected(self):
+        self.client.get(STATION_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_user_rejected(self):
+        self.user.delete()
+
+        res = self.client.get(STATION_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class UserFlagCacheTests(TestCase):
+    def setUp(self):
+        self.now = 0
+        self.cache = UserFlagCache(ttl=30, max_size=2, clock=lambda: self.now)
+
+    def test_entries_expire(self):
+        self.cache.set(1, (False, True))
+        self.now = 29
+        self.assertEqual(self.cache.get(1), (False, True))
+        self.now = 30
+        self.assertIsNone(self.cache.get(1))
+
+    def test_least_recently_used_evicted(self):
+        self.cache.set(1, (False, True))
+        self.cache.set(2, (False, True))
+        self.cache.get(1)
+        self.cache.set(3, (True, True))
+
+        self.assertIsNone(self.cache.get(2))
+        self.assertEqual(self.cache.get(1), (False, True))
@@ -11,6 +11,7 @@ class CreateUserView(generics.CreateAPIView):
 
 class ManageUserView(generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
+    # The profile needs the full user, even on GET.
     authentication_classes = (JWTAuthentication,)
     permission_classes = (IsAuthenticated,)
 